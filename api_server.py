@@ -0,0 +1,281 @@
+"""Headless JSON API over the quotes database
+
+    python api_server.py --port 8600
+
+Endpoints (GET):
+    /api/random                      a random quote
+    /api/random?category=Love,Life   a random quote from some categories
+    /api/quote-of-the-day            today's quote, the same for everyone
+    /api/similar?id=42&k=5           the quotes most like a quote
+    /api/mood?mood=happy&gender=girl&age=25&social_life=good&professional_life=balanced
+    /api/search?q=courage&limit=10&after=<cursor>
+    /healthz                         the process is up
+    /readyz                          503 until warm-up is done (see warmup.py)
+
+A single asyncio event loop serves keep-alive HTTP/1.1 connections. Every
+call into data_access runs on a worker thread, since any of them can load a
+cache, query SQLite or extend the Quote of the Day schedule; the loop only
+parses requests and serves cached response bodies. Cacheable responses carry
+an ETag and are answered with 304 when the client already has them.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import signal
+import traceback
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+import data_access
+import warmup
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+# Response bodies kept for cacheable endpoints, keyed by (path, query, data version)
+RESPONSE_CACHE_SIZE = 4096
+QUOTE_FIELDS = ('id', 'quote_text', 'author', 'category', 'inspiration', 'created_date')
+MOOD_FIELDS = ('id', 'quote_text', 'author', 'mood_category')
+# Request bodies are read and discarded; anything bigger is refused
+MAX_BODY = 1 << 20
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def public_quote(quote, fields=QUOTE_FIELDS):
+    return {field: quote[field] for field in fields if field in quote} if quote else None
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        prefix, rank, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        return bool(prefix), float(rank), int(last_id)
+    except (ValueError, TypeError):
+        raise HttpError(400, "invalid cursor")
+
+
+async def blocking(function, *args):
+    """Run data_access work on a worker thread so the event loop keeps serving other connections"""
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+def cache_version():
+    return data_access.get_quote_cache().version
+
+
+def known_quote(quote_id):
+    """(cache version, whether the quote exists)"""
+    return cache_version(), data_access.get_quote(quote_id) is not None
+
+
+def mood_payload(query):
+    try:
+        quote, tier = data_access.match_mood(
+            query.get('mood', ''), query.get('gender', 'both'), int(query.get('age', 25)),
+            query.get('social_life', 'balanced'), query.get('professional_life', 'balanced'))
+    except ValueError:
+        raise HttpError(400, "age must be a number")
+    if quote is None:
+        return {'tier': 'fallback', 'quote': public_quote(data_access.get_random_quote())}
+    return {'tier': tier, 'quote': public_quote(quote, MOOD_FIELDS)}
+
+
+def seconds_until_midnight():
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(1, int((tomorrow - now).total_seconds()))
+
+
+class QuoteApi:
+    def __init__(self):
+        self.responses = OrderedDict()
+
+    def cached(self, key, build):
+        """Serve a cacheable body from memory, building it on the first request"""
+        entry = self.responses.get(key)
+        if entry is not None:
+            self.responses.move_to_end(key)
+            return entry
+        body = json.dumps(build(), separators=(',', ':')).encode()
+        entry = (body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"')
+        self.responses[key] = entry
+        if len(self.responses) > RESPONSE_CACHE_SIZE:
+            self.responses.popitem(last=False)
+        return entry
+
+    async def handle(self, path, query):
+        """Return (status, body, etag, cache_control)"""
+        if path == '/healthz':
+            return 200, b'{"status":"ok"}', None, 'no-store'
+        if path == '/readyz':
+            if not warmup.ready.is_set():
+                return 503, b'{"ready":false}', None, 'no-store'
+            body = json.dumps({'ready': True, 'warmup_seconds': round(warmup.timings['total'], 3)}).encode()
+            return 200, body, None, 'no-store'
+        if path == '/api/random':
+            categories = [name.strip() for name in query.get('category', '').split(',') if name.strip()]
+            quote = await blocking(data_access.get_random_quote, categories)
+            return 200, json.dumps(public_quote(quote), separators=(',', ':')).encode(), None, 'no-store'
+        if path == '/api/quote-of-the-day':
+            today = date.today()
+            key = (path, today.isoformat(), await blocking(cache_version))
+            entry = self.responses.get(key)
+            if entry is None:
+                quote = await blocking(data_access.get_quote_of_the_day, today)
+                entry = self.cached(key, lambda: {'date': today.isoformat(), 'quote': public_quote(quote)})
+            body, etag = entry
+            return 200, body, etag, f'public, max-age={seconds_until_midnight()}'
+        if path == '/api/similar':
+            try:
+                quote_id, k = int(query.get('id', '')), min(50, max(1, int(query.get('k', 5))))
+            except ValueError:
+                raise HttpError(400, "id and k must be numbers")
+            version, exists = await blocking(known_quote, quote_id)
+            if not exists:
+                raise HttpError(404, "no such quote")
+            key = (path, quote_id, k, version)
+            entry = self.responses.get(key)
+            if entry is None:
+                similar = await blocking(data_access.more_like_this, quote_id, k)
+                payload = {'id': quote_id,
+                           'similar': [dict(public_quote(quote), score=round(score, 4)) for quote, score in similar]}
+                entry = self.cached(key, lambda: payload)
+            body, etag = entry
+            return 200, body, etag, 'public, max-age=60'
+        if path == '/api/mood':
+            body = await blocking(mood_payload, query)
+            return 200, json.dumps(body, separators=(',', ':')).encode(), None, 'no-store'
+        if path == '/api/search':
+            text = query.get('q', '').strip()
+            if len(text) < 2:
+                raise HttpError(400, "q must be at least 2 characters")
+            try:
+                limit = min(50, max(1, int(query.get('limit', 10))))
+            except ValueError:
+                raise HttpError(400, "limit must be a number")
+            after = decode_cursor(query.get('after'))
+            key = (path, text.casefold(), limit, after, await blocking(cache_version))
+            entry = self.responses.get(key)
+            if entry is None:
+                results, next_cursor = await blocking(data_access.search, text, limit, after)
+                payload = {'results': [{k: result[k] for k in ('id', 'quote_text', 'author', 'category', 'snippet')}
+                                       for result in results],
+                           'next': encode_cursor(next_cursor)}
+                entry = self.cached(key, lambda: payload)
+            body, etag = entry
+            return 200, body, etag, 'public, max-age=60'
+        raise HttpError(404, "not found")
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self.respond(writer, 400, b'{"error":"bad request line"}', keep_alive=False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get('content-length', '0')
+                if not length.isdigit() or int(length) > MAX_BODY:
+                    await self.respond(writer, 400, b'{"error":"bad content-length"}', keep_alive=False)
+                    return
+                if int(length):
+                    try:
+                        await reader.readexactly(int(length))
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        return
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+                url = urlsplit(target)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                etag = cache_control = None
+                try:
+                    if method not in ('GET', 'HEAD'):
+                        raise HttpError(405, "only GET is supported")
+                    status, body, etag, cache_control = await self.handle(url.path, query)
+                except HttpError as e:
+                    status, body = e.status, json.dumps({'error': e.message}).encode()
+                except Exception:
+                    # The details go to the log, not to the client
+                    print(f"❌ {method} {target} failed:", flush=True)
+                    traceback.print_exc()
+                    status, body = 500, b'{"error":"internal error"}'
+                if etag is not None and headers.get('if-none-match') == etag:
+                    status, body = 304, b''
+                await self.respond(writer, status, body, etag, cache_control, keep_alive, method == 'HEAD')
+                if not keep_alive:
+                    return
+        except asyncio.CancelledError:
+            # Shutting down: end the connection without a traceback per open connection
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, body, etag=None, cache_control=None, keep_alive=True, head=False):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}",
+                 "Content-Type: application/json",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if etag:
+            lines.append(f"ETag: {etag}")
+        if cache_control:
+            lines.append(f"Cache-Control: {cache_control}")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (b'' if head else body))
+        await writer.drain()
+
+
+async def serve(host, port, ready=None):
+    api = QuoteApi()
+    server = await asyncio.start_server(api.serve_connection, host, port, backlog=1024)
+    print(f"🚀 Quotes API listening on http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+    # Answer /healthz right away, and /readyz once the caches are loaded
+    warmup.start()
+    if ready is not None:
+        ready.set()
+    # SIGTERM (e.g. from a process manager) returns from here, so the open
+    # connections are cancelled quietly and the atexit handlers run
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    async with server:
+        await stop.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve quotes as JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""Benchmarks for the data-access hot paths at different corpus sizes
+
+Builds synthetic databases with the setup_database() schema and times the
+operations the app does on every interaction. Results are written as JSON and
+compared against benchmarks/baseline.json:
+
+    python benchmarks/bench.py                       # 1k, 10k, 100k rows
+    python benchmarks/bench.py --sizes 1000 10000000 # up to 10M rows
+    python benchmarks/bench.py --update-baseline     # store this run as the baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import setup  # noqa: E402
+from db import ConnectionPool, open_connection  # noqa: E402
+from dedup import content_hash  # noqa: E402
+from loader import BulkLoader, QUOTE_COLUMNS, MOOD_QUOTE_COLUMNS, QUOTE_UPSERT, MOOD_QUOTE_UPSERT  # noqa: E402
+from mood_matcher import MoodMatcher  # noqa: E402
+from quote_cache import QuoteCache  # noqa: E402
+from sampler import QuoteSampler  # noqa: E402
+from search import search_quotes  # noqa: E402
+
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_SIZES = [1000, 10000, 100000]
+# A benchmark regresses when its median is this much slower than the baseline,
+# and by more than MIN_DELTA_US so sub-microsecond jitter doesn't fail a run
+DEFAULT_THRESHOLD = 0.5
+MIN_DELTA_US = 5
+
+# Quotes mix a few very common words with a long tail of rarer ones, roughly
+# like real text, so search and dedup see realistic posting-list lengths
+WORDS = ("life love dream courage success wisdom happiness hope change time work heart mind "
+         "fear light world journey future people friend peace truth power strength faith").split()
+RARE_WORDS = [f"term{i}" for i in range(50000)]
+CATEGORIES = ["Motivation", "Life", "Love", "Success", "Career", "Dreams", "Perseverance",
+              "Courage", "Opportunity", "Happiness", "Wisdom", "Innovation", "Inspiration"]
+MOODS = ['happy', 'sad', 'motivated', 'stressed', 'love', 'career', 'angry', 'confused']
+
+
+def synthetic_text(rng, low, high):
+    return ' '.join(rng.choice(WORDS) if rng.random() < 0.3 else rng.choice(RARE_WORDS)
+                    for _ in range(rng.randint(low, high)))
+
+
+def synthetic_quotes(count, rng, start=0):
+    for i in range(start, start + count):
+        text = synthetic_text(rng, 6, 20) + f' #{i}'
+        yield (text, f"Author {rng.randrange(5000)}", rng.choice(CATEGORIES), 'benchmark', content_hash(text),
+               'benchmark')
+
+
+def synthetic_mood_quotes(count, rng):
+    for i in range(count):
+        text = synthetic_text(rng, 6, 16) + f' #{i}'
+        mood = rng.choice(MOODS)
+        yield (text, f"Author {rng.randrange(500)}", mood,
+               rng.choice(['both', 'both', 'both', 'girl', 'boy']), rng.randint(15, 25), rng.randint(45, 80),
+               rng.choice(['good', 'not good', 'balanced']), rng.choice(['good', 'struggling', 'balanced']),
+               content_hash(text, mood))
+
+
+def build_database(path, size, seed=42):
+    """Create a database of the given size; returns the load time in seconds"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    setup.create_tables(cursor)
+    setup.ensure_content_hashes(conn)
+    setup.drop_indexes(cursor)
+    started = time.perf_counter()
+    with BulkLoader(conn, batch_size=20000) as loader:
+        loader.load('quotes', QUOTE_COLUMNS, synthetic_quotes(size, rng), QUOTE_UPSERT)
+        loader.load('mood_quotes', MOOD_QUOTE_COLUMNS, synthetic_mood_quotes(max(size // 10, 100), rng),
+                    MOOD_QUOTE_UPSERT)
+    setup.create_indexes(cursor)
+    setup.create_search_index(cursor)
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed
+
+
+def timed(fn, repeat, warmup=3):
+    """Run fn repeat times and summarise the per-call latency in microseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - started) / 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'median_us': round(statistics.median(samples), 2),
+        'p95_us': round(samples[int(len(samples) * 0.95) - 1], 2),
+        'mean_us': round(statistics.fmean(samples), 2),
+    }
+
+
+def bench_size(directory, size, repeat):
+    path = os.path.join(directory, f'bench_{size}.db')
+    load_seconds = build_database(path, size)
+    results = {
+        'setup_load': {'runs': 1, 'median_us': round(load_seconds * 1e6, 2),
+                       'rows_per_second': round(size / load_seconds)},
+    }
+    conn = open_connection(path)
+    rng = random.Random(7)
+
+    # Random quote selection: the old query, the sampler and the shared cache
+    slow_repeat = max(5, min(repeat, 2000000 // size))
+    results['random_quote_order_by_random'] = timed(
+        lambda: conn.execute("SELECT * FROM quotes ORDER BY RANDOM() LIMIT 1").fetchone(), slow_repeat)
+    sampler = QuoteSampler()
+    results['random_quote_sampler'] = timed(lambda: sampler.random_quote(conn), repeat)
+    cache = QuoteCache(path)
+    results['random_quote_cache'] = timed(cache.random_quote, repeat)
+
+    # Mood matching: the old SQL query and the in-memory matcher
+    def profile():
+        return (rng.choice(MOODS), rng.choice(['girl', 'boy', 'both']), rng.randint(15, 80),
+                rng.choice(['good', 'not good', 'balanced']), rng.choice(['good', 'struggling', 'balanced']))
+
+    def mood_sql():
+        mood, gender, age, social, professional = profile()
+        conn.execute('''
+            SELECT * FROM mood_quotes
+            WHERE mood_category = ?
+            AND (gender_preference = ? OR gender_preference = 'both')
+            AND min_age <= ? AND max_age >= ?
+            AND (social_life = ? OR social_life = 'balanced')
+            AND (professional_life = ? OR professional_life = 'balanced')
+            ORDER BY RANDOM() LIMIT 1
+        ''', (mood, gender, age, age, social, professional)).fetchone()
+    results['mood_match_sql'] = timed(mood_sql, slow_repeat)
+    matcher = MoodMatcher(path)
+    results['mood_match_index'] = timed(lambda: matcher.match(*profile()), repeat)
+
+    # Search: a rare word on its own and together with a common one
+    results['search_rare_word'] = timed(
+        lambda: search_quotes(conn, rng.choice(RARE_WORDS)), max(20, repeat // 10))
+    results['search_two_words'] = timed(
+        lambda: search_quotes(conn, f"{rng.choice(WORDS)} {rng.choice(RARE_WORDS)}"), max(20, repeat // 10))
+
+    # Writes: one Add Quote style insert per transaction, and bulk batches
+    pool = ConnectionPool(path)
+    counter = iter(range(10 ** 9))
+
+    def single_insert():
+        text = f"single insert benchmark {next(counter)}"
+        with pool.writer() as writer:
+            writer.execute('''
+                INSERT INTO quotes (quote_text, author, category, inspiration, content_hash)
+                VALUES (?, ?, ?, ?, ?) ON CONFLICT(content_hash) DO NOTHING
+            ''', (text, 'Bench', 'Wisdom', None, content_hash(text)))
+    results['single_insert'] = timed(single_insert, max(20, repeat // 10))
+    pool.close()
+
+    bulk_rows = 10000
+    bulk_conn = sqlite3.connect(path)
+    start = size + 10 ** 8
+    started = time.perf_counter()
+    with BulkLoader(bulk_conn) as loader:
+        loader.load('quotes', QUOTE_COLUMNS, synthetic_quotes(bulk_rows, rng, start), QUOTE_UPSERT)
+    elapsed = time.perf_counter() - started
+    bulk_conn.close()
+    results['bulk_insert_10k'] = {'runs': 1, 'median_us': round(elapsed * 1e6, 2),
+                                  'rows_per_second': round(bulk_rows / elapsed)}
+
+    conn.close()
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Return a list of (size, benchmark, baseline_us, current_us, ratio) regressions"""
+    regressions = []
+    for size, benches in current['results'].items():
+        for name, result in benches.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if not base or not base.get('median_us'):
+                continue
+            ratio = result['median_us'] / base['median_us']
+            if ratio > 1 + threshold and result['median_us'] - base['median_us'] > MIN_DELTA_US:
+                regressions.append((size, name, base['median_us'], result['median_us'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="quote counts to test")
+    parser.add_argument('--repeat', type=int, default=1000, help="timed calls per fast benchmark")
+    parser.add_argument('--output', default='bench_output.json', help="where to write this run's results")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--update-baseline', action='store_true', help="save this run as the new baseline")
+    parser.add_argument('--keep', help="directory to keep the generated databases in")
+    args = parser.parse_args()
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.keep or tmp
+        os.makedirs(directory, exist_ok=True)
+        for size in args.sizes:
+            print(f"⏱️  Benchmarking {size:,} quotes...")
+            results = bench_size(directory, size, args.repeat)
+            report['results'][str(size)] = results
+            for name, result in results.items():
+                print(f"   {name:<30} median {result['median_us']:>14,.1f} us")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results written to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("ℹ️  No baseline to compare against (run with --update-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    if not regressions:
+        print(f"✅ No regressions beyond {args.threshold:.0%} of the baseline")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%} of the baseline:")
+    for size, name, base, current, ratio in regressions:
+        print(f"   {size:>10} {name:<30} {base:>12,.1f} -> {current:>12,.1f} us ({ratio:.2f}x)")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Load test for api_server.py on a single core
+
+Starts the API server in a subprocess pinned to one CPU and drives it with
+keep-alive connections from this process:
+
+    python benchmarks/load_api.py --connections 64 --duration 10
+
+Reports requests per second and p50/p99 latency per endpoint.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    'random': lambda rng: '/api/random',
+    'quote-of-the-day': lambda rng: '/api/quote-of-the-day',
+    'mood': lambda rng: (f"/api/mood?mood={rng.choice(['happy', 'sad', 'motivated', 'stressed'])}"
+                         f"&gender={rng.choice(['girl', 'boy'])}&age={rng.randint(15, 70)}"
+                         f"&social_life=balanced&professional_life=balanced"),
+    'search': lambda rng: f"/api/search?q={rng.choice(['life', 'love', 'courage', 'success', 'dream'])}",
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, cpu):
+    code = (f"import os, sys; os.sched_setaffinity(0, {{{cpu}}}) if hasattr(os, 'sched_setaffinity') else None; "
+            f"sys.argv = ['api_server.py', '--port', '{port}']; import api_server; api_server.main()")
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=args.cwd or ROOT,
+                               env=dict(os.environ, PYTHONPATH=ROOT),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    line = process.stdout.readline()
+    if 'listening' not in line:
+        process.kill()
+        raise SystemExit(f"API server failed to start: {line}{process.stdout.read()}")
+    # Measure the warm server, not its warm-up
+    while line and 'Warmed up' not in line:
+        line = process.stdout.readline()
+    # Keep reading its output so the server never blocks on a full pipe
+    threading.Thread(target=process.stdout.read, daemon=True).start()
+    return process
+
+
+async def client(port, deadline, rng, latencies, etags):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    names = list(ENDPOINTS)
+    while time.perf_counter() < deadline:
+        name = rng.choice(names)
+        path = ENDPOINTS[name](rng)
+        extra = f"If-None-Match: {etags[path]}\r\n" if path in etags else ''
+        started = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n".encode())
+        head = await reader.readuntil(b'\r\n\r\n')
+        headers = dict(line.split(': ', 1) for line in head.decode('latin-1').split('\r\n')[1:] if ': ' in line)
+        await reader.readexactly(int(headers.get('Content-Length', 0)))
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+        if 'ETag' in headers:
+            etags[path] = headers['ETag']
+    writer.close()
+
+
+def percentile(samples, point):
+    return samples[min(len(samples) - 1, int(len(samples) * point / 100))]
+
+
+async def run(port):
+    latencies = {}
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, deadline, random.Random(i), latencies, {})
+                           for i in range(args.connections)))
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    port = free_port()
+    cpu = sorted(os.sched_getaffinity(0))[0] if hasattr(os, 'sched_getaffinity') else 0
+    server = start_server(port, cpu)
+    try:
+        latencies, elapsed = asyncio.run(run(port))
+    finally:
+        server.terminate()
+        server.wait()
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"⏱️  {total:,} requests over {args.connections} connections in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f} req/s, server pinned to CPU {cpu})")
+    for name, samples in sorted(latencies.items()):
+        samples.sort()
+        print(f"   {name:<18} {len(samples):>8,} req   p50 {percentile(samples, 50) * 1000:7.2f} ms"
+              f"   p99 {percentile(samples, 99) * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--cwd', help="directory to run the server in (where database/data.db lives)")
+    args = parser.parse_args()
+    main()
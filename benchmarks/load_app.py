@@ -0,0 +1,195 @@
+"""Concurrent-session load test for streamlit_app.py
+
+Runs the app headless against a seeded database and drives it with N
+simulated browser tabs at once, each clicking through the pages: generating
+quotes, adding favorites and quotes, saving details, submitting the mood form
+and searching. Concurrency is stepped up and every step is reported:
+
+    python benchmarks/load_app.py                          # 1, 4, 16 and 32 sessions
+    python benchmarks/load_app.py --sessions 8 64 --duration 30 --size 100000
+    python benchmarks/load_app.py --cwd /path/with/database  # use an existing database/data.db
+
+Reports throughput, p50/p99 latency per action, time spent waiting for the
+SQLite write lock (from the app's own metrics) and the server's RSS.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import bench
+from rerun_cost import PAGES
+from streamlit_client import StreamlitSession, free_port, start_server
+
+DEFAULT_SESSIONS = [1, 4, 16, 32]
+METRICS_INTERVAL = 1.0
+LOCK_WAIT = 'sqlite_write_lock_wait_seconds'
+ENQUEUE_WAIT = 'write_queue_enqueue_wait_seconds'
+
+
+def seed_database(directory, size):
+    os.makedirs(os.path.join(directory, 'database'), exist_ok=True)
+    print(f"🌱 Seeding {size:,} quotes into {directory}/database/data.db")
+    bench.build_database(os.path.join(directory, 'database', 'data.db'), size)
+
+
+def rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def read_histogram(path, name):
+    """(count, sum, {upper bound: cumulative count}) of one histogram in a Prometheus text file"""
+    count, total, buckets = 0, 0.0, {}
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return count, total, buckets
+    for line in lines:
+        if not line.startswith(name):
+            continue
+        series, value = line.rsplit(' ', 1)
+        if series.startswith(f"{name}_count"):
+            count += int(float(value))
+        elif series.startswith(f"{name}_sum"):
+            total += float(value)
+        elif series.startswith(f"{name}_bucket"):
+            bound = float(series.split('le="', 1)[1].split('"', 1)[0])
+            buckets[bound] = buckets.get(bound, 0) + int(float(value))
+    return count, total, buckets
+
+
+def histogram_delta(before, after):
+    """Waits between two snapshots: count, total seconds and the bucket bound holding the p99"""
+    count = after[0] - before[0]
+    total = after[1] - before[1]
+    p99 = None
+    if count:
+        for bound in sorted(after[2]):
+            if after[2][bound] - before[2].get(bound, 0) >= count * 0.99:
+                p99 = bound
+                break
+    return {'count': count, 'total_seconds': round(total, 4), 'p99_bucket_seconds': p99}
+
+
+def percentile(samples, point):
+    return samples[min(len(samples) - 1, int(len(samples) * point / 100))]
+
+
+async def user(port, deadline, rng, latencies, errors):
+    """One browser tab clicking through random pages until the deadline"""
+    session = StreamlitSession(port)
+    await session.connect()
+    round_number = 0
+    try:
+        while time.perf_counter() < deadline:
+            page = rng.choice(list(PAGES))
+            session.set_value('Navigate to:', 'string_value', page)
+            record(f"{page}: open page", await session.rerun(), latencies, errors)
+            for name, pending in PAGES[page](session, round_number):
+                record(f"{page}: {name}", await pending, latencies, errors)
+            round_number += 1
+    finally:
+        await session.close()
+
+
+def record(name, run, latencies, errors):
+    latencies.setdefault(name, []).append(run.seconds)
+    if run.status is None or 'SUCCESSFULLY' not in run.status:
+        errors[name] = errors.get(name, 0) + 1
+
+
+async def export_metrics(port):
+    """A full page load makes the app write its metrics file (at most once per interval)"""
+    await asyncio.sleep(METRICS_INTERVAL + 0.1)
+    session = StreamlitSession(port)
+    await session.connect()
+    await session.close()
+
+
+async def step(port, sessions, duration, metrics_path, server_pid):
+    await export_metrics(port)
+    lock_before = read_histogram(metrics_path, LOCK_WAIT)
+    enqueue_before = read_histogram(metrics_path, ENQUEUE_WAIT)
+    latencies, errors = {}, {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(user(port, deadline, random.Random(i), latencies, errors) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    rss = rss_bytes(server_pid)
+    await export_metrics(port)
+
+    actions = {}
+    for name, samples in sorted(latencies.items()):
+        samples.sort()
+        actions[name] = {'count': len(samples), 'errors': errors.get(name, 0),
+                         'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                         'p99_ms': round(percentile(samples, 99) * 1000, 2)}
+    total = sum(action['count'] for action in actions.values())
+    return {'sessions': sessions, 'seconds': round(elapsed, 2), 'actions': total,
+            'actions_per_second': round(total / elapsed, 1), 'errors': sum(errors.values()),
+            'rss_mb': round(rss / 2 ** 20, 1) if rss else None,
+            'write_lock_wait': histogram_delta(lock_before, read_histogram(metrics_path, LOCK_WAIT)),
+            'write_queue_enqueue_wait': histogram_delta(enqueue_before, read_histogram(metrics_path, ENQUEUE_WAIT)),
+            'per_action': actions}
+
+
+def report(result):
+    lock = result['write_lock_wait']
+    print(f"\n👥 {result['sessions']} sessions: {result['actions_per_second']:,.1f} actions/s, "
+          f"{result['errors']} errors, RSS {result['rss_mb']} MB")
+    print(f"   write lock waits: {lock['count']:,} totalling {lock['total_seconds'] * 1000:,.1f} ms"
+          + (f", p99 <= {lock['p99_bucket_seconds'] * 1000:g} ms" if lock['p99_bucket_seconds'] else ''))
+    for name, action in result['per_action'].items():
+        print(f"   {name:<48} {action['count']:>7,}  p50 {action['p50_ms']:>8.1f} ms  p99 {action['p99_ms']:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS)
+    parser.add_argument('--duration', type=float, default=15.0, help="seconds per concurrency step")
+    parser.add_argument('--size', type=int, default=10000, help="quotes to seed when --cwd isn't given")
+    parser.add_argument('--cwd', help="directory with an existing database/data.db to run the app in")
+    parser.add_argument('--cpu', type=int, help="pin the app to this CPU")
+    parser.add_argument('--output', default='load_app.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        cwd = args.cwd
+        if cwd is None:
+            cwd = scratch
+            seed_database(cwd, args.size)
+        metrics_path = os.path.join(scratch, 'metrics.prom')
+        port = free_port()
+        server = start_server(port, cwd=cwd, cpu=args.cpu,
+                              env={'QUOTES_METRICS': '1', 'QUOTES_METRICS_FILE': metrics_path,
+                                   'QUOTES_METRICS_INTERVAL': str(METRICS_INTERVAL)})
+        results = []
+        try:
+            for sessions in args.sessions:
+                result = asyncio.run(step(port, sessions, args.duration, metrics_path, server.pid))
+                report(result)
+                results.append(result)
+        finally:
+            server.terminate()
+            server.wait()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Per-interaction cost of streamlit_app.py: rerun time and bytes sent to the browser
+
+Runs the app headless, connects over the websocket like a browser and times
+each page load and button press until the server reports the run finished,
+along with the server's CPU time per interaction (Linux only):
+
+    python benchmarks/rerun_cost.py --cwd /path/with/database --output after.json
+    python benchmarks/rerun_cost.py --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+
+from streamlit_client import StreamlitSession, free_port, start_server
+
+
+def quote_of_the_day(session, i):
+    return [('click Generate New Quote', session.click('Generate New Quote')),
+            ('click Add to Favorites', session.click('Add to Favorites'))]
+
+
+def add_quote(session, i):
+    session.set_value('Quote Text*', 'string_value', f"Rerun benchmark quote {i} {id(session)}")
+    session.set_value('Author Name*', 'string_value', 'Benchmark')
+    return [('submit Save Quote', session.click('Save Quote'))]
+
+
+def personal_details(session, i):
+    session.set_value('Full Name*', 'string_value', 'Benchmark')
+    session.set_value('Email Address*', 'string_value', 'bench@example.com')
+    return [('submit Save Details', session.click('Save Details'))]
+
+
+def mood_quotes(session, i):
+    return [('submit Get Personalized Quote', session.click('Get Personalized Quote'))]
+
+
+def search(session, i):
+    session.set_value('Search quotes and authors', 'string_value', ['life', 'love', 'courage'][i % 3])
+    return [('type a search', session.rerun())]
+
+
+PAGES = {
+    "Quote of the Day": quote_of_the_day,
+    "Add Quote": add_quote,
+    "Personal Details": personal_details,
+    "Mood Wise Quotes": mood_quotes,
+    "Search": search,
+}
+
+
+async def measure(port, rounds, server_pid=None):
+    samples = {}
+
+    def record(name, run):
+        if run.status is None or 'SUCCESSFULLY' not in run.status:
+            raise RuntimeError(f"{name} finished with {run.status}")
+        samples.setdefault(name, []).append(run)
+
+    session = StreamlitSession(port, server_pid=server_pid)
+    record('first load', await session.connect())
+    for i in range(rounds):
+        for page, actions in PAGES.items():
+            session.set_value('Navigate to:', 'string_value', page)
+            record(f"{page}: open page", await session.rerun())
+            for name, pending in actions(session, i):
+                record(f"{page}: {name}", await pending)
+    await session.close()
+    return {name: {'runs': len(runs),
+                   'median_ms': round(statistics.median(run.seconds for run in runs) * 1000, 2),
+                   'server_cpu_ms': (round(statistics.fmean(run.cpu_seconds for run in runs) * 1000, 2)
+                                     if runs[0].cpu_seconds is not None else None),
+                   'median_bytes': int(statistics.median(run.bytes for run in runs)),
+                   'median_messages': int(statistics.median(run.messages for run in runs))}
+            for name, runs in samples.items()}
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'interaction':<46} {'before ms':>10} {'after ms':>10} {'before cpu':>10} {'after cpu':>10} "
+          f"{'before B':>10} {'after B':>10}")
+    for name, result in after.items():
+        old = before.get(name)
+        if old is None:
+            continue
+        print(f"{name:<46} {old['median_ms']:>10.1f} {result['median_ms']:>10.1f} "
+              f"{old.get('server_cpu_ms') or 0:>10.1f} {result.get('server_cpu_ms') or 0:>10.1f} "
+              f"{old['median_bytes']:>10,} {result['median_bytes']:>10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--cwd', help="directory to run the app in (where database/data.db lives)")
+    parser.add_argument('--output', default='rerun_cost.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    port = free_port()
+    server = start_server(port, cwd=args.cwd)
+    try:
+        results = asyncio.run(measure(port, args.rounds, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+    for name, result in results.items():
+        print(f"   {name:<46} {result['median_ms']:>8.1f} ms {result['server_cpu_ms'] or 0:>8.1f} ms cpu "
+              f"{result['median_bytes']:>8,} bytes")
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📄 Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Minimal Streamlit websocket client for benchmarks
+
+Speaks the same protocol as the browser: sends BackMsg rerun requests with
+widget states and reads ForwardMsgs until the script (or fragment) run
+finishes, recording the time taken and the bytes received. Needs the
+"bench" extra (`pip install -e .[bench]` or `uv sync --extra bench`).
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import websockets
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINISHED = {ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+            ForwardMsg.FINISHED_WITH_COMPILE_ERROR}
+WIDGET_TYPES = {'button', 'selectbox', 'text_input', 'text_area', 'slider', 'number_input', 'radio'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, cwd=None, env=None, cpu=None):
+    """Run streamlit_app.py headless on port; returns the process once it accepts connections"""
+    command = [sys.executable, '-m', 'streamlit', 'run', os.path.join(ROOT, 'streamlit_app.py'),
+               '--server.headless', 'true', '--server.port', str(port),
+               '--browser.gatherUsageStats', 'false', '--server.fileWatcherType', 'none']
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        command = ['taskset', '-c', str(cpu)] + command
+    process = subprocess.Popen(command, cwd=cwd or ROOT, env=dict(os.environ, **(env or {})),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("streamlit did not start")
+
+
+def cpu_seconds(pid):
+    """User + system CPU time of a process (Linux), or None where /proc isn't available"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+class Run:
+    __slots__ = ('seconds', 'cpu_seconds', 'bytes', 'messages', 'elements', 'status')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.cpu_seconds = None
+        self.bytes = 0
+        self.messages = 0
+        self.elements = 0
+        self.status = None
+
+
+class StreamlitSession:
+    """One browser tab"""
+
+    def __init__(self, port, query_string='', server_pid=None):
+        self.server_pid = server_pid
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.query_string = query_string
+        self.ws = None
+        self.socket = None
+        self.widgets = {}
+        self.values = {}
+        self.page_script_hash = ''
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+        self.socket = self.ws.transport.get_extra_info('socket')
+        return await self.rerun()
+
+    def quick_ack(self):
+        # The server writes many small frames; with Nagle on its side and
+        # delayed ACKs on ours every run would stall ~40 ms on loopback
+        if hasattr(socket, 'TCP_QUICKACK'):
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def widget(self, label, kind=None):
+        for (widget_kind, widget_label), info in self.widgets.items():
+            if widget_label == label and (kind is None or widget_kind == kind):
+                return info
+        raise KeyError(f"no widget labelled {label!r}")
+
+    def set_value(self, label, field, value):
+        """Change a widget's value for the next rerun, like typing into it"""
+        widget_id, _ = self.widget(label)
+        state = WidgetState(id=widget_id)
+        setattr(state, field, value)
+        self.values[widget_id] = state
+
+    async def click(self, label):
+        """Press a button (or form submit button); reruns only its fragment if it is in one"""
+        widget_id, fragment_id = self.widget(label, 'button')
+        return await self.rerun(trigger=widget_id, fragment_id=fragment_id)
+
+    async def rerun(self, trigger=None, fragment_id=''):
+        message = BackMsg()
+        state = message.rerun_script
+        state.query_string = self.query_string
+        state.page_script_hash = self.page_script_hash
+        state.fragment_id = fragment_id
+        state.widget_states.widgets.extend(self.values.values())
+        if trigger is not None:
+            state.widget_states.widgets.append(WidgetState(id=trigger, trigger_value=True))
+        if not fragment_id:
+            self.widgets = {}
+
+        run = Run()
+        cpu_started = cpu_seconds(self.server_pid) if self.server_pid else None
+        started = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        while True:
+            self.quick_ack()
+            data = await self.ws.recv()
+            run.bytes += len(data)
+            run.messages += 1
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = msg.new_session.page_script_hash
+            elif kind == 'delta':
+                run.elements += 1
+                self.track(msg.delta)
+            elif kind == 'script_finished' and msg.script_finished in FINISHED:
+                run.status = ForwardMsg.ScriptFinishedStatus.Name(msg.script_finished)
+                break
+        run.seconds = time.perf_counter() - started
+        if cpu_started is not None:
+            # Clock-tick resolution; only meaningful averaged over many runs
+            run.cpu_seconds = cpu_seconds(self.server_pid) - cpu_started
+        return run
+
+    def track(self, delta):
+        if delta.WhichOneof('type') != 'new_element':
+            return
+        element = delta.new_element
+        kind = element.WhichOneof('type')
+        if kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            self.widgets[(kind, widget.label)] = (widget.id, delta.fragment_id)
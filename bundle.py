@@ -0,0 +1,189 @@
+"""Static export of the quotes for serving without Python or SQLite
+
+    python setup.py --bundle site/
+
+writes a directory any static file server can serve:
+
+    index.json              shard list with counts and digests, categories, schedule range
+    index.html              redirects to today's page in the visitor's time zone
+    style.css               the app's stylesheet
+    quotes/00042.json.gz    quotes with ids 42000-42999, each with its rendered card
+    daily.json              the Quote of the Day schedule, date -> quote id
+    daily/2024-06-01.html   that day's quote as a ready-made page
+
+Shards are gzip-compressed JSON (serve them with Content-Encoding: gzip,
+e.g. nginx's gzip_static). A quote's shard is id // shard_size, and a random
+quote is a random entry of a random shard. Cards are rendered with the same
+quote-container template as streamlit_app.py.
+
+Re-exports are incremental: a shard's digest covers its rows and the card
+template, and a shard whose digest matches index.json is neither rendered
+nor rewritten.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import date, timedelta
+from itertools import groupby
+
+from corpus import CHUNK_ROWS
+from page_assets import QUOTE_CARD, STYLE, header, quote_card
+
+FORMAT = 1
+SHARD_SIZE = 1000
+# Past days kept in the bundle, for visitors whose date is behind the server's
+PAST_DAYS = 7
+FIELDS = ('id', 'quote_text', 'author', 'category', 'inspiration')
+# Changing the card markup or the record layout must invalidate every shard
+TEMPLATE_DIGEST = hashlib.blake2b(f"{FORMAT}|{QUOTE_CARD}|{FIELDS}".encode(), digest_size=8).hexdigest()
+
+DAILY_PAGE = ('<!doctype html><html lang="en"><head><meta charset="utf-8">'
+              '<meta name="viewport" content="width=device-width,initial-scale=1">'
+              '<title>Quote of the Day · {day}</title><link rel="stylesheet" href="../style.css"></head>'
+              '<body>{header}{card}</body></html>')
+INDEX_PAGE = '''<!doctype html><html lang="en"><head><meta charset="utf-8"><title>Quote of the Day</title>
+<script>
+var d = new Date(), p = function (n) { return (n < 10 ? '0' : '') + n; };
+location.replace('daily/' + d.getFullYear() + '-' + p(d.getMonth() + 1) + '-' + p(d.getDate()) + '.html');
+</script></head><body></body></html>
+'''
+
+
+def write_file(path, data):
+    """Write bytes through a temporary file so a server never sends a partial file"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def write_if_changed(path, data):
+    """Write unless the file already holds exactly this; returns True if it wrote"""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    write_file(path, data)
+    return True
+
+
+def compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def shard_name(number):
+    return f"{number:05d}"
+
+
+def shard_digest(rows):
+    digest = hashlib.blake2b(TEMPLATE_DIGEST.encode(), digest_size=16)
+    for row in rows:
+        digest.update(repr(tuple(row)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_shard(rows):
+    """Compressed JSON for a shard: every quote with its card markup"""
+    # Each card is rendered once, so skip quote_card's cache rather than churn it
+    render = quote_card.__wrapped__
+    quotes = [dict(zip(FIELDS, row), card=render(row[1], row[2], row[3])) for row in rows]
+    # mtime=0 keeps the bytes identical for identical content
+    return gzip.compress(compact_json({'quotes': quotes}), compresslevel=9, mtime=0)
+
+
+def read_index(directory):
+    try:
+        with open(os.path.join(directory, 'index.json'), 'rb') as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return index if index.get('format') == FORMAT and index.get('shard_size') == SHARD_SIZE else None
+
+
+def schedule(conn, today):
+    """(day, quote id) pairs from PAST_DAYS ago to the end of the schedule"""
+    try:
+        return conn.execute("SELECT day, quote_id FROM daily_quotes WHERE day >= ? ORDER BY day",
+                            ((today - timedelta(days=PAST_DAYS)).isoformat(),)).fetchall()
+    except sqlite3.OperationalError:
+        # Database from before the schedule existed
+        return []
+
+
+def export_bundle(conn, directory, today=None, batch_size=CHUNK_ROWS):
+    """Write or update a static bundle; returns counts of what was written, kept and removed"""
+    today = today or date.today()
+    os.makedirs(os.path.join(directory, 'quotes'), exist_ok=True)
+    os.makedirs(os.path.join(directory, 'daily'), exist_ok=True)
+    previous = read_index(directory) or {'shards': {}}
+    stats = {'quotes': 0, 'shards': 0, 'written': 0, 'unchanged': 0, 'removed': 0, 'days': 0, 'bytes': 0}
+
+    def rows():
+        cursor = conn.execute(f"SELECT {', '.join(FIELDS)} FROM quotes ORDER BY id")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield from batch
+
+    shards = {}
+    categories = {}
+    for number, group in groupby(rows(), key=lambda row: row[0] // SHARD_SIZE):
+        group = list(group)
+        name = shard_name(number)
+        digest = shard_digest(group)
+        path = os.path.join(directory, 'quotes', name + '.json.gz')
+        old = previous['shards'].get(name)
+        if old and old['digest'] == digest and os.path.exists(path):
+            size = old['bytes']
+            stats['unchanged'] += 1
+        else:
+            data = render_shard(group)
+            write_file(path, data)
+            size = len(data)
+            stats['written'] += 1
+        shards[name] = {'quotes': len(group), 'digest': digest, 'bytes': size}
+        for row in group:
+            categories[row[3]] = categories.get(row[3], 0) + 1
+        stats['quotes'] += len(group)
+        stats['bytes'] += size
+    for name in set(previous['shards']) - set(shards):
+        path = os.path.join(directory, 'quotes', name + '.json.gz')
+        if os.path.exists(path):
+            os.remove(path)
+        stats['removed'] += 1
+    stats['shards'] = len(shards)
+
+    # Quote of the Day: the schedule plus one page per day
+    days = schedule(conn, today)
+    placed = {}
+    for day, quote_id in days:
+        quote = conn.execute("SELECT quote_text, author, category FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        if quote is None:
+            continue
+        page = DAILY_PAGE.format(day=day, header=header("Quote of the Day"), card=quote_card(*quote))
+        write_if_changed(os.path.join(directory, 'daily', day + '.html'), page.encode('utf-8'))
+        placed[day] = quote_id
+    for name in os.listdir(os.path.join(directory, 'daily')):
+        if name[:-len('.html')] not in placed:
+            os.remove(os.path.join(directory, 'daily', name))
+    stats['days'] = len(placed)
+    write_if_changed(os.path.join(directory, 'daily.json'), compact_json(placed))
+
+    write_if_changed(os.path.join(directory, 'style.css'),
+                     STYLE.replace('<style>', '').replace('</style>', '').encode('utf-8'))
+    write_if_changed(os.path.join(directory, 'index.html'), INDEX_PAGE.encode('utf-8'))
+    # The index goes last: a reader that sees it new sees every shard it lists
+    write_file(os.path.join(directory, 'index.json'), compact_json({
+        'format': FORMAT,
+        'shard_size': SHARD_SIZE,
+        'quotes': stats['quotes'],
+        'shards': shards,
+        'categories': categories,
+        'daily': {'first': min(placed), 'last': max(placed)} if placed else None,
+    }))
+    return stats
@@ -0,0 +1,292 @@
+"""Streaming readers, writers and row validation for quote dumps (CSV, JSONL, Parquet)
+
+Files are read and written in chunks, so memory stays bounded whatever the
+size of the dump. A .gz suffix on CSV and JSONL files is compressed
+transparently. Parquet needs pyarrow, which comes with Streamlit.
+"""
+import csv
+import gzip
+import json
+import os
+import queue
+import threading
+from itertools import islice
+
+from dedup import content_hash
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+CHUNK_ROWS = 20000
+
+# Columns an import fills in, in the loader's order (content_hash is computed)
+IMPORT_COLUMNS = {
+    'quotes': ('quote_text', 'author', 'category', 'inspiration'),
+    'mood_quotes': ('quote_text', 'author', 'mood_category', 'gender_preference',
+                    'min_age', 'max_age', 'social_life', 'professional_life'),
+}
+# Columns an export writes
+EXPORT_COLUMNS = {
+    'quotes': ('id',) + IMPORT_COLUMNS['quotes'] + ('created_date',),
+    'mood_quotes': ('id',) + IMPORT_COLUMNS['mood_quotes'],
+}
+# Source column names understood without a --map, besides the column's own name
+ALIASES = {
+    'quote_text': ('text', 'quote', 'content', 'q'),
+    'author': ('by', 'a'),
+    'category': ('tag', 'topic'),
+    'mood_category': ('mood',),
+    'gender_preference': ('gender',),
+}
+INTEGER_COLUMNS = {'id', 'min_age', 'max_age'}
+MAX_TEXT_LENGTH = 2000
+GENDERS = {'both', 'girl', 'boy'}
+SOCIAL_LIFE = {'good', 'not good', 'balanced'}
+PROFESSIONAL_LIFE = {'good', 'struggling', 'balanced'}
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lstrip('.').lower()
+    extension = {'json': 'jsonl', 'ndjson': 'jsonl', 'pq': 'parquet'}.get(extension, extension)
+    if extension not in FORMATS:
+        raise ValueError(f"can't tell the format of {path}; pass one of {', '.join(FORMATS)}")
+    return extension
+
+
+def open_text(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', compresslevel=6, encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8-sig' if mode == 'r' else 'utf-8', newline='')
+
+
+def resolve_columns(table, header, mapping=None):
+    """For each import column, the source column it comes from (or None)
+
+    mapping holds explicit target=source pairs; other columns are found by
+    their own name or a known alias, case-insensitively.
+    """
+    mapping = mapping or {}
+    unknown = set(mapping) - set(IMPORT_COLUMNS[table])
+    if unknown:
+        raise ValueError(f"{table} has no column {', '.join(sorted(unknown))}")
+    by_name = {name.strip().lower(): name for name in header}
+    sources = []
+    for column in IMPORT_COLUMNS[table]:
+        if column in mapping:
+            if mapping[column] not in header:
+                raise ValueError(f"mapped column {mapping[column]!r} is not in the file")
+            sources.append(mapping[column])
+            continue
+        found = None
+        for name in (column,) + ALIASES.get(column, ()):
+            if name in by_name:
+                found = by_name[name]
+                break
+        sources.append(found)
+    if sources[0] is None:
+        raise ValueError(f"no quote text column in the file (columns: {', '.join(header)}); use --map")
+    return sources
+
+
+def read_header(path, fmt):
+    if fmt == 'csv':
+        with open_text(path, 'r') as f:
+            return next(csv.reader(f), [])
+    if fmt == 'jsonl':
+        with open_text(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                # The first object gives the columns; other lines are rejected when read
+                if isinstance(record, dict):
+                    return list(record)
+        return []
+    return parquet().parquet.ParquetFile(path).schema_arrow.names
+
+
+def read_chunks(path, fmt, sources, chunk_rows=CHUNK_ROWS):
+    """Yield lists of rows, each row the values of sources in order (None for a missing source)"""
+    if fmt == 'csv':
+        with open_text(path, 'r') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            positions = [header.index(source) if source is not None else None for source in sources]
+            while True:
+                chunk = [[row[p] if p is not None and p < len(row) else None for p in positions]
+                         for row in islice(reader, chunk_rows)]
+                if not chunk:
+                    return
+                yield chunk
+    elif fmt == 'jsonl':
+        with open_text(path, 'r') as f:
+            while True:
+                lines = list(islice(f, chunk_rows))
+                if not lines:
+                    return
+                chunk = []
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    if not isinstance(record, dict):
+                        # Rejected by the Validator like any other bad row
+                        chunk.append(None)
+                        continue
+                    chunk.append([record.get(source) if source is not None else None for source in sources])
+                yield chunk
+    else:
+        columns = [source for source in sources if source is not None]
+        for batch in parquet().parquet.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            values = {name: batch.column(i).to_pylist() for i, name in enumerate(batch.schema.names)}
+            missing = [None] * batch.num_rows
+            yield list(zip(*(values[source] if source is not None else missing for source in sources)))
+
+
+def parquet():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet support needs pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def text(value, name, required=True, default=None):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"{name} is empty")
+        return default
+    value = str(value).strip()
+    if len(value) > MAX_TEXT_LENGTH:
+        raise ValueError(f"{name} is longer than {MAX_TEXT_LENGTH} characters")
+    return value
+
+
+def choice(value, name, allowed, default):
+    value = text(value, name, required=False, default=default).lower()
+    if value not in allowed:
+        raise ValueError(f"{name} must be one of {', '.join(sorted(allowed))}, not {value!r}")
+    return value
+
+
+def age(value, name):
+    if value is None or value == '':
+        return None
+    try:
+        value = int(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} is not a number: {value!r}") from None
+    if not 0 <= value <= 150:
+        raise ValueError(f"{name} is out of range: {value}")
+    return value
+
+
+def quote_row(values):
+    quote_text, author, category, inspiration = values
+    quote_text = text(quote_text, 'quote_text')
+    return (quote_text, text(author, 'author', required=False, default='Unknown'),
+            text(category, 'category', required=False, default='General'),
+            text(inspiration, 'inspiration', required=False),
+            content_hash(quote_text))
+
+
+def mood_quote_row(values):
+    quote_text, author, mood, gender, min_age, max_age, social_life, professional_life = values
+    quote_text = text(quote_text, 'quote_text')
+    mood = text(mood, 'mood_category').lower()
+    min_age, max_age = age(min_age, 'min_age'), age(max_age, 'max_age')
+    if min_age is not None and max_age is not None and min_age > max_age:
+        raise ValueError(f"min_age {min_age} is above max_age {max_age}")
+    return (quote_text, text(author, 'author', required=False, default='Unknown'), mood,
+            choice(gender, 'gender_preference', GENDERS, 'both'), min_age, max_age,
+            choice(social_life, 'social_life', SOCIAL_LIFE, 'balanced'),
+            choice(professional_life, 'professional_life', PROFESSIONAL_LIFE, 'balanced'),
+            content_hash(quote_text, mood))
+
+
+ROW_BUILDERS = {'quotes': quote_row, 'mood_quotes': mood_quote_row}
+
+
+class Validator:
+    """Turns source rows into loader rows, counting and sampling the ones it rejects"""
+
+    def __init__(self, table, max_examples=5):
+        self.build = ROW_BUILDERS[table]
+        self.record = 1
+        self.rejected = 0
+        self.examples = []
+        self.max_examples = max_examples
+
+    def chunks(self, chunks):
+        """Yield the valid rows of each source chunk, ready for the loader"""
+        for chunk in chunks:
+            rows = []
+            for values in chunk:
+                try:
+                    if values is None:
+                        raise ValueError("not a JSON object")
+                    rows.append(self.build(values))
+                except ValueError as e:
+                    self.rejected += 1
+                    if len(self.examples) < self.max_examples:
+                        self.examples.append(f"record {self.record}: {e}")
+                self.record += 1
+            yield rows
+
+
+def read_ahead(chunks, depth=2):
+    """Run a chunk generator in a thread, up to depth chunks ahead of the consumer
+
+    Parsing, validation and hashing then overlap with SQLite inserting the
+    previous chunk, which releases the GIL while it works.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                buffer.put(chunk)
+        except BaseException as e:
+            buffer.put(e)
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def write_rows(path, fmt, columns, chunks):
+    """Write chunks of row tuples; returns the number of rows written"""
+    total = 0
+    if fmt == 'csv':
+        with open_text(path, 'w') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for chunk in chunks:
+                writer.writerows(chunk)
+                total += len(chunk)
+    elif fmt == 'jsonl':
+        with open_text(path, 'w') as f:
+            for chunk in chunks:
+                f.write(''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in chunk))
+                total += len(chunk)
+    else:
+        pyarrow = parquet()
+        schema = pyarrow.schema([(name, pyarrow.int64() if name in INTEGER_COLUMNS else pyarrow.string())
+                                 for name in columns])
+        with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+            for chunk in chunks:
+                writer.write_table(pyarrow.Table.from_pylist([dict(zip(columns, row)) for row in chunk], schema))
+                total += len(chunk)
+    return total
@@ -0,0 +1,65 @@
+import random
+from datetime import date, timedelta
+
+# Quote of the Day schedule. Picks are stored in daily_quotes so every process
+# and session agrees on a date's quote, and adding quotes later never changes
+# days that are already scheduled. Within a cycle no quote repeats; a new
+# cycle starts once every quote has been shown.
+
+SCHEDULE_DAYS = 180
+# The schedule is extended when fewer than this many days are left
+MIN_DAYS_AHEAD = 30
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS daily_quotes (
+        day TEXT PRIMARY KEY,
+        quote_id INTEGER NOT NULL,
+        cycle INTEGER NOT NULL
+    )
+'''
+
+
+def scheduled_id(conn, day):
+    """Quote id scheduled for a day, or None if the day isn't scheduled"""
+    row = conn.execute("SELECT quote_id FROM daily_quotes WHERE day = ?", (day.isoformat(),)).fetchone()
+    return row[0] if row else None
+
+
+def days_scheduled_ahead(conn, today):
+    row = conn.execute("SELECT MAX(day) FROM daily_quotes").fetchone()
+    if not row or row[0] is None:
+        return 0
+    return (date.fromisoformat(row[0]) - today).days
+
+
+def extend_schedule(conn, ids, start, days=SCHEDULE_DAYS):
+    """Schedule quotes up to start + days; returns the number of days added
+
+    The quotes for each run of days are drawn from the ids not yet shown in
+    the current cycle, shuffled with a seed made of the cycle number and the
+    first new day, so the result only depends on the database contents.
+    """
+    conn.execute(SCHEMA)
+    last = conn.execute("SELECT day, cycle FROM daily_quotes ORDER BY day DESC LIMIT 1").fetchone()
+    day, cycle = start, 0
+    if last:
+        day = max(date.fromisoformat(last[0]) + timedelta(days=1), start)
+        cycle = last[1]
+    end = start + timedelta(days=days)
+    if day >= end or not len(ids):
+        return 0
+    used = {row[0] for row in conn.execute("SELECT quote_id FROM daily_quotes WHERE cycle = ?", (cycle,))}
+    rows = []
+    while day < end:
+        remaining = [quote_id for quote_id in ids if quote_id not in used]
+        if not remaining:
+            cycle += 1
+            used = set()
+            continue
+        rng = random.Random(f"{cycle}|{day.isoformat()}")
+        for quote_id in rng.sample(remaining, min(len(remaining), (end - day).days)):
+            rows.append((day.isoformat(), quote_id, cycle))
+            used.add(quote_id)
+            day += timedelta(days=1)
+    conn.executemany("INSERT OR IGNORE INTO daily_quotes (day, quote_id, cycle) VALUES (?, ?, ?)", rows)
+    return len(rows)
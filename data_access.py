@@ -0,0 +1,219 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import date
+
+from daily import MIN_DAYS_AHEAD, days_scheduled_ahead, extend_schedule, scheduled_id
+from db import DB_PATH, READ_ONLY, WRITE_STORE_PATH, get_pool
+from dedup import content_hash
+from favorites import SCHEMA as FAVORITES_SCHEMA, add_favorite as insert_favorite
+from mood_matcher import MoodMatcher
+from near_dup import ensure_source_column
+from quote_cache import QuoteCache
+from sampler import parse_weights
+from search import search_quotes
+from shuffle_bag import ShuffleBag
+from similar import SimilarIndex, index_dir
+from snapshot import create_write_store
+from write_queue import WriteQueue
+
+# All reads and writes the UI and the JSON API share. Caches and indexes are
+# created lazily, once per process.
+
+_cache = None
+_matcher = None
+_similar = None
+_writes = None
+_lock = threading.Lock()
+# Quote of the Day per date, looked up once per process per day
+_daily = {}
+_daily_lock = threading.Lock()
+DAILY_CACHE_DAYS = 7
+# How often each category comes up in random quotes relative to its size, e.g. "Wisdom=0.3,Love=2"
+CATEGORY_WEIGHTS = parse_weights(os.environ.get('QUOTES_CATEGORY_WEIGHTS', ''))
+
+
+def get_quote_cache():
+    """In-memory copy of the quotes table shared by every session and request"""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = QuoteCache(DB_PATH, category_weights=CATEGORY_WEIGHTS,
+                                overlay_path=WRITE_STORE_PATH if READ_ONLY else None)
+        return _cache
+
+
+def get_mood_matcher():
+    """Precomputed posting lists over mood_quotes"""
+    global _matcher
+    with _lock:
+        if _matcher is None:
+            _matcher = MoodMatcher(DB_PATH)
+        return _matcher
+
+
+def get_similar_index():
+    """Memory-mapped "More like this" vectors built by setup.py"""
+    global _similar
+    cache = get_quote_cache()
+    with _lock:
+        if _similar is None:
+            _similar = SimilarIndex(index_dir(DB_PATH), cache)
+        return _similar
+
+
+def more_like_this(item, k=5):
+    """Up to k (quote, score) pairs most similar to a quote id or text; [] until setup.py has built the index"""
+    return get_similar_index().like(item, k)
+
+
+def get_random_quote(categories=None):
+    return get_quote_cache().random_quote(categories)
+
+
+def new_shuffle_bag(categories=None):
+    """A fresh no-repeat random order over the quotes (of some categories), one per session"""
+    return ShuffleBag(get_quote_cache(), categories=categories)
+
+
+def quote_categories():
+    """Categories that have at least one quote, by name"""
+    return sorted(get_quote_cache().category_sampler().counts())
+
+
+def get_quote(quote_id):
+    return get_quote_cache().get(quote_id)
+
+
+def get_quote_of_the_day(day=None):
+    """The same quote for everyone on a given day"""
+    day = day or date.today()
+    quote = _daily.get(day)
+    if quote is not None:
+        return quote
+    with _daily_lock:
+        quote = _daily.get(day)
+        if quote is None:
+            quote = load_quote_of_the_day(day)
+            if quote is not None:
+                if len(_daily) >= DAILY_CACHE_DAYS:
+                    _daily.clear()
+                _daily[day] = quote
+        return quote
+
+
+def load_quote_of_the_day(day):
+    """Read the day's pick from the schedule, extending the schedule when it runs short"""
+    cache = get_quote_cache()
+    ids = cache.sorted_ids()
+    if not ids:
+        return None
+    today = date.today()
+    pool = get_pool()
+    try:
+        with pool.connection() as conn:
+            quote_id = scheduled_id(conn, day)
+            ahead = days_scheduled_ahead(conn, today)
+    except sqlite3.OperationalError:
+        # Database from before the schedule existed
+        quote_id, ahead = None, 0
+    # A read-only snapshot serves the schedule setup.py built into it
+    if ahead < MIN_DAYS_AHEAD and not pool.read_only:
+        with pool.writer() as conn:
+            extend_schedule(conn, ids, today)
+            if quote_id is None:
+                quote_id = scheduled_id(conn, day)
+    quote = cache.get(quote_id) if quote_id is not None else None
+    if quote is None:
+        # Days outside the schedule, or a scheduled quote that has been deleted
+        seed = int.from_bytes(hashlib.sha256(day.isoformat().encode()).digest()[:8], 'big')
+        quote = cache.get(ids[seed % len(ids)])
+    return quote
+
+
+def match_mood(mood, gender, age, social_life, professional_life):
+    """Best matching mood quote for a profile; returns (quote, tier)"""
+    return get_mood_matcher().match(mood.lower(), gender.lower(), int(age),
+                                    social_life.lower(), professional_life.lower())
+
+
+def search(text, limit=10, after=None):
+    with get_pool().connection() as conn:
+        return search_quotes(conn, text, limit, after)
+
+
+def insert_quote(conn, quote_text, author, category, inspiration):
+    cursor = conn.execute('''
+        INSERT INTO quotes (quote_text, author, category, inspiration, content_hash, source)
+        VALUES (?, ?, ?, ?, ?, 'user')
+        ON CONFLICT(content_hash) DO NOTHING
+    ''', (quote_text, author, category, inspiration, content_hash(quote_text)))
+    if not cursor.rowcount:
+        return None
+    return dict(conn.execute("SELECT * FROM quotes WHERE id = ?", (cursor.lastrowid,)).fetchone())
+
+
+def insert_user(conn, name, phone, email, profession, feedback, help_request):
+    conn.execute('''
+        INSERT INTO users (name, phone, email, profession, feedback, help_request)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (name, phone, email, profession, feedback, help_request))
+
+
+WRITE_HANDLERS = {
+    'add_quote': insert_quote,
+    'add_user': insert_user,
+    'add_favorite': insert_favorite,
+}
+
+
+def get_write_queue():
+    """Write-behind queue for form submissions, drained on interpreter exit"""
+    global _writes
+    with _lock:
+        if _writes is None:
+            pool = get_pool()
+            with pool.writer() as conn:
+                if pool.read_only:
+                    create_write_store(conn)
+                else:
+                    conn.execute(FAVORITES_SCHEMA)
+                    ensure_source_column(conn)
+            _writes = WriteQueue(pool, WRITE_HANDLERS).start()
+            atexit.register(_writes.close)
+        return _writes
+
+
+def quote_exists(quote_text):
+    with get_pool().connection() as conn:
+        return conn.execute("SELECT 1 FROM quotes WHERE content_hash = ?",
+                            (content_hash(quote_text),)).fetchone() is not None
+
+
+def cache_added_quote(future):
+    if future.exception() is None and future.result() is not None:
+        get_quote_cache().add(future.result())
+
+
+def add_quote(quote_text, author, category, inspiration):
+    """Queue a quote; returns a Future for the new row, or None if it is already in the collection
+
+    Raises WriteQueueFull when the queue stays full.
+    """
+    if quote_exists(quote_text):
+        return None
+    future = get_write_queue().enqueue('add_quote', quote_text=quote_text, author=author,
+                                       category=category, inspiration=inspiration)
+    future.add_done_callback(cache_added_quote)
+    return future
+
+
+def add_user(name, phone, email, profession, feedback, help_request):
+    return get_write_queue().enqueue('add_user', name=name, phone=phone, email=email, profession=profession,
+                                     feedback=feedback, help_request=help_request)
+
+
+def add_favorite(session_id, quote_id):
+    return get_write_queue().enqueue('add_favorite', session_id=session_id, quote_id=quote_id)
@@ -0,0 +1,291 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): don't run setup.py against a database the app is writing to
+    fcntl = None
+
+DB_PATH = 'database/data.db'
+# Form submissions land here instead of in the snapshot when serving read-only;
+# setup.py merges them into the next snapshot
+WRITE_STORE_PATH = 'database/writes.db'
+
+# Serve DB_PATH as an immutable snapshot: no locks, no WAL, no writes
+READ_ONLY = os.environ.get('QUOTES_READ_ONLY', '') not in ('', '0', 'false', 'no')
+
+# Tuning applied to every pooled connection
+PRAGMAS = {
+    'journal_mode': 'WAL',          # readers never block behind the writer
+    'synchronous': 'NORMAL',        # safe with WAL, avoids an fsync per commit
+    'mmap_size': 268435456,         # 256 MB of the file served straight from the page cache
+    'cache_size': -65536,           # 64 MB page cache per connection
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+# Tuning for connections to a read-only snapshot
+SNAPSHOT_PRAGMAS = {
+    'mmap_size': 2147418112,        # the whole file (up to SQLite's 2 GB cap) from the page cache
+    'cache_size': -16384,           # pages come from the mmap, so a small page cache will do
+    'temp_store': 'MEMORY',
+    'query_only': 1,
+}
+STATEMENT_CACHE_SIZE = 256
+# How often a read-only pool looks for a new snapshot renamed into place
+SNAPSHOT_CHECK_INTERVAL = 2.0
+
+
+def snapshot_id(path):
+    """Identity of the file currently at path; changes when setup.py renames a new snapshot into place"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns
+
+
+def open_connection(path=DB_PATH, read_only=False):
+    """Open a tuned connection that can be shared between threads
+
+    A read-only connection opens the file as immutable: SQLite takes no locks
+    and never looks for a journal, which is only correct because snapshots
+    are replaced by renaming a new file into place, never modified.
+    """
+    if read_only:
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro&immutable=1", uri=True,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=metrics.CONNECTION_FACTORY)
+        pragmas = SNAPSHOT_PRAGMAS
+    else:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=metrics.CONNECTION_FACTORY)
+        pragmas = PRAGMAS
+    conn.row_factory = sqlite3.Row
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    metrics.instrument_connection(conn)
+    return conn
+
+
+def lock_path(path):
+    return path + '.lock'
+
+
+@contextmanager
+def file_lock(path, exclusive=False):
+    """Advisory lock across processes: shared by the app's writers, exclusive while setup.py publishes"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ConnectionPool:
+    """Process-wide pool of SQLite connections
+
+    Reads check a connection out of a bounded pool, writes go through a single
+    dedicated writer connection guarded by a lock, so concurrent form submits
+    queue up in Python instead of spinning on SQLITE_BUSY. In WAL mode the
+    readers keep going while the writer commits.
+
+    With read_only=True the readers open the snapshot as immutable and the
+    writer opens write_path instead. When a new snapshot is renamed into
+    place, idle readers are closed and busy ones are closed as they come
+    back, so every read after that sees the new file.
+
+    A read-write pool's writer also holds the database's file_lock() while
+    it writes, so setup.py can stop the writes for as long as it takes to
+    bring them into the next snapshot and put that in place.
+    """
+
+    def __init__(self, path=DB_PATH, size=8, read_only=False, write_path=WRITE_STORE_PATH):
+        self.path = path
+        self.size = size
+        self.read_only = read_only
+        self.write_path = write_path if read_only else path
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.writer_conn = None
+        self.snapshot = snapshot_id(path) if read_only else None
+        self.last_check = time.monotonic()
+        self.generation = 0
+        self.generations = {}
+
+    def check_snapshot(self):
+        """Retire reader connections to a snapshot that has been replaced"""
+        now = time.monotonic()
+        if now - self.last_check < SNAPSHOT_CHECK_INTERVAL:
+            return
+        self.last_check = now
+        snapshot = snapshot_id(self.path)
+        if snapshot == self.snapshot:
+            return
+        with self.lock:
+            self.snapshot = snapshot
+            self.generation += 1
+            while True:
+                try:
+                    conn = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                self.retire(conn)
+
+    def retire(self, conn):
+        self.generations.pop(conn, None)
+        conn.close()
+        self.created -= 1
+
+    def acquire(self):
+        if self.read_only:
+            self.check_snapshot()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                conn = open_connection(self.path, self.read_only)
+                self.generations[conn] = self.generation
+                return conn
+        return self.idle.get()
+
+    def release(self, conn):
+        metrics.end_query(conn)
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            if self.generations.get(conn) != self.generation:
+                self.retire(conn)
+                return
+        self.idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a read connection"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def writer(self):
+        """Borrow the writer connection; commits on success, rolls back on error"""
+        waited = metrics.start()
+        publishing = nullcontext() if self.read_only else file_lock(lock_path(self.path))
+        with self.write_lock, publishing:
+            metrics.stop(waited, 'sqlite_write_lock_wait_seconds')
+            if self.writer_conn is None:
+                self.writer_conn = open_connection(self.write_path)
+            conn = self.writer_conn
+            started = metrics.start()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                metrics.end_query(conn)
+                metrics.stop(started, 'sqlite_write_lock_held_seconds')
+
+    def close(self):
+        with self.lock:
+            while True:
+                try:
+                    self.idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self.created = 0
+            self.generations = {}
+        with self.write_lock:
+            if self.writer_conn is not None:
+                self.writer_conn.close()
+                self.writer_conn = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(path=DB_PATH):
+    """Return the shared pool for this process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(path, read_only=READ_ONLY)
+        return _pool
+
+
+class DataVersionWatcher:
+    """Notices commits made through other connections via PRAGMA data_version
+
+    Holds its own connection, because data_version is only meaningful when it
+    is read repeatedly on the same one. Checks are throttled to one every
+    check_interval seconds so callers can ask on every request.
+
+    An immutable snapshot never changes in place, so in read-only mode the
+    "version" is the identity of the file, and a new one means a new snapshot
+    was renamed into place; the connection is reopened on the next mark().
+    """
+
+    def __init__(self, path=DB_PATH, check_interval=2.0, read_only=None):
+        self.path = path
+        self.check_interval = check_interval
+        self.read_only = READ_ONLY if read_only is None else read_only
+        self.conn = None
+        self.conn_snapshot = None
+        self.version = None
+        self.last_check = 0.0
+        self.lock = threading.Lock()
+
+    def connection(self):
+        if self.conn is None:
+            self.conn_snapshot = snapshot_id(self.path)
+            self.conn = open_connection(self.path, self.read_only)
+        return self.conn
+
+    def current_version(self):
+        if self.read_only:
+            return snapshot_id(self.path)
+        return self.connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def mark(self):
+        """Remember the current version, e.g. right after a full reload"""
+        with self.lock:
+            if self.read_only and self.conn is not None and snapshot_id(self.path) != self.conn_snapshot:
+                self.conn.close()
+                self.conn = None
+            self.version = self.current_version()
+            self.last_check = time.monotonic()
+
+    def changed(self):
+        """True if someone committed since the last mark()/changed() call"""
+        with self.lock:
+            now = time.monotonic()
+            if self.version is not None and now - self.last_check < self.check_interval:
+                return False
+            self.last_check = now
+            version = self.current_version()
+            if version == self.version:
+                return False
+            self.version = version
+            return True
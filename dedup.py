@@ -0,0 +1,27 @@
+import hashlib
+import re
+import unicodedata
+
+# Typographic variants that different APIs use for the same characters
+TRANSLATE = str.maketrans({
+    '‘': "'", '’': "'", '“': '"', '”': '"',
+    '–': '-', '—': '-', '…': '...',
+})
+NON_WORD = re.compile(r"[^\w\s]+")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Canonical form of a quote: NFKC, casefolded, punctuation and extra spaces removed"""
+    text = unicodedata.normalize('NFKC', text or '').translate(TRANSLATE).casefold()
+    text = NON_WORD.sub(' ', text)
+    return SPACES.sub(' ', text).strip()
+
+
+def content_hash(*parts):
+    """Stable hash of the normalized parts, used as the unique key of a quote"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(normalize_text(part).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.hexdigest()
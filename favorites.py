@@ -0,0 +1,21 @@
+# Quotes saved with "Add to Favorites", per browser session
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS favorites (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        quote_id INTEGER NOT NULL,
+        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (session_id, quote_id)
+    )
+'''
+
+
+def add_favorite(conn, session_id, quote_id):
+    """Returns True if the quote wasn't a favorite yet"""
+    cursor = conn.execute('''
+        INSERT INTO favorites (session_id, quote_id) VALUES (?, ?)
+        ON CONFLICT(session_id, quote_id) DO NOTHING
+    ''', (session_id, quote_id))
+    return cursor.rowcount > 0
+
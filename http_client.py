@@ -0,0 +1,213 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Per-source limits: how many requests may be in flight at once and the
+# sustained request rate (tokens per second) with a small burst allowance
+SOURCE_LIMITS = {
+    'zenquotes': {'concurrency': 1, 'rate': 1.0, 'burst': 1},
+    'forismatic': {'concurrency': 4, 'rate': 8.0, 'burst': 4},
+    'typefit': {'concurrency': 1, 'rate': 1.0, 'burst': 1},
+}
+DEFAULT_LIMITS = {'concurrency': 2, 'rate': 5.0, 'burst': 2}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+CACHE_DIR = 'database/http_cache'
+CACHE_TTL = 24 * 60 * 60
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response built from a cache entry"""
+
+    def __init__(self, entry):
+        self.url = entry['url']
+        self.status_code = entry['status']
+        self.headers = entry['headers']
+        self.text = entry['body']
+        self.fetched_at = entry['fetched_at']
+        self.from_cache = True
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ResponseCache:
+    """On-disk cache of successful GET responses, one JSON file per key
+
+    Entries younger than ttl are served as-is; older ones are revalidated
+    with If-None-Match / If-Modified-Since when the server sent validators.
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key), encoding='utf-8') as f:
+                return CachedResponse(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def is_fresh(self, cached):
+        return time.time() - cached.fetched_at < self.ttl
+
+    def write(self, key, entry):
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+        return CachedResponse(entry)
+
+    def put(self, key, response):
+        return self.write(key, {
+            'url': response.url,
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in ('ETag', 'Last-Modified', 'Content-Type')
+                        if name in response.headers},
+            'body': response.text,
+            'fetched_at': time.time(),
+        })
+
+    def touch(self, key, cached):
+        """Mark a revalidated (304) entry as fresh again"""
+        return self.write(key, {'url': cached.url, 'status': cached.status_code, 'headers': cached.headers,
+                                'body': cached.text, 'fetched_at': time.time()})
+
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode when a request has no cached snapshot"""
+
+
+class TokenBucket:
+    """Blocking token bucket rate limiter"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpClient:
+    """Pooled keep-alive HTTP client with per-source limits, timeouts and retries
+
+    With a ResponseCache attached, successful responses are stored on disk and
+    reused; offline=True replays only from that cache and never opens a socket.
+    """
+
+    def __init__(self, timeout=(3.05, 10), retries=3, backoff=0.5, pool_size=16, limits=None,
+                 cache=None, offline=False):
+        self.cache = cache
+        self.offline = offline
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = dict(SOURCE_LIMITS, **(limits or {}))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.semaphores = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, source):
+        with self.lock:
+            if source not in self.semaphores:
+                limits = self.limits.get(source, DEFAULT_LIMITS)
+                self.semaphores[source] = threading.BoundedSemaphore(limits['concurrency'])
+                self.buckets[source] = TokenBucket(limits['rate'], limits['burst'])
+            return self.semaphores[source], self.buckets[source]
+
+    def retry_delay(self, attempt, response=None):
+        if response is not None and response.headers.get('Retry-After', '').isdigit():
+            return float(response.headers['Retry-After'])
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def get(self, url, source='default', cache_key=None, **kwargs):
+        """GET through the response cache; cache_key tells apart repeated calls to one URL"""
+        if self.cache is None:
+            if self.offline:
+                raise OfflineCacheMiss(url)
+            return self.fetch(url, source, **kwargs)
+        key = cache_key or url
+        cached = self.cache.get(key)
+        if self.offline:
+            if cached is None:
+                raise OfflineCacheMiss(key)
+            return cached
+        if cached is not None and self.cache.is_fresh(cached):
+            return cached
+        headers = dict(kwargs.pop('headers', None) or {})
+        if cached is not None:
+            if 'ETag' in cached.headers:
+                headers['If-None-Match'] = cached.headers['ETag']
+            if 'Last-Modified' in cached.headers:
+                headers['If-Modified-Since'] = cached.headers['Last-Modified']
+        try:
+            response = self.fetch(url, source, headers=headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if cached is None:
+                raise
+            # A stale snapshot beats no data when the source is down
+            return cached
+        if response.status_code == 304 and cached is not None:
+            return self.cache.touch(key, cached)
+        if response.status_code == 200:
+            return self.cache.put(key, response)
+        return response
+
+    def fetch(self, url, source='default', **kwargs):
+        """GET with rate limiting and retries; returns the final response or raises"""
+        semaphore, bucket = self.limiter(source)
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.retries + 1):
+            bucket.acquire()
+            try:
+                with semaphore:
+                    response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.retry_delay(attempt))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                time.sleep(self.retry_delay(attempt, response))
+                continue
+            return response
+
+    def get_json(self, url, source='default', cache_key=None, **kwargs):
+        """GET and decode JSON; None when the source answered with an error status"""
+        response = self.get(url, source, cache_key, **kwargs)
+        if response.status_code != 200:
+            return None
+        return response.json()
+
+    def close(self):
+        self.session.close()
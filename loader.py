@@ -0,0 +1,93 @@
+import sqlite3
+from itertools import islice
+
+# Column order used by the bulk inserts
+QUOTE_COLUMNS = ('quote_text', 'author', 'category', 'inspiration', 'content_hash', 'source')
+MOOD_QUOTE_COLUMNS = ('quote_text', 'author', 'mood_category', 'gender_preference',
+                      'min_age', 'max_age', 'social_life', 'professional_life', 'content_hash')
+
+# Upserts keyed on the content hash: a repeat is skipped, except that a real
+# author replaces an 'Unknown' one
+QUOTE_UPSERT = '''
+    ON CONFLICT(content_hash) DO UPDATE SET author = excluded.author
+    WHERE quotes.author = 'Unknown' AND excluded.author <> 'Unknown'
+'''
+MOOD_QUOTE_UPSERT = 'ON CONFLICT(content_hash) DO NOTHING'
+
+
+def batched(rows, size):
+    """Yield lists of at most size rows without materialising the input"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class BulkLoader:
+    """Streams rows into SQLite with executemany, one transaction per batch
+
+    Used as a context manager: while it is open the connection runs with
+    journal_mode=OFF and synchronous=OFF, which is only safe for a database
+    that can be rebuilt from scratch if the load is interrupted. The previous
+    settings are restored on exit.
+    """
+
+    def __init__(self, conn, batch_size=5000, progress=None):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.progress = progress
+        self.saved = None
+        self.counts = {}
+
+    def __enter__(self):
+        self.saved = (
+            self.conn.execute("PRAGMA journal_mode").fetchone()[0],
+            self.conn.execute("PRAGMA synchronous").fetchone()[0],
+        )
+        try:
+            self.conn.execute("PRAGMA journal_mode = OFF")
+        except sqlite3.OperationalError:
+            # Leaving WAL needs exclusive access; with readers attached
+            # (e.g. the app is running) keep the current journal
+            pass
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("PRAGMA cache_size = -262144")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.commit() if exc_type is None else self.conn.rollback()
+        journal_mode, synchronous = self.saved
+        if self.conn.execute("PRAGMA journal_mode").fetchone()[0] != journal_mode:
+            self.conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        self.conn.execute(f"PRAGMA synchronous = {synchronous}")
+        return False
+
+    def load(self, table, columns, rows, on_conflict=''):
+        """Insert an iterable of row tuples
+
+        Returns a dict with how many rows were read and how many were
+        inserted, updated or skipped by the on_conflict clause.
+        """
+        placeholders = ', '.join('?' for _ in columns)
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) {on_conflict}"
+        before = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        # rowcount counts the rows each statement inserted or updated itself;
+        # total_changes would also count the writes made by triggers (e.g. the FTS index)
+        changed = 0
+        total = 0
+        for batch in batched(rows, self.batch_size):
+            self.conn.execute("BEGIN")
+            changed += self.conn.executemany(sql, batch).rowcount
+            self.conn.commit()
+            total += len(batch)
+            if self.progress:
+                self.progress(table, total)
+        inserted = self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] - before
+        counts = self.counts.setdefault(table, {'rows': 0, 'inserted': 0, 'updated': 0, 'skipped': 0})
+        result = {'rows': total, 'inserted': inserted, 'updated': changed - inserted, 'skipped': total - changed}
+        for key, value in result.items():
+            counts[key] += value
+        return result
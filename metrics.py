@@ -0,0 +1,326 @@
+"""Lightweight in-process metrics: counters, gauges, latency histograms, query timing
+
+Disabled unless QUOTES_METRICS=1. When disabled every call returns right
+away and no SQLite callbacks are installed, so instrumented code pays for one
+attribute lookup and a branch.
+"""
+import bisect
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+ENABLED = os.environ.get('QUOTES_METRICS', '') not in ('', '0', 'false', 'no')
+PROMETHEUS_FILE = os.environ.get('QUOTES_METRICS_FILE', 'database/metrics.prom')
+PROMETHEUS_INTERVAL = float(os.environ.get('QUOTES_METRICS_INTERVAL', 15.0))
+
+# Latency buckets in seconds (upper bounds) for the Prometheus histograms
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Recent samples kept per series for the p50/p95/p99 shown in the app
+RECENT_SAMPLES = 2048
+# Only this many distinct query labels are tracked; the rest share one
+MAX_QUERY_LABELS = 50
+PROGRESS_STEPS = 1000
+
+SQL_LABEL = re.compile(r"^\s*(\w+)(?:.*?\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+([\w\"]+))?", re.IGNORECASE | re.DOTALL)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentiles(self, points=(50, 95, 99)):
+        samples = sorted(self.recent)
+        if not samples:
+            return {point: None for point in points}
+        return {point: samples[min(len(samples) - 1, int(len(samples) * point / 100))] for point in points}
+
+
+class Registry:
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.last_export = 0.0
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def summary(self):
+        """One row per histogram with its count and p50/p95/p99 in milliseconds"""
+        with self.lock:
+            items = list(self.histograms.items())
+        rows = []
+        for (name, labels), histogram in sorted(items):
+            p = histogram.percentiles()
+            rows.append({'metric': name, 'labels': describe_labels(labels), 'count': histogram.count,
+                         'p50_ms': ms(p[50]), 'p95_ms': ms(p[95]), 'p99_ms': ms(p[99])})
+        return rows
+
+    def counter_rows(self):
+        """Counters and gauges, one row per series"""
+        with self.lock:
+            items = sorted(self.counters.items()) + sorted(self.gauges.items())
+        return [{'metric': name, 'labels': describe_labels(labels), 'value': value}
+                for (name, labels), value in items]
+
+    def prometheus(self):
+        """Render everything in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items())
+            seen = set()
+            for (name, labels), value in counters:
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+            for (name, labels), value in gauges:
+                if name not in seen:
+                    lines.append(f"# TYPE {name} gauge")
+                    seen.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+            for (name, labels), histogram in histograms:
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.total}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path=PROMETHEUS_FILE, force=False):
+        """Write the scrape file (textfile-collector style), at most every PROMETHEUS_INTERVAL seconds"""
+        now = time.monotonic()
+        if not force and now - self.last_export < PROMETHEUS_INTERVAL:
+            return
+        self.last_export = now
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def describe_labels(labels):
+    return ', '.join(f"{key}={value}" for key, value in labels)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    body = ','.join(f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                    for key, value in labels)
+    return '{' + body + '}'
+
+
+registry = Registry()
+
+
+def inc(name, amount=1, **labels):
+    if ENABLED:
+        registry.inc(name, amount, **labels)
+
+
+def set_gauge(name, value, **labels):
+    if ENABLED:
+        registry.set(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        registry.observe(name, value, **labels)
+
+
+def start():
+    """Start a measurement; pass the result to stop()"""
+    return time.perf_counter() if ENABLED else None
+
+
+def stop(started, name, **labels):
+    if started is not None:
+        registry.observe(name, time.perf_counter() - started, **labels)
+
+
+def export(force=False):
+    if ENABLED:
+        registry.export(force=force)
+
+
+# Per-query timing through the sqlite3 callbacks. The trace callback fires when
+# a statement starts; the statement is considered finished when its cursor has
+# been read or closed (TimedCursor), when the next one starts on the same
+# connection, or when the connection goes back to the pool. The progress
+# handler counts VM instructions as a cost measure independent of load.
+
+query_labels = set()
+query_state = {}
+
+
+def query_label(sql):
+    match = SQL_LABEL.match(sql)
+    if not match:
+        return 'other'
+    verb, table = match.group(1).upper(), (match.group(2) or '').strip('"')
+    label = f"{verb} {table}".strip()
+    if label not in query_labels:
+        if len(query_labels) >= MAX_QUERY_LABELS:
+            return 'other'
+        query_labels.add(label)
+    return label
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Ends the timing of its statement once the caller is done with it
+
+    That is when the statement returns no rows, when its rows have been read
+    (fetchone, fetchall, a short fetchmany, the end of iteration) or when the
+    cursor is closed, so time a connection then spends idle isn't counted.
+    """
+
+    def execute(self, sql, parameters=()):
+        super().execute(sql, parameters)
+        self.started()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        super().executemany(sql, seq_of_parameters)
+        self.done()
+        return self
+
+    def started(self):
+        state = query_state.get(id(self.connection))
+        if state is not None:
+            if self.description is None:
+                finish(state)
+            else:
+                state['cursor'] = id(self)
+
+    def done(self):
+        state = query_state.get(id(self.connection))
+        if state is not None and state['cursor'] in (id(self), None):
+            finish(state)
+
+    def fetchone(self):
+        row = super().fetchone()
+        self.done()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = super().fetchmany(size)
+        if len(rows) < size:
+            self.done()
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self.done()
+        return rows
+
+    def __next__(self):
+        try:
+            return super().__next__()
+        except StopIteration:
+            self.done()
+            raise
+
+    def close(self):
+        self.done()
+        super().close()
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose execute shortcuts return TimedCursors"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# What db.open_connection passes to sqlite3.connect
+CONNECTION_FACTORY = TimedConnection if ENABLED else sqlite3.Connection
+
+
+def instrument_connection(conn):
+    """Install the trace and progress callbacks on a connection (no-op when disabled)"""
+    if not ENABLED:
+        return
+    state = query_state[id(conn)] = {'label': None, 'started': 0.0, 'steps': 0, 'cursor': None}
+
+    def trace(sql):
+        if sql.startswith('--'):
+            # Trigger bodies are reported as comments; they belong to the running statement
+            return
+        finish(state)
+        state['label'] = query_label(sql)
+        state['cursor'] = None
+        state['started'] = time.perf_counter()
+        state['steps'] = 0
+
+    def progress():
+        state['steps'] += PROGRESS_STEPS
+        return 0
+
+    conn.set_trace_callback(trace)
+    conn.set_progress_handler(progress, PROGRESS_STEPS)
+
+
+def finish(state):
+    if state['label'] is not None:
+        registry.observe('sqlite_query_seconds', time.perf_counter() - state['started'], query=state['label'])
+        if state['steps']:
+            registry.inc('sqlite_vm_steps_total', state['steps'], query=state['label'])
+        state['label'] = None
+
+
+def end_query(conn):
+    """Close the timing of the last statement, e.g. when a connection is released"""
+    if ENABLED:
+        state = query_state.get(id(conn))
+        if state is not None:
+            finish(state)
@@ -0,0 +1,203 @@
+import random
+import sys
+import threading
+
+import numpy as np
+
+from db import DataVersionWatcher
+
+# Form answers that don't match the stored mood_category verbatim
+MOOD_ALIASES = {
+    'career-focused': 'career',
+}
+
+# Result tiers, best first
+TIER_EXACT = 'exact'
+TIER_MOOD = 'mood'
+
+# Values that match any user for their column
+WILDCARDS = {'gender_preference': 'both', 'social_life': 'balanced', 'professional_life': 'balanced'}
+
+# Ages are int16; NULL bounds are stored as the extremes so they never filter
+NO_MIN_AGE = np.iinfo(np.int16).min
+NO_MAX_AGE = np.iinfo(np.int16).max
+
+# Distinct (gender, social, professional) answers whose weights are memoised per load
+MAX_PROFILES = 1024
+
+FIELDS = ('id', 'quote_text', 'author', 'mood_category', 'gender_preference',
+          'min_age', 'max_age', 'social_life', 'professional_life')
+
+# Targeting columns, encoded together as one "combo" code per row
+COMBO_COLUMNS = ('gender_preference', 'social_life', 'professional_life')
+
+
+class MoodQuote:
+    """One matched mood_quotes row; reads like the dict rows it replaces"""
+
+    __slots__ = FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(FIELDS, values):
+            setattr(self, field, value)
+
+    def __getitem__(self, field):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def __contains__(self, field):
+        return field in FIELDS
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def keys(self):
+        return FIELDS
+
+
+class Categories:
+    """Dictionary encoding of a categorical column: each distinct value gets a small int code"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code(self, value):
+        """Code of a value, or -1 if no row has it"""
+        return self.codes.get(value, -1)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class MoodTable:
+    """Columnar snapshot of mood_quotes
+
+    Rows are sorted by mood so each mood is a contiguous slice of every
+    column. Author, mood and the three targeting columns are dictionary-encoded
+    into small int arrays (the targeting columns as one code for the
+    combination, of which there are only a few dozen), the age bounds are
+    int16 arrays, and only the quote text stays a list of Python strings.
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row[3], row[0]))
+        count = len(rows)
+        self.authors = Categories()
+        self.moods = Categories()
+        self.combos = Categories()
+        self.ids = np.fromiter((row[0] for row in rows), np.int64, count)
+        self.quote_text = [row[1] for row in rows]
+        self.author = np.fromiter((self.authors.encode(row[2]) for row in rows), np.int32, count)
+        self.mood = np.fromiter((self.moods.encode(row[3]) for row in rows), np.int16, count)
+        self.combo = np.fromiter((self.combos.encode((row[4], row[7], row[8])) for row in rows), np.int16, count)
+        self.min_age = np.fromiter((NO_MIN_AGE if row[5] is None else row[5] for row in rows), np.int16, count)
+        self.max_age = np.fromiter((NO_MAX_AGE if row[6] is None else row[6] for row in rows), np.int16, count)
+
+        # Moods were encoded in sorted order, so each code's rows are one span
+        stops = np.searchsorted(self.mood, np.arange(len(self.moods)), 'right')
+        self.spans = dict(enumerate(zip([0] + stops[:-1].tolist(), stops.tolist())))
+        self.profiles = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        """Approximate memory held by the table, strings included"""
+        arrays = sum(a.nbytes for a in (self.ids, self.author, self.mood, self.combo, self.min_age, self.max_age))
+        strings = self.quote_text + self.authors.values + self.moods.values
+        return arrays + sum(sys.getsizeof(s) + 8 for s in strings)
+
+    def record(self, row):
+        gender, social_life, professional_life = self.combos.values[self.combo[row]]
+        min_age, max_age = int(self.min_age[row]), int(self.max_age[row])
+        return MoodQuote(int(self.ids[row]), self.quote_text[row], self.authors.values[self.author[row]],
+                         self.moods.values[self.mood[row]], gender,
+                         None if min_age == NO_MIN_AGE else min_age,
+                         None if max_age == NO_MAX_AGE else max_age,
+                         social_life, professional_life)
+
+    def candidates(self, mood, gender, age, social_life, professional_life):
+        """Return (tier, start, cumulative_weights) for the best tier that has any rows
+
+        Row start + i is drawn with probability proportional to
+        cumulative[i] - cumulative[i - 1]. Within the exact tier a row's weight
+        doubles for every targeting column it matches with the user's own
+        value rather than the wildcard, so targeted quotes win more often
+        without starving the general ones; the mood fallback tier is uniform.
+        """
+        span = self.spans.get(self.moods.code(mood))
+        if span is None:
+            return None, None, None
+        start, stop = span
+        age = min(max(age, NO_MIN_AGE + 1), NO_MAX_AGE - 1)
+        weights = self.combo_weights((gender, social_life, professional_life))[self.combo[start:stop]]
+        weights *= (self.min_age[start:stop] <= age) & (self.max_age[start:stop] >= age)
+        cumulative = weights.cumsum(dtype=np.int64)
+        if cumulative[-1]:
+            return TIER_EXACT, start, cumulative
+        return TIER_MOOD, start, np.arange(1, stop - start + 1)
+
+    def combo_weights(self, profile):
+        """Weight of each targeting combination for one set of answers, 0 where it doesn't match"""
+        weights = self.profiles.get(profile)
+        if weights is None:
+            weights = np.zeros(len(self.combos), np.int8)
+            for code, combo in enumerate(self.combos.values):
+                weight = 1
+                for name, value, answer in zip(COMBO_COLUMNS, combo, profile):
+                    weight *= 2 if value == answer else 1 if value == WILDCARDS[name] else 0
+                weights[code] = weight
+            if len(self.profiles) < MAX_PROFILES:
+                self.profiles[profile] = weights
+        return weights
+
+
+class MoodMatcher:
+    """In-memory, columnar eligibility index over mood_quotes
+
+    A lookup works on the user's mood slice only: one gather of the weight of
+    each row's targeting combination (the user's value or the wildcard for
+    each of the three optional columns), two age comparisons and a cumulative
+    sum, then a weighted draw by bisection. If no row matches the full
+    profile it falls back to any quote for the mood. Reloads build a new
+    MoodTable and swap it in, so readers never see a half-built one.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.table = MoodTable([])
+        self.loaded = False
+        self.lock = threading.Lock()
+        self.watcher = DataVersionWatcher(path, check_interval)
+
+    def load(self):
+        with self.lock:
+            self.watcher.mark()
+            rows = self.watcher.connection().execute(f"SELECT {', '.join(FIELDS)} FROM mood_quotes").fetchall()
+            self.table = MoodTable(rows)
+            self.loaded = True
+
+    def ensure_fresh(self):
+        if not self.loaded or self.watcher.changed():
+            self.load()
+
+    def match(self, mood, gender, age, social_life, professional_life):
+        """Pick one quote from the best tier; returns (quote, tier)"""
+        self.ensure_fresh()
+        table = self.table
+        tier, start, cumulative = table.candidates(MOOD_ALIASES.get(mood, mood), gender, age,
+                                                   social_life, professional_life)
+        if tier is None:
+            return None, None
+        index = int(cumulative.searchsorted(random.random() * int(cumulative[-1]), 'right'))
+        return table.record(start + index), tier
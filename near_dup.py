@@ -0,0 +1,226 @@
+"""Near-duplicate detection for quotes: MinHash signatures with LSH banding
+
+Exact duplicates are already caught by the content hash (dedup.py). This
+catches the same quote with a word changed, dropped or reordered by a
+different source. Each quote gets a MinHash signature over the word pairs
+of its normalized text; signatures are cut into bands and quotes
+sharing a band are candidates, so the work grows with the number of quotes
+rather than the number of pairs. Candidates whose signatures agree on at
+least THRESHOLD of their positions (an estimate of the Jaccard similarity of
+their word pairs) are merged into one canonical row, and every merged variant is
+recorded in quote_lineage with its source (the API, corpus file or "user"
+it was loaded from, kept in quotes.source).
+"""
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dedup import normalize_text
+
+SHINGLE = 2
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+# Estimated Jaccard similarity at which two quotes count as the same
+THRESHOLD = 0.75
+# Below this many quotes a process pool costs more than it saves
+POOL_MIN = 20000
+CHUNK = 10000
+
+PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_rng = np.random.default_rng(20240601)
+PERM_A = _rng.integers(1, 2 ** 32 - 5, NUM_PERM, dtype=np.uint64)[:, None]
+PERM_B = _rng.integers(0, 2 ** 32 - 5, NUM_PERM, dtype=np.uint64)[:, None]
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS quote_minhash (
+        quote_id INTEGER PRIMARY KEY,
+        signature BLOB NOT NULL
+    )
+'''
+LINEAGE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS quote_lineage (
+        content_hash TEXT PRIMARY KEY,
+        quote_id INTEGER NOT NULL,
+        quote_text TEXT NOT NULL,
+        author TEXT,
+        source TEXT,
+        merged_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def ensure_source_column(conn):
+    """Add quotes.source on databases from before it existed"""
+    if 'source' not in [row[1] for row in conn.execute("PRAGMA table_info(quotes)")]:
+        conn.execute("ALTER TABLE quotes ADD COLUMN source TEXT")
+
+
+def shingles(text):
+    """Hashes of the word pairs of a quote's normalized text (the word itself for one-word quotes)"""
+    words = normalize_text(text).split() or ['']
+    pairs = [' '.join(words[i:i + SHINGLE]) for i in range(max(1, len(words) - SHINGLE + 1))]
+    return [zlib.crc32(pair.encode('utf-8')) for pair in set(pairs)]
+
+
+def minhash_many(texts):
+    """MinHash signatures (one row of NUM_PERM uint32 values per quote)
+
+    All shingles of the batch go through the NUM_PERM hash functions in one
+    array operation, then each quote's minimum is taken with reduceat.
+    """
+    hashed = [shingles(text) for text in texts]
+    counts = np.fromiter((len(h) for h in hashed), np.int64, len(hashed))
+    values = np.fromiter((value for h in hashed for value in h), np.uint64, int(counts.sum()))
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    permuted = (PERM_A * (values % PRIME) + PERM_B) % PRIME
+    return np.minimum.reduceat(permuted, offsets, axis=1).T.astype(np.uint32)
+
+
+def minhash(text):
+    return minhash_many([text])[0]
+
+
+def compute_signatures(texts, workers=None):
+    """Signatures for many quotes, spread over a process pool when there are enough of them"""
+    workers = workers or os.cpu_count() or 1
+    chunks = [texts[i:i + CHUNK] for i in range(0, len(texts), CHUNK)]
+    if workers == 1 or len(texts) < POOL_MIN:
+        signatures = [minhash_many(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            signatures = list(pool.map(minhash_many, chunks))
+    return np.concatenate(signatures) if signatures else np.empty((0, NUM_PERM), np.uint32)
+
+
+def band_keys(signatures, band):
+    """One 64-bit key per quote for a band; equal bands give equal keys"""
+    key = np.zeros(len(signatures), np.uint64)
+    for column in signatures[:, band * ROWS:(band + 1) * ROWS].T:
+        key = key * np.uint64(0x100000001b3) ^ column.astype(np.uint64)
+    return key
+
+
+def find_root(parent, node):
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+def near_duplicate_groups(ids, signatures, threshold=THRESHOLD):
+    """Groups (lists of ids, smallest first) of quotes whose signatures match closely
+
+    Quotes that share a band key are sorted next to each other; each is
+    checked against the first quote of its run, and matches are joined with
+    union-find so chains of near-duplicates end up in one group.
+    """
+    ids = np.asarray(ids)
+    parent = list(range(len(ids)))
+    for band in range(BANDS):
+        keys = band_keys(signatures, band)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        ends = np.concatenate((starts[1:], [len(order)]))
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            members = order[start:end]
+            first = members[0]
+            agreement = (signatures[members[1:]] == signatures[first]).mean(axis=1)
+            for other in members[1:][agreement >= threshold]:
+                a, b = find_root(parent, first), find_root(parent, other)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+    groups = {}
+    for index in range(len(ids)):
+        groups.setdefault(find_root(parent, index), []).append(int(ids[index]))
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def sign_new_quotes(conn, workers=None):
+    """Compute and store signatures for quotes that don't have one yet; returns how many"""
+    rows = conn.execute('''
+        SELECT id, quote_text FROM quotes
+        WHERE id NOT IN (SELECT quote_id FROM quote_minhash) ORDER BY id
+    ''').fetchall()
+    if not rows:
+        return 0
+    signatures = compute_signatures([text for _, text in rows], workers)
+    conn.executemany("INSERT OR REPLACE INTO quote_minhash (quote_id, signature) VALUES (?, ?)",
+                     ((quote_id, signature.tobytes()) for (quote_id, _), signature in zip(rows, signatures)))
+    return len(rows)
+
+
+def load_signatures(conn):
+    ids, blobs = [], []
+    for quote_id, blob in conn.execute('''
+        SELECT m.quote_id, m.signature FROM quote_minhash m JOIN quotes q ON q.id = m.quote_id ORDER BY m.quote_id
+    '''):
+        ids.append(quote_id)
+        blobs.append(blob)
+    signatures = np.frombuffer(b''.join(blobs), np.uint32).reshape(len(ids), NUM_PERM)
+    return ids, signatures
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def canonical_id(rows):
+    """The row a group is merged into: the oldest one with a known author"""
+    known = [row for row in rows if row[2] and row[2] != 'Unknown']
+    return min(known or rows)[0]
+
+
+def merge_group(conn, group, threshold=THRESHOLD):
+    """Fold a group of near-duplicate quotes into its canonical row; returns the rows removed"""
+    placeholders = ', '.join('?' for _ in group)
+    rows = conn.execute(f'''
+        SELECT id, quote_text, author, source, content_hash FROM quotes WHERE id IN ({placeholders})
+    ''', group).fetchall()
+    if len(rows) < 2:
+        return 0
+    keep = canonical_id(rows)
+    # Signatures only estimate similarity; confirm each member against the
+    # canonical text before merging it away
+    canonical = set(shingles(next(row[1] for row in rows if row[0] == keep)))
+    rows = [row for row in rows if row[0] == keep or jaccard(canonical, set(shingles(row[1]))) >= threshold]
+    if len(rows) < 2:
+        return 0
+    conn.executemany('''
+        INSERT INTO quote_lineage (content_hash, quote_id, quote_text, author, source) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(content_hash) DO UPDATE SET quote_id = excluded.quote_id
+    ''', [(content_hash, keep, text, author, source) for _, text, author, source, content_hash in rows])
+    # Lineage that pointed at a row being merged away now points at the canonical one
+    merged = [row[0] for row in rows if row[0] != keep]
+    placeholders = ', '.join('?' for _ in merged)
+    conn.execute(f"UPDATE quote_lineage SET quote_id = ? WHERE quote_id IN ({placeholders})", [keep] + merged)
+    conn.execute(f"UPDATE daily_quotes SET quote_id = ? WHERE quote_id IN ({placeholders})", [keep] + merged)
+    conn.execute(f"UPDATE OR IGNORE favorites SET quote_id = ? WHERE quote_id IN ({placeholders})", [keep] + merged)
+    conn.execute(f"DELETE FROM favorites WHERE quote_id IN ({placeholders})", merged)
+    conn.execute(f"DELETE FROM quote_minhash WHERE quote_id IN ({placeholders})", merged)
+    conn.execute(f"DELETE FROM quotes WHERE id IN ({placeholders})", merged)
+    return len(merged)
+
+
+def merge_near_duplicates(conn, workers=None, threshold=THRESHOLD):
+    """Sign new quotes, find near-duplicate groups and merge them; returns (signed, merged_groups, removed)"""
+    conn.execute(SCHEMA)
+    conn.execute(LINEAGE_SCHEMA)
+    ensure_source_column(conn)
+    signed = sign_new_quotes(conn, workers)
+    ids, signatures = load_signatures(conn)
+    merged = [merge_group(conn, group, threshold) for group in near_duplicate_groups(ids, signatures, threshold)]
+    conn.commit()
+    return signed, sum(1 for removed in merged if removed), sum(merged)
+
+
+def merged_hashes(conn):
+    """Content hashes of variants merged into another row, so a re-import can skip them"""
+    conn.execute(LINEAGE_SCHEMA)
+    return {row[0] for row in conn.execute('''
+        SELECT l.content_hash FROM quote_lineage l
+        WHERE NOT EXISTS (SELECT 1 FROM quotes q WHERE q.content_hash = l.content_hash)
+    ''')}
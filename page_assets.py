@@ -0,0 +1,136 @@
+import html
+import re
+from functools import lru_cache
+
+# Static markup for streamlit_app.py. Module-level, so it is built once per
+# process instead of on every rerun of the script.
+
+PAGES = ("Quote of the Day", "Add Quote", "Personal Details", "Mood Wise Quotes", "Search")
+
+QUOTE_CATEGORIES = ["Motivation", "Life", "Love", "Success", "Career", "Dreams", "Perseverance",
+                    "Courage", "Opportunity", "Happiness", "Wisdom", "Innovation", "Inspiration"]
+
+MOODS = ["Happy", "Sad", "Motivated", "Stressed", "Love", "Career-focused"]
+
+
+def minify_css(css):
+    """Drop the indentation and line breaks; the rules are sent to the browser on every full rerun"""
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{}:;,>])\s*", r"\1", css).replace(";}", "}").strip()
+
+
+STYLE = minify_css('''
+<style>
+    .main-header {
+        font-size: 2.5rem;
+        color: #2c3e50;
+        text-align: center;
+        margin-bottom: 1rem;
+        font-weight: 300;
+        letter-spacing: 1px;
+    }
+    .quote-container {
+        max-width: 800px;
+        margin: 2rem auto;
+        padding: 3rem;
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        border-radius: 15px;
+        box-shadow: 0 10px 30px rgba(0,0,0,0.1);
+        color: white;
+        position: relative;
+    }
+    .category-badge {
+        display: inline-block;
+        background: rgba(255,255,255,0.2);
+        padding: 0.5rem 1.5rem;
+        border-radius: 25px;
+        font-size: 0.9rem;
+        margin-bottom: 1.5rem;
+        backdrop-filter: blur(10px);
+        border: 1px solid rgba(255,255,255,0.3);
+    }
+    .quote-text {
+        font-size: 1.8rem;
+        line-height: 1.6;
+        margin: 1.5rem 0;
+        font-weight: 300;
+        font-style: italic;
+        text-align: center;
+    }
+    .author-text {
+        text-align: center;
+        font-size: 1.2rem;
+        margin-top: 2rem;
+        opacity: 0.9;
+        font-weight: 400;
+    }
+    .action-buttons {
+        display: flex;
+        justify-content: center;
+        gap: 1rem;
+        margin-top: 2rem;
+    }
+    .sidebar-title {
+        font-size: 1.5rem;
+        color: #2c3e50;
+        margin-bottom: 1rem;
+        font-weight: 400;
+    }
+    .dropdown-container {
+        margin: 1rem 0;
+    }
+    .search-result {
+        max-width: 800px;
+        margin: 1rem auto;
+        padding: 1.2rem 1.5rem;
+        border-left: 4px solid #667eea;
+        background: #f8f9fc;
+        border-radius: 8px;
+    }
+    .search-result .result-text {
+        font-size: 1.1rem;
+        font-style: italic;
+        color: #2c3e50;
+    }
+    .search-result .result-author {
+        margin-top: 0.5rem;
+        color: #7f8c8d;
+    }
+    .search-result mark {
+        background: #ffe58f;
+        padding: 0 2px;
+    }
+    .footer {
+        text-align: center;
+        color: #7f8c8d;
+        margin-top: 3rem;
+        font-size: 0.9rem;
+    }
+</style>
+''')
+
+SIDEBAR_TITLE = '<div class="sidebar-title">Quotes Forever</div>'
+FOOTER = '<div class="footer">Made by crashlar | Quotes Forever </div>'
+
+QUOTE_CARD = ('<div class="quote-container"><div class="category-badge">{badge}</div>'
+              '<div class="quote-text">"{text}"</div><div class="author-text">- {author}</div></div>')
+
+SEARCH_RESULT = ('<div class="search-result"><div class="result-text">"{snippet}"</div>'
+                 '<div class="result-author">- {author} · {category}</div></div>')
+
+
+@lru_cache(maxsize=None)
+def header(title):
+    return f'<div class="main-header">{html.escape(title)}</div>'
+
+
+@lru_cache(maxsize=4096)
+def quote_card(text, author, badge):
+    """The quote-container card, escaped so user-submitted quotes can't inject markup"""
+    return QUOTE_CARD.format(badge=html.escape(badge), text=html.escape(text), author=html.escape(author))
+
+
+def search_result(result):
+    # Snippets are already escaped by search.highlight()
+    return SEARCH_RESULT.format(snippet=result['snippet'], author=result['author_snippet'],
+                                category=html.escape(result['category']))
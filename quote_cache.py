@@ -0,0 +1,177 @@
+import os
+import sqlite3
+import sys
+import threading
+
+from db import DataVersionWatcher
+from sampler import CategorySampler, QuoteSampler
+
+
+def row_size(row):
+    """Rough byte size of a cached row (dict + keys + values)"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+
+
+class QuoteCache:
+    """Shared in-memory copy of the quotes table
+
+    Reads are served from memory. Writes made in this process are applied
+    incrementally through add(); writes from other processes (setup.py) are
+    noticed through PRAGMA data_version, which is polled at most once every
+    check_interval seconds so that a cache hit never touches SQLite.
+
+    When serving a read-only snapshot, quotes submitted since it was built
+    live in the write store (overlay_path) and are loaded on top of it.
+    """
+
+    def __init__(self, path, table='quotes', check_interval=2.0, category_weights=None, overlay_path=None):
+        self.path = path
+        self.table = table
+        self.overlay_path = overlay_path
+        self.rows = {}
+        self.sampler = QuoteSampler(table)
+        self.categories = CategorySampler(category_weights)
+        self.lock = threading.RLock()
+        self.watcher = DataVersionWatcher(path, check_interval)
+        self.max_id = 0
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.changes = 0
+        self.bytes = 0
+
+    def load(self):
+        """Read the whole table into memory"""
+        with self.lock:
+            # Mark first so a commit that lands while we read is seen next time
+            self.watcher.mark()
+            conn = self.watcher.connection()
+            rows = {}
+            size = 0
+            for row in conn.execute(f"SELECT * FROM {self.table} ORDER BY id"):
+                record = dict(row)
+                rows[record['id']] = record
+                size += row_size(record)
+            for record in self.overlay_rows():
+                rows[record['id']] = record
+                size += row_size(record)
+            self.rows = rows
+            self.bytes = size
+            self.max_id = max(rows) if rows else 0
+            self.sampler.reset(rows.keys())
+            self.categories.reset((quote_id, row['category']) for quote_id, row in rows.items())
+            self.loaded = True
+            self.reloads += 1
+
+    def overlay_rows(self):
+        """Rows of the write store not yet merged into the snapshot"""
+        if not self.overlay_path or not os.path.exists(self.overlay_path):
+            return []
+        conn = sqlite3.connect(f"file:{os.path.abspath(self.overlay_path)}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute(f"SELECT * FROM {self.table} ORDER BY id")]
+        except sqlite3.OperationalError:
+            # No submissions yet
+            return []
+        finally:
+            conn.close()
+
+    def sync(self):
+        """Pull in changes made by other connections since the last check"""
+        if not self.watcher.changed():
+            return False
+        if self.watcher.read_only:
+            # A new snapshot was renamed into place
+            self.load()
+            return True
+        conn = self.watcher.connection()
+        new_rows = conn.execute(
+            f"SELECT * FROM {self.table} WHERE id > ? ORDER BY id", (self.max_id,)
+        ).fetchall()
+        for row in new_rows:
+            self.add(dict(row), bump=False)
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count != len(self.rows):
+            # Rows were deleted or the table was rebuilt; start over
+            self.load()
+        return True
+
+    def ensure_fresh(self):
+        with self.lock:
+            if not self.loaded:
+                self.misses += 1
+                self.load()
+            elif self.sync():
+                self.misses += 1
+                return
+            self.hits += 1
+
+    def add(self, row, bump=True):
+        """Insert or replace one row, e.g. right after the Add Quote form commits"""
+        with self.lock:
+            if not self.loaded:
+                return
+            old = self.rows.get(row['id'])
+            if old is not None:
+                self.bytes -= row_size(old)
+            self.rows[row['id']] = row
+            self.bytes += row_size(row)
+            if old is None:
+                self.sampler.add(row['id'])
+                self.categories.add(row['id'], row['category'])
+            self.max_id = max(self.max_id, row['id'])
+            if bump:
+                self.changes += 1
+
+    def get(self, quote_id):
+        self.ensure_fresh()
+        return self.rows.get(quote_id)
+
+    def get_many(self, quote_ids):
+        """Rows for several ids in one pass (None for ids that no longer exist)"""
+        self.ensure_fresh()
+        with self.lock:
+            return [self.rows.get(quote_id) for quote_id in quote_ids]
+
+    def random_quote(self, categories=None):
+        """A random quote, optionally only from some categories and subject to the category weights"""
+        self.ensure_fresh()
+        if categories or self.categories.weighted:
+            quote_id = self.categories.random_id(categories)
+        else:
+            quote_id = self.sampler.random_id()
+        return self.rows.get(quote_id) if quote_id is not None else None
+
+    def sorted_ids(self):
+        """Ids of all cached quotes in ascending order"""
+        self.ensure_fresh()
+        return self.sampler.ids
+
+    def category_sampler(self):
+        """Per-category ids and weights of the cached quotes"""
+        self.ensure_fresh()
+        return self.categories
+
+    @property
+    def version(self):
+        """Changes whenever the cached contents change, for cache keys and ETags"""
+        return (self.reloads, len(self.rows), self.max_id, self.changes)
+
+    def all(self):
+        self.ensure_fresh()
+        with self.lock:
+            return list(self.rows.values())
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'rows': len(self.rows),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'reloads': self.reloads,
+            'local_changes': self.changes,
+        }
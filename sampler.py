@@ -0,0 +1,225 @@
+import random
+import threading
+from array import array
+from collections import OrderedDict
+
+# Alias tables kept per category filter; the filter comes from clients, so
+# the number of distinct combinations is unbounded
+TABLE_CACHE_SIZE = 256
+
+
+class QuoteSampler:
+    """Uniform random row sampling over a table without ORDER BY RANDOM()
+
+    Keeps a dense array of the ids that exist in the table, so a draw is a
+    single random index plus one primary-key lookup. New rows are picked up
+    either through add() or by reading ids above the highest one we know about,
+    and deleted rows are detected when a sampled id no longer resolves.
+    """
+
+    def __init__(self, table='quotes'):
+        self.table = table
+        self.ids = array('q')
+        self.max_id = 0
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self, conn):
+        """Rebuild the id array from scratch"""
+        ids = array('q')
+        cursor = conn.execute(f"SELECT id FROM {self.table} ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            ids.extend(row[0] for row in rows)
+        with self.lock:
+            self.ids = ids
+            self.max_id = ids[-1] if ids else 0
+            self.loaded = True
+
+    def reset(self, ids):
+        """Replace the id array with ids that are already known (e.g. from a cache)"""
+        ids = array('q', sorted(ids))
+        with self.lock:
+            self.ids = ids
+            self.max_id = ids[-1] if ids else 0
+            self.loaded = True
+
+    def refresh(self, conn):
+        """Append ids inserted since the last load (cheap MAX(id) check first)"""
+        if not self.loaded:
+            self.load(conn)
+            return
+        max_id = conn.execute(f"SELECT MAX(id) FROM {self.table}").fetchone()[0] or 0
+        if max_id < self.max_id:
+            # Table was truncated or rebuilt underneath us
+            self.load(conn)
+        elif max_id > self.max_id:
+            rows = conn.execute(
+                f"SELECT id FROM {self.table} WHERE id > ? ORDER BY id", (self.max_id,)
+            ).fetchall()
+            with self.lock:
+                for row in rows:
+                    if row[0] > self.max_id:
+                        self.ids.append(row[0])
+                        self.max_id = row[0]
+
+    def add(self, quote_id):
+        """Register a freshly inserted id"""
+        with self.lock:
+            if self.loaded and quote_id > self.max_id:
+                self.ids.append(quote_id)
+                self.max_id = quote_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def random_id(self):
+        with self.lock:
+            if not self.ids:
+                return None
+            return self.ids[random.randrange(len(self.ids))]
+
+    def random_quote(self, conn):
+        """Return one uniformly chosen row, or None if the table is empty"""
+        self.refresh(conn)
+        for attempt in range(2):
+            quote_id = self.random_id()
+            if quote_id is None:
+                return None
+            row = conn.execute(f"SELECT * FROM {self.table} WHERE id = ?", (quote_id,)).fetchone()
+            if row is not None:
+                return row
+            # The id was deleted since we loaded; rebuild so the draw stays uniform
+            self.load(conn)
+        return None
+
+
+class AliasTable:
+    """Vose's alias method: O(1) draws from a fixed discrete distribution
+
+    Built in O(n) from non-negative weights. A draw picks a column uniformly,
+    then keeps it or takes its alias with one biased coin flip.
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        self.n = n
+        self.probability = [0.0] * n
+        self.alias = list(range(n))
+        if not n or total <= 0:
+            self.n = 0
+            return
+        scaled = [weight * n / total for weight in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1 up to rounding error
+        for i in small + large:
+            self.probability[i] = 1.0
+
+    def draw(self, rng=random):
+        """Index of the drawn outcome, or None if every weight was zero"""
+        if not self.n:
+            return None
+        column = rng.randrange(self.n)
+        return column if rng.random() < self.probability[column] else self.alias[column]
+
+
+class CategorySampler:
+    """Weighted, category-filtered random ids in O(1) per draw
+
+    Keeps one dense id array per category. A draw picks a category with an
+    alias table, then an id uniformly within it. A category's share is its
+    quote count times its weight (1 unless configured), so weights below 1
+    tone down a category that one source floods. Adding a quote appends to
+    its category's array and only invalidates the alias tables, which cover
+    a dozen or so categories and are rebuilt on the next draw.
+    """
+
+    def __init__(self, weights=None):
+        self.weights = dict(weights or {})
+        self.ids = {}
+        self.version = 0
+        self.tables = OrderedDict()
+        # Reentrant: random_id holds it across table() so a reset can't land between draw and lookup
+        self.lock = threading.RLock()
+
+    @property
+    def weighted(self):
+        return any(weight != 1 for weight in self.weights.values())
+
+    def reset(self, rows):
+        """Rebuild from (id, category) pairs"""
+        ids = {}
+        for quote_id, category in rows:
+            ids.setdefault(category, array('q')).append(quote_id)
+        with self.lock:
+            self.ids = {category: array('q', sorted(values)) for category, values in ids.items()}
+            self.version += 1
+            self.tables = OrderedDict()
+
+    def add(self, quote_id, category):
+        with self.lock:
+            self.ids.setdefault(category, array('q')).append(quote_id)
+            self.version += 1
+            self.tables = OrderedDict()
+
+    def counts(self):
+        with self.lock:
+            return {category: len(ids) for category, ids in self.ids.items()}
+
+    def table(self, categories=None):
+        """(alias table, category names) for a filter; None means every category
+
+        Unknown and empty categories in the filter are dropped, so the same
+        categories in any order or with repeats share one cached table.
+        """
+        with self.lock:
+            key = tuple(sorted({name for name in categories if self.ids.get(name)})) if categories else None
+            cached = self.tables.get(key)
+            if cached is not None:
+                self.tables.move_to_end(key)
+                return cached
+            names = list(key) if key is not None else [name for name in sorted(self.ids) if self.ids[name]]
+            weights = [len(self.ids[name]) * self.weights.get(name, 1.0) for name in names]
+            cached = self.tables[key] = (AliasTable(weights), names)
+            if len(self.tables) > TABLE_CACHE_SIZE:
+                self.tables.popitem(last=False)
+            return cached
+
+    def random_category(self, categories=None, rng=random):
+        alias, names = self.table(categories)
+        index = alias.draw(rng)
+        return names[index] if index is not None else None
+
+    def random_id(self, categories=None, rng=random):
+        with self.lock:
+            category = self.random_category(categories, rng)
+            if category is None:
+                return None
+            ids = self.ids[category]
+            return ids[rng.randrange(len(ids))]
+
+
+def parse_weights(text):
+    """Category weights from "Wisdom=0.3,Motivation=0.5" (QUOTES_CATEGORY_WEIGHTS)"""
+    weights = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        category, _, weight = item.rpartition('=')
+        try:
+            weights[category.strip()] = float(weight)
+        except ValueError:
+            raise ValueError(f"bad category weight {item.strip()!r}; expected Category=number") from None
+        if not category.strip() or weights[category.strip()] < 0:
+            raise ValueError(f"bad category weight {item.strip()!r}; expected Category=number")
+    return weights
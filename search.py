@@ -0,0 +1,83 @@
+import html
+import re
+
+# Private-use characters mark the snippet highlights, so the quote text can be
+# HTML-escaped before the markers are turned into <mark> tags
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# bm25 weights for (quote_text, author)
+RANK_WEIGHTS = 'bm25(10.0, 4.0)'
+
+
+def build_match_query(text, prefix=False):
+    """Turn free text into a safe FTS5 query, optionally prefix-matching the last word"""
+    tokens = TOKEN.findall(text)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    escaped = html.escape(snippet)
+    return escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+def search_quotes(conn, text, limit=10, after=None):
+    """BM25-ranked full-text search over quotes
+
+    Returns (results, next_cursor). Pass next_cursor back as after= to get the
+    next page; paging is keyset-based on (rank, id), so deep pages cost the
+    same as the first one. Whole words are tried first; the last word is only
+    treated as a prefix when that doesn't fill a page, because a short prefix
+    can expand to a large share of the index.
+    """
+    if after is not None:
+        prefix, last_rank, last_id = after
+        query = build_match_query(text, prefix)
+        if query is None:
+            return [], None
+        return run_search(conn, query, prefix, limit, (last_rank, last_id))
+    query = build_match_query(text)
+    if query is None:
+        return [], None
+    results, next_cursor = run_search(conn, query, False, limit)
+    if len(results) < limit:
+        results, next_cursor = run_search(conn, build_match_query(text, True), True, limit)
+    return results, next_cursor
+
+
+def run_search(conn, query, prefix, limit, after=None):
+    sql = f'''
+        SELECT q.id, q.quote_text, q.author, q.category, quotes_fts.rank AS rank,
+               snippet(quotes_fts, 0, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', 24) AS text_snippet,
+               highlight(quotes_fts, 1, '{HIGHLIGHT_START}', '{HIGHLIGHT_END}') AS author_snippet
+        FROM quotes_fts
+        JOIN quotes q ON q.id = quotes_fts.rowid
+        WHERE quotes_fts MATCH ? AND quotes_fts.rank MATCH '{RANK_WEIGHTS}'
+    '''
+    params = [query]
+    if after is not None:
+        last_rank, last_id = after
+        sql += ' AND (quotes_fts.rank > ? OR (quotes_fts.rank = ? AND quotes_fts.rowid > ?))'
+        params += [last_rank, last_rank, last_id]
+    sql += ' ORDER BY quotes_fts.rank, quotes_fts.rowid LIMIT ?'
+    params.append(limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+    results = [{
+        'id': row['id'],
+        'quote_text': row['quote_text'],
+        'author': row['author'],
+        'category': row['category'],
+        'rank': row['rank'],
+        'snippet': highlight(row['text_snippet']),
+        'author_snippet': highlight(row['author_snippet']),
+    } for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = (prefix, results[-1]['rank'], results[-1]['id'])
+    return results, next_cursor
@@ -1,29 +1,52 @@
+import argparse
 import sqlite3
 import os
-import requests
-import json
 import random
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import chain
+from bundle import export_bundle
+from corpus import (CHUNK_ROWS, EXPORT_COLUMNS, FORMATS, Validator, detect_format, read_ahead, read_chunks,
+                    read_header, resolve_columns, write_rows)
+from daily import SCHEMA as DAILY_QUOTES_SCHEMA, extend_schedule
+from db import DB_PATH
+from favorites import SCHEMA as FAVORITES_SCHEMA
+from dedup import content_hash
+from http_client import HttpClient, ResponseCache, CACHE_DIR, CACHE_TTL
+from loader import BulkLoader, QUOTE_COLUMNS, MOOD_QUOTE_COLUMNS, QUOTE_UPSERT, MOOD_QUOTE_UPSERT
+from near_dup import ensure_source_column, merge_near_duplicates, merged_hashes
+from similar import build_index, index_dir, publish_index
+from snapshot import SnapshotBuild
+
+# API endpoints; override them (e.g. with a local stub server) through QuoteFetcher(urls=...)
+SOURCE_URLS = {
+    'zenquotes': "https://zenquotes.io/api/quotes",
+    'forismatic': "https://api.forismatic.com/api/1.0/?method=getQuote&format=json&lang=en",
+    'typefit': "https://type.fit/api/quotes",
+}
 
 class QuoteFetcher:
-    def __init__(self):
-        self.quotes_data = []
-        self.mood_quotes_data = []
+    def __init__(self, client=None, urls=None):
+        self.client = client or HttpClient()
+        self.urls = dict(SOURCE_URLS, **(urls or {}))
 
-    def fetch_zenquotes_api(self):
-        """Fetch quotes from ZenQuotes API"""
+    def iter_zenquotes_api(self):
+        """Yield quotes from ZenQuotes API"""
         try:
             print("📡 Fetching quotes from ZenQuotes API...")
-            response = requests.get("https://zenquotes.io/api/quotes")
-            if response.status_code == 200:
-                data = response.json()
+            data = self.client.get_json(self.urls['zenquotes'], 'zenquotes')
+            if data is not None:
                 for item in data:
-                    self.quotes_data.append({
+                    yield {
                         'text': item['q'],
                         'author': item['a'],
                         'category': 'Wisdom',
-                        'inspiration': 'ZenQuotes API'
-                    })
+                        'inspiration': 'ZenQuotes API',
+                        'source': 'ZenQuotes API'
+                    }
                 print(f"✅ Fetched {len(data)} quotes from ZenQuotes")
             else:
                 print("❌ ZenQuotes API unavailable, using fallback data")
@@ -50,50 +73,93 @@ class QuoteFetcher:
     #     except Exception as e:
     #         print(f"❌ Error fetching Quotable: {e}")
 
-    def fetch_forismatic_api(self):
-        """Fetch quotes from Forismatic API"""
+    def iter_forismatic_api(self, count=50):
+        """Yield quotes from Forismatic API"""
+        fetched = 0
         try:
             print("📡 Fetching quotes from Forismatic API...")
-            # Fetch multiple quotes
-            for _ in range(50):
-                response = requests.get("https://api.forismatic.com/api/1.0/?method=getQuote&format=json&lang=en")
-                if response.status_code == 200:
+            # Forismatic returns one quote per call, so fan the calls out over the pooled client
+            workers = self.client.limits['forismatic']['concurrency']
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # Every call hits the same URL, so number them to keep one cached snapshot each
+                futures = [pool.submit(self.client.get_json, self.urls['forismatic'], 'forismatic',
+                                       f"{self.urls['forismatic']}#{i}")
+                           for i in range(count)]
+                # Consume in submission order so replays produce the same sequence
+                for future in futures:
                     try:
-                        data = response.json()
-                        self.quotes_data.append({
+                        data = future.result()
+                        if data is None:
+                            continue
+                        quote = {
                             'text': data['quoteText'].strip(),
                             'author': data['quoteAuthor'] if data['quoteAuthor'] else 'Unknown',
                             'category': 'Inspirational',
-                            'inspiration': 'Forismatic API'
-                        })
-                    except:
+                            'inspiration': 'Forismatic API',
+                            'source': 'Forismatic API'
+                        }
+                    except Exception:
                         continue
-            print(f"✅ Fetched quotes from Forismatic API")
+                    fetched += 1
+                    yield quote
+            print(f"✅ Fetched {fetched} quotes from Forismatic API")
         except Exception as e:
             print(f"❌ Error fetching Forismatic: {e}")
 
-    def fetch_typefit_api(self):
-        """Fetch quotes from TypeFit API"""
+    def iter_typefit_api(self):
+        """Yield quotes from TypeFit API"""
         try:
             print("📡 Fetching quotes from TypeFit API...")
-            response = requests.get("https://type.fit/api/quotes")
-            if response.status_code == 200:
-                data = response.json()
+            data = self.client.get_json(self.urls['typefit'], 'typefit')
+            if data is not None:
                 for item in data[:100]:  # Take first 100 quotes
-                    self.quotes_data.append({
+                    yield {
                         'text': item['text'],
                         'author': item['author'] if item['author'] else 'Unknown',
                         'category': 'Motivation',
-                        'inspiration': 'TypeFit API'
-                    })
+                        'inspiration': 'TypeFit API',
+                        'source': 'TypeFit API'
+                    }
                 print(f"✅ Fetched {len(data[:100])} quotes from TypeFit")
             else:
                 print("❌ TypeFit API unavailable")
         except Exception as e:
             print(f"❌ Error fetching TypeFit: {e}")
 
-    def generate_mood_quotes(self):
-        """Generate comprehensive mood-based quotes"""
+    def stream_quotes(self, buffer_size=1000):
+        """Yield quotes from every API as they arrive
+
+        The sources run concurrently and hand records over through a bounded
+        queue, so memory stays flat no matter how much a source returns.
+        """
+        sources = [self.iter_zenquotes_api, self.iter_forismatic_api, self.iter_typefit_api]
+        if self.client.offline:
+            # Replaying from disk is fast anyway; go in order so every rebuild is identical
+            for source in sources:
+                yield from source()
+            return
+        buffer = queue.Queue(maxsize=buffer_size)
+        done = object()
+
+        def produce(source):
+            try:
+                for quote in source():
+                    buffer.put(quote)
+            finally:
+                buffer.put(done)
+
+        for source in sources:
+            threading.Thread(target=produce, args=(source,), daemon=True).start()
+        remaining = len(sources)
+        while remaining:
+            item = buffer.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+
+    def iter_mood_quotes(self):
+        """Yield comprehensive mood-based quotes"""
         print("🎭 Generating mood-based quotes...")
         
         # Happy mood quotes
@@ -179,21 +245,23 @@ class QuoteFetcher:
         
         # Convert to database format with additional parameters
         for text, author, mood in all_mood_quotes:
-            self.mood_quotes_data.append({
+            # Seeded per quote so every setup run targets a quote the same way
+            rng = random.Random(f"{mood}|{text}")
+            yield {
                 'text': text,
                 'author': author,
                 'mood': mood,
-                'gender_preference': random.choice(['both', 'both', 'both', 'girl', 'boy']),
-                'min_age': random.randint(15, 25),
-                'max_age': random.randint(45, 80),
-                'social_life': random.choice(['good', 'not good', 'balanced']),
-                'professional_life': random.choice(['good', 'struggling', 'balanced'])
-            })
+                'gender_preference': rng.choice(['both', 'both', 'both', 'girl', 'boy']),
+                'min_age': rng.randint(15, 25),
+                'max_age': rng.randint(45, 80),
+                'social_life': rng.choice(['good', 'not good', 'balanced']),
+                'professional_life': rng.choice(['good', 'struggling', 'balanced'])
+            }
         
-        print(f"✅ Generated {len(self.mood_quotes_data)} mood-based quotes")
+        print(f"✅ Generated {len(all_mood_quotes)} mood-based quotes")
 
-    def add_fallback_data(self):
-        """Add comprehensive fallback data if APIs fail"""
+    def iter_fallback_data(self):
+        """Yield comprehensive fallback data if APIs fail"""
         print("📝 Adding comprehensive fallback data...")
         
         fallback_quotes = [
@@ -237,18 +305,16 @@ class QuoteFetcher:
         ]
         
         for text, author, category, inspiration in fallback_quotes:
-            self.quotes_data.append({
+            yield {
                 'text': text,
                 'author': author,
                 'category': category,
-                'inspiration': inspiration
-            })
+                'inspiration': inspiration,
+                'source': 'fallback'
+            }
 
-def setup_database():
-    """Initialize the database with required tables and massive data"""
-    conn = sqlite3.connect('database/data.db')
-    cursor = conn.cursor()
-    
+def create_tables(cursor):
+    """Create the application tables if they don't exist yet"""
     # Create quotes table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS quotes (
@@ -257,7 +323,9 @@ def setup_database():
             author TEXT NOT NULL,
             category TEXT NOT NULL,
             inspiration TEXT,
-            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            content_hash TEXT,
+            source TEXT
         )
     ''')
     
@@ -286,46 +354,211 @@ def setup_database():
             min_age INTEGER,
             max_age INTEGER,
             social_life TEXT,
-            professional_life TEXT
+            professional_life TEXT,
+            content_hash TEXT
         )
     ''')
     
+    # Quote of the Day schedule, filled in after the quotes are loaded
+    cursor.execute(DAILY_QUOTES_SCHEMA)
+    
+    # Quotes saved with "Add to Favorites"
+    cursor.execute(FAVORITES_SCHEMA)
+
+# Which columns make a row unique in each table
+HASHED_COLUMNS = {
+    'quotes': ('quote_text',),
+    'mood_quotes': ('quote_text', 'mood_category'),
+}
+
+def ensure_content_hashes(conn):
+    """Add and backfill content_hash on older databases, drop duplicates, enforce uniqueness"""
+    conn.create_function('content_hash', -1, content_hash, deterministic=True)
+    for table, columns in HASHED_COLUMNS.items():
+        existing = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if 'content_hash' not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN content_hash TEXT")
+        conn.execute(f"UPDATE {table} SET content_hash = content_hash({', '.join(columns)}) WHERE content_hash IS NULL")
+        removed = conn.execute(f'''
+            DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY content_hash)
+        ''').rowcount
+        if removed:
+            print(f"🧹 Removed {removed} duplicate rows from {table}")
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_content_hash ON {table} (content_hash)")
+    conn.commit()
+
+def create_indexes(cursor):
+    """Create secondary indexes; run after bulk loads so they are built once"""
+    # Composite index matching the mood page lookup (equality columns first, age range last)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_mood_quotes_match
+        ON mood_quotes (mood_category, gender_preference, social_life, professional_life, min_age, max_age)
+    ''')
+
+def create_search_index(cursor):
+    """Create the FTS5 index over quotes and the triggers that keep it in sync"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'quotes_fts'")
+    exists = cursor.fetchone() is not None
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts USING fts5(
+            quote_text, author,
+            content='quotes', content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS quotes_fts_insert AFTER INSERT ON quotes BEGIN
+            INSERT INTO quotes_fts (rowid, quote_text, author) VALUES (new.id, new.quote_text, new.author);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS quotes_fts_delete AFTER DELETE ON quotes BEGIN
+            INSERT INTO quotes_fts (quotes_fts, rowid, quote_text, author)
+            VALUES ('delete', old.id, old.quote_text, old.author);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS quotes_fts_update AFTER UPDATE OF quote_text, author ON quotes BEGIN
+            INSERT INTO quotes_fts (quotes_fts, rowid, quote_text, author)
+            VALUES ('delete', old.id, old.quote_text, old.author);
+            INSERT INTO quotes_fts (rowid, quote_text, author) VALUES (new.id, new.quote_text, new.author);
+        END
+    ''')
+    if not exists:
+        # New index over existing rows: fill it in one pass
+        print("🔎 Building full-text search index...")
+        cursor.execute("INSERT INTO quotes_fts (quotes_fts) VALUES ('rebuild')")
+
+def drop_indexes(cursor):
+    """Drop the secondary indexes so a bulk load doesn't maintain them row by row"""
+    cursor.execute("DROP INDEX IF EXISTS idx_mood_quotes_match")
+
+def quote_row(quote):
+    return (quote['text'], quote['author'], quote['category'], quote['inspiration'],
+            content_hash(quote['text']), quote['source'])
+
+def mood_quote_row(quote):
+    return (quote['text'], quote['author'], quote['mood'], quote['gender_preference'],
+            quote['min_age'], quote['max_age'], quote['social_life'], quote['professional_life'],
+            content_hash(quote['text'], quote['mood']))
+
+QUOTE_HASH = QUOTE_COLUMNS.index('content_hash')
+
+def unmerged(rows, merged):
+    """Drop rows whose content hash was merged into another quote as a near-duplicate"""
+    return (row for row in rows if row[QUOTE_HASH] not in merged)
+
+def report_near_duplicates(conn, workers=None):
+    """Fold quotes that differ only slightly (e.g. across sources) into one row each"""
+    print("🧬 Looking for near-duplicate quotes...")
+    signed, groups, removed = merge_near_duplicates(conn, workers)
+    if removed:
+        print(f"   Merged {removed} near-duplicates into {groups} quotes (variants kept in quote_lineage)")
+
+def report_similarity_index(conn, path, workers=None):
+    """Build the "More like this" vectors for the snapshot; returns the directory they wait in"""
+    print("🧭 Building the similar-quotes index...")
+    started = time.perf_counter()
+    # Kept next to the snapshot being built until both are published
+    staging = index_dir(path) + '.building'
+    count = build_index(conn, staging, workers)
+    print(f"   {count:,} quotes indexed in {time.perf_counter() - started:.1f}s")
+    return staging
+
+def report_write_store(build):
+    """Bring in what the forms saved while the app was serving read-only"""
+    merged = build.merge_write_store()
+    if merged:
+        print(f"📝 Merged {merged} submissions from the write store")
+
+def publish_snapshot(build, index=None):
+    """Put the snapshot, and the similar-quotes index built from it, in place"""
+    print("📸 Analyzing and compacting the snapshot...")
+    started = time.perf_counter()
+    build.publish()
+    if index is not None:
+        publish_index(index, index_dir(build.path))
+    print(f"   {build.path} replaced in {time.perf_counter() - started:.1f}s")
+
+def report_load(table, counts):
+    print(f"   {table}: {counts['inserted']} inserted, {counts['updated']} updated, "
+          f"{counts['skipped']} skipped (already present)")
+
+def setup_database(fetcher=None, path=DB_PATH, rebuild=False):
+    """Initialize the database with required tables and massive data
+
+    By default the run is incremental: quotes already in the database (by
+    content hash) are skipped, so re-running setup does not grow it. With
+    rebuild=True the quote tables are recreated from scratch first. The run
+    works on a copy of the database that replaces it only once it is complete.
+    """
+    build = SnapshotBuild(path)
+    print(f"📸 Building the next snapshot in {build.temp_path}")
+    conn = build.open()
+    cursor = conn.cursor()
+    
+    if rebuild:
+        print("♻️  Rebuilding quote tables from scratch...")
+        cursor.execute("DROP TABLE IF EXISTS quotes")
+        cursor.execute("DROP TABLE IF EXISTS mood_quotes")
+        # Rebuilt in one pass after the load instead of row by row through the triggers
+        cursor.execute("DROP TABLE IF EXISTS quotes_fts")
+        # Scheduled ids would point at the old rows
+        cursor.execute("DROP TABLE IF EXISTS daily_quotes")
+        # As would near-duplicate signatures and lineage
+        cursor.execute("DROP TABLE IF EXISTS quote_minhash")
+        cursor.execute("DROP TABLE IF EXISTS quote_lineage")
+    create_tables(cursor)
+    ensure_content_hashes(conn)
+    ensure_source_column(conn)
+    report_write_store(build)
+    if rebuild:
+        # Nothing to keep up to date yet, build the indexes once at the end
+        drop_indexes(cursor)
+    conn.commit()
+    
     # Fetch data from multiple sources
-    fetcher = QuoteFetcher()
+    fetcher = fetcher or QuoteFetcher()
     
     print("🚀 Starting data collection from multiple sources...")
     print("=" * 60)
     
-    # Fetch from APIs
-    fetcher.fetch_zenquotes_api()
-    # fetcher.fetch_quotable_api()
-    fetcher.fetch_forismatic_api()
-    fetcher.fetch_typefit_api()
+    # Variants already merged into another quote stay merged
+    merged = merged_hashes(conn)
     
-    # Generate mood quotes
-    fetcher.generate_mood_quotes()
-    
-    # Add fallback data if APIs didn't provide enough
-    if len(fetcher.quotes_data) < 50:
-        fetcher.add_fallback_data()
+    # Stream quotes from the APIs straight into the database in batches
+    print("\n💾 Streaming quotes into database...")
+    with BulkLoader(conn) as loader:
+        # fetcher.fetch_quotable_api()
+        fetched = loader.load('quotes', QUOTE_COLUMNS, unmerged(map(quote_row, fetcher.stream_quotes()), merged),
+                              QUOTE_UPSERT)
+        
+        # Add fallback data if APIs didn't provide enough
+        if fetched['rows'] < 50:
+            loader.load('quotes', QUOTE_COLUMNS, unmerged(map(quote_row, fetcher.iter_fallback_data()), merged),
+                        QUOTE_UPSERT)
+        
+        # Generate mood quotes
+        loader.load('mood_quotes', MOOD_QUOTE_COLUMNS, map(mood_quote_row, fetcher.iter_mood_quotes()),
+                    MOOD_QUOTE_UPSERT)
     
-    # Insert quotes into database
-    print("\n💾 Inserting quotes into database...")
-    for quote in fetcher.quotes_data:
-        cursor.execute('''
-            INSERT INTO quotes (quote_text, author, category, inspiration)
-            VALUES (?, ?, ?, ?)
-        ''', (quote['text'], quote['author'], quote['category'], quote['inspiration']))
+    for table, counts in loader.counts.items():
+        report_load(table, counts)
+    report_near_duplicates(conn)
     
-    # Insert mood quotes into database
-    for quote in fetcher.mood_quotes_data:
-        cursor.execute('''
-            INSERT INTO mood_quotes (quote_text, author, mood_category, gender_preference, min_age, max_age, social_life, professional_life)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (quote['text'], quote['author'], quote['mood'], quote['gender_preference'], 
-              quote['min_age'], quote['max_age'], quote['social_life'], quote['professional_life']))
+    # Build indexes once, after the data is in
+    create_indexes(cursor)
+    create_search_index(cursor)
+    conn.commit()
+    index = report_similarity_index(conn, path)
     
+    # Precompute the Quote of the Day schedule for the months ahead
+    ids = [row[0] for row in cursor.execute("SELECT id FROM quotes ORDER BY id")]
+    scheduled = extend_schedule(conn, ids, datetime.now().date())
     conn.commit()
+    if scheduled:
+        print(f"📅 Scheduled Quote of the Day for {scheduled} more days")
     
     # Count inserted records
     cursor.execute("SELECT COUNT(*) FROM quotes")
@@ -334,7 +567,7 @@ def setup_database():
     cursor.execute("SELECT COUNT(*) FROM mood_quotes")
     mood_quote_count = cursor.fetchone()[0]
     
-    conn.close()
+    publish_snapshot(build, index)
     
     print("=" * 60)
     print(f"✅ Database setup completed successfully!")
@@ -342,6 +575,121 @@ def setup_database():
     print(f"🎭 Total mood-based quotes: {mood_quote_count}")
     print(f"💫 Total quotes overall: {quote_count + mood_quote_count}")
 
+LOADS = {
+    'quotes': (QUOTE_COLUMNS, QUOTE_UPSERT),
+    'mood_quotes': (MOOD_QUOTE_COLUMNS, MOOD_QUOTE_UPSERT),
+}
+
+def progress_printer(verb):
+    started = time.perf_counter()
+    def progress(table, total):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(f"\r   {verb} {table}: {total:,} rows ({total / elapsed:,.0f} rows/s)", end='', flush=True)
+    return progress
+
+def import_corpus(source, table='quotes', fmt=None, mapping=None, path=DB_PATH, batch_size=CHUNK_ROWS):
+    """Stream a CSV/JSONL/Parquet dump into quotes or mood_quotes
+
+    Rows are validated on the way in and loaded in batched transactions with
+    the same upserts as setup, so re-importing a dump adds nothing twice.
+    Rejected rows are counted and the first few reported; they never stop the
+    load. Like setup, it loads into a copy of the database that replaces the
+    live one when done. Returns the loader counts plus 'rejected'.
+    """
+    fmt = fmt or detect_format(source)
+    sources = resolve_columns(table, read_header(source, fmt), mapping)
+    columns, upsert = LOADS[table]
+    print(f"📥 Importing {source} into {table} ({fmt})")
+    
+    build = SnapshotBuild(path)
+    conn = build.open()
+    cursor = conn.cursor()
+    create_tables(cursor)
+    ensure_content_hashes(conn)
+    ensure_source_column(conn)
+    report_write_store(build)
+    drop_indexes(cursor)
+    conn.commit()
+    
+    validator = Validator(table)
+    rows = chain.from_iterable(read_ahead(validator.chunks(read_chunks(source, fmt, sources, batch_size))))
+    if table == 'quotes':
+        # Where a quote came from is kept for the near-duplicate lineage
+        name = os.path.basename(source)
+        rows = unmerged((row + (name,) for row in rows), merged_hashes(conn))
+    with BulkLoader(conn, batch_size, progress_printer('loaded')) as loader:
+        counts = loader.load(table, columns, rows, upsert)
+        print()
+        if table == 'quotes':
+            report_near_duplicates(conn)
+        # Still without a journal: index builds are as rebuildable as the load
+        create_indexes(cursor)
+        create_search_index(cursor)
+        conn.commit()
+    report_load(table, counts)
+    if validator.rejected:
+        print(f"⚠️  Rejected {validator.rejected:,} invalid rows, e.g.:")
+        for example in validator.examples:
+            print(f"     {example}")
+    
+    index = None
+    if table == 'quotes':
+        index = report_similarity_index(conn, path)
+        ids = [row[0] for row in cursor.execute("SELECT id FROM quotes ORDER BY id")]
+        extend_schedule(conn, ids, datetime.now().date())
+        conn.commit()
+    publish_snapshot(build, index)
+    return dict(counts, rejected=validator.rejected)
+
+def export_corpus(target, table='quotes', fmt=None, path=DB_PATH, batch_size=CHUNK_ROWS):
+    """Stream quotes or mood_quotes out to a CSV/JSONL/Parquet file; returns the row count"""
+    fmt = fmt or detect_format(target)
+    columns = EXPORT_COLUMNS[table]
+    print(f"📤 Exporting {table} to {target} ({fmt})")
+    conn = sqlite3.connect(path)
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+    progress = progress_printer('exported')
+    
+    def chunks():
+        total = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+            total += len(rows)
+            progress(table, total)
+    
+    total = write_rows(target, fmt, columns, chunks())
+    print()
+    conn.close()
+    print(f"✅ Exported {total:,} rows")
+    return total
+
+def bundle_corpus(directory, path=DB_PATH):
+    """Render the quotes and the Quote of the Day schedule into a static bundle; returns the stats"""
+    print(f"📦 Bundling quotes into {directory}")
+    start = time.time()
+    conn = sqlite3.connect(path)
+    try:
+        stats = export_bundle(conn, directory)
+    finally:
+        conn.close()
+    print(f"✅ {stats['quotes']:,} quotes in {stats['shards']:,} shards: {stats['written']:,} written, "
+          f"{stats['unchanged']:,} unchanged, {stats['removed']:,} removed "
+          f"({stats['bytes'] / 1e6:.1f} MB, {time.time() - start:.1f}s)")
+    print(f"📅 {stats['days']} days of Quote of the Day pages")
+    return stats
+
+def parse_mapping(pairs):
+    mapping = {}
+    for pair in pairs or ():
+        target, separator, source = pair.partition('=')
+        if not separator or not target or not source:
+            raise SystemExit(f"--map expects COLUMN=FIELD, got {pair!r}")
+        mapping[target.strip()] = source.strip()
+    return mapping
+
 def check_requirements():
     """Check if all required packages are installed"""
     required_packages = ['streamlit', 'sqlite3', 'requests']
@@ -349,10 +697,48 @@ def check_requirements():
     print("💡 Run: pip install streamlit requests")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and populate the Quotes Forever database")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="drop and recreate the quote tables instead of adding only new quotes")
+    parser.add_argument('--offline', action='store_true',
+                        help="replay cached API responses only, without touching the network")
+    parser.add_argument('--cache-ttl', type=int, default=CACHE_TTL,
+                        help="seconds before a cached API response is revalidated (default: one day)")
+    parser.add_argument('--no-cache', action='store_true', help="don't read or write the API response cache")
+    corpus = parser.add_argument_group('import / export')
+    transfer = corpus.add_mutually_exclusive_group()
+    transfer.add_argument('--import', dest='import_path', metavar='FILE',
+                          help="load a CSV, JSONL or Parquet dump instead of fetching from the APIs")
+    transfer.add_argument('--export', dest='export_path', metavar='FILE',
+                          help="write a table out as CSV, JSONL or Parquet")
+    transfer.add_argument('--bundle', dest='bundle_path', metavar='DIR',
+                          help="render quotes and the daily schedule into a static site bundle")
+    corpus.add_argument('--table', choices=sorted(LOADS), default='quotes')
+    corpus.add_argument('--format', choices=FORMATS, help="file format (default: from the file extension)")
+    corpus.add_argument('--map', action='append', metavar='COLUMN=FIELD',
+                        help="take a table column from a differently named file column; repeatable")
+    corpus.add_argument('--batch-size', type=int, default=CHUNK_ROWS, help="rows per read and per transaction")
+    args = parser.parse_args()
+    
+    if args.import_path or args.export_path or args.bundle_path:
+        try:
+            if args.bundle_path:
+                bundle_corpus(args.bundle_path)
+            elif args.import_path:
+                import_corpus(args.import_path, args.table, args.format, parse_mapping(args.map),
+                              batch_size=args.batch_size)
+            else:
+                export_corpus(args.export_path, args.table, args.format, batch_size=args.batch_size)
+        except (OSError, ValueError, RuntimeError) as e:
+            raise SystemExit(f"❌ {e}")
+        raise SystemExit(0)
+    
     print("🚀 Setting up Quotes Forever Project with Massive Data...")
     print("=" * 60)
     
-    setup_database()
+    cache = None if args.no_cache else ResponseCache(CACHE_DIR, args.cache_ttl)
+    client = HttpClient(cache=cache, offline=args.offline)
+    setup_database(QuoteFetcher(client), rebuild=args.rebuild)
     check_requirements()
     
     print("\n🎉 Setup completed! You can now run:")
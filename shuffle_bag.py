@@ -0,0 +1,180 @@
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+MASK64 = (1 << 64) - 1
+
+# One shared thread tops up every session's bag, off the click path
+refiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shuffle-bag')
+
+
+def mix(value, key):
+    """64-bit integer hash (splitmix64 finaliser) used as the Feistel round function"""
+    value = ((value ^ key) * 0xff51afd7ed558ccd) & MASK64
+    value ^= value >> 33
+    value = (value * 0xc4ceb9fe1a85ec53) & MASK64
+    return value ^ (value >> 33)
+
+
+class Permutation:
+    """Keyed pseudo-random permutation of range(n) in O(1) memory
+
+    A small Feistel network over the next even power of two, with cycle
+    walking to stay inside range(n), so a session can walk a shuffled order
+    of a million quotes without storing it.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, n, key):
+        self.n = n
+        self.half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half_bits) - 1
+        rng = random.Random(key)
+        self.keys = [rng.getrandbits(64) for _ in range(self.ROUNDS)]
+
+    def encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.mask
+        for key in self.keys:
+            left, right = right, left ^ (mix(right, key) & self.mask)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, index):
+        value = index
+        while True:
+            value = self.encrypt(value)
+            if value < self.n:
+                return value
+
+
+class ShuffleBag:
+    """Upcoming random quotes for one session, without repeats
+
+    Walks a per-session permutation of the cached quote ids, one cycle per
+    pass over the collection; quotes added mid-cycle join the next cycle.
+    Quotes are resolved in batches, and the bag is topped up in the
+    background once it drops below low_water, so next() is a deque pop.
+
+    With a category filter, or with category weights configured, each pick
+    first draws a category from the cache's alias table and then takes the
+    next id of that category's own permutation, so quotes still don't repeat
+    within a category until all of its quotes have been shown.
+    """
+
+    def __init__(self, cache, batch_size=32, low_water=8, seed=None, categories=None):
+        self.cache = cache
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.categories = tuple(sorted(categories)) if categories else None
+        self.rng = random.Random(self.seed)
+        self.cycle = 0
+        self.position = 0
+        self.permutation = None
+        # category -> [cycle, position, permutation]
+        self.walks = {}
+        self.upcoming = deque()
+        self.refilling = False
+        self.lock = threading.Lock()
+
+    def fill(self):
+        sampler = self.cache.category_sampler()
+        if self.categories or sampler.weighted:
+            batch = self.category_batch(sampler)
+        else:
+            batch = self.uniform_batch()
+        self.upcoming.extend(quote for quote in self.cache.get_many(batch) if quote is not None)
+
+    def uniform_batch(self):
+        ids = self.cache.sorted_ids()
+        batch = []
+        if not len(ids):
+            return batch
+        while len(batch) < self.batch_size:
+            if self.permutation is None or self.position >= self.permutation.n:
+                if self.permutation is not None:
+                    self.cycle += 1
+                self.permutation = Permutation(len(ids), f"{self.seed}|{self.cycle}")
+                self.position = 0
+            index = self.permutation[self.position]
+            self.position += 1
+            if index < len(ids):
+                batch.append(ids[index])
+        return batch
+
+    def category_batch(self, sampler):
+        batch = []
+        for _ in range(self.batch_size):
+            category = sampler.random_category(self.categories, self.rng)
+            if category is None:
+                break
+            ids = sampler.ids.get(category)
+            if not ids:
+                # The cache reloaded between the two lookups
+                continue
+            walk = self.walks.get(category)
+            if walk is None or walk[1] >= walk[2].n:
+                cycle = walk[0] + 1 if walk else 0
+                walk = self.walks[category] = [cycle, 0, Permutation(len(ids), f"{self.seed}|{category}|{cycle}")]
+            index = walk[2][walk[1]]
+            walk[1] += 1
+            if index < len(ids):
+                batch.append(ids[index])
+        return batch
+
+    def refill(self):
+        with self.lock:
+            if len(self.upcoming) < self.low_water:
+                self.fill()
+            self.refilling = False
+
+    def next(self):
+        """The next quote in this session's order, or None if there are no quotes"""
+        with self.lock:
+            if not self.upcoming:
+                self.fill()
+            quote = self.upcoming.popleft() if self.upcoming else None
+            low = len(self.upcoming) < self.low_water and not self.refilling
+            if low:
+                self.refilling = True
+        if low:
+            refiller.submit(self.refill)
+        return quote
+
+
+class QuoteHistory:
+    """Bounded back/forward history of the quote ids a session has seen"""
+
+    def __init__(self, size=50):
+        self.ids = deque(maxlen=size)
+        self.position = -1
+
+    def push(self, quote_id):
+        """Show a new quote; anything ahead of the current one is dropped, like a browser"""
+        while len(self.ids) > self.position + 1:
+            self.ids.pop()
+        self.ids.append(quote_id)
+        self.position = len(self.ids) - 1
+
+    @property
+    def current(self):
+        return self.ids[self.position] if self.position >= 0 else None
+
+    @property
+    def can_go_back(self):
+        return self.position > 0
+
+    @property
+    def can_go_forward(self):
+        return self.position < len(self.ids) - 1
+
+    def back(self):
+        if self.can_go_back:
+            self.position -= 1
+        return self.current
+
+    def forward(self):
+        if self.can_go_forward:
+            self.position += 1
+        return self.current
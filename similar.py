@@ -0,0 +1,299 @@
+""""More like this": nearest quotes by TF-IDF cosine similarity over hashed word n-grams
+
+setup.py builds the index next to the database: every quote's words and word
+pairs are hashed (crc32) into DIM signed buckets (the hashing trick), weighted
+by 1 + log(term frequency) times the inverse document frequency of the
+n-gram, and L2-normalised. The rows are written as a float32 .npy matrix
+(1 KB per quote) that the app memory-maps, so processes share the pages and
+start instantly. float32 rather than float16 because NumPy has no fast
+float16 matrix product on most CPUs.
+A lookup is one matrix-vector product per CHUNK rows plus an argpartition;
+several lookups share each pass over the matrix.
+
+Quotes added after the build are vectorised on first use with the stored
+IDF table and searched alongside the mapped matrix until the next build.
+
+Each published build lives in its own build-<ns> directory and the CURRENT
+file names the live one; replacing CURRENT is the single rename that swaps
+builds, so a reader never pairs one build's ids with another's matrix.
+"""
+import bisect
+import os
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dedup import normalize_text
+
+DIM = 256
+# Document frequencies are counted per hash bucket in a table this big
+DF_BINS = 1 << 20
+# Rows scored per matrix product
+CHUNK = 65536
+# Below this many quotes a process pool costs more than it saves
+POOL_MIN = 20000
+BUILD_CHUNK = 10000
+
+VECTORS = 'vectors.npy'
+IDS = 'ids.npy'
+IDF = 'idf.npy'
+CURRENT = 'CURRENT'
+BUILD_PREFIX = 'build-'
+
+
+def index_dir(db_path):
+    return os.path.join(os.path.dirname(db_path) or '.', 'similar')
+
+
+def current_dir(directory):
+    """Directory holding the live index files: the build CURRENT names, or directory itself for an older index"""
+    try:
+        with open(os.path.join(directory, CURRENT)) as f:
+            return os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        return directory
+
+
+def features(text):
+    """crc32 hashes of a quote's words and word pairs, repeats kept"""
+    words = normalize_text(text).split()
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [zlib.crc32(gram.encode('utf-8')) for gram in grams]
+
+
+def flatten(texts):
+    """(document index, hash) arrays for every n-gram of a batch of texts"""
+    hashed = [features(text) for text in texts]
+    counts = np.fromiter((len(h) for h in hashed), np.int64, len(hashed))
+    values = np.fromiter((value for h in hashed for value in h), np.uint32, int(counts.sum()))
+    return np.repeat(np.arange(len(texts)), counts), values
+
+
+def document_frequencies(texts):
+    """How many of the texts contain each hash bucket, as a DF_BINS array"""
+    docs, values = flatten(texts)
+    pairs = np.unique(docs.astype(np.int64) * DF_BINS + (values & (DF_BINS - 1)))
+    return np.bincount(pairs % DF_BINS, minlength=DF_BINS)
+
+
+def inverse_document_frequencies(df, count):
+    return np.log((1 + count) / (1 + df)).astype(np.float32) + 1
+
+
+def vectorize(texts, idf):
+    """One normalised float32 row of DIM per text"""
+    docs, values = flatten(texts)
+    rows = np.zeros((len(texts), DIM), np.float32)
+    if not len(values):
+        return rows
+    # Term frequency: count each (document, n-gram) once, then weight it
+    keys, tf = np.unique(docs.astype(np.int64) << 32 | values, return_counts=True)
+    docs, values = keys >> 32, (keys & 0xffffffff).astype(np.uint32)
+    weights = (1 + np.log(tf)).astype(np.float32) * idf[values & (DF_BINS - 1)]
+    weights[(values >> 31) == 1] *= -1
+    np.add.at(rows, (docs, values % DIM), weights)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows / np.where(norms > 0, norms, 1)
+
+
+def pool_map(function, chunks, workers, size):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or size < POOL_MIN:
+        return [function(*chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, *zip(*chunks)))
+
+
+def build_index(conn, directory, workers=None):
+    """Vectorise every quote and write the index files; returns the number of quotes
+
+    Both passes (document frequencies, then vectors) run over chunks of
+    BUILD_CHUNK quotes, spread over a process pool for large collections.
+    Files are written under temporary names and renamed into place. setup.py
+    builds into a staging directory and moves the finished index next to the
+    database with publish_index() when it publishes the snapshot.
+    """
+    rows = conn.execute("SELECT id, quote_text FROM quotes ORDER BY id").fetchall()
+    ids = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+    texts = [row[1] for row in rows]
+    del rows
+    chunks = [(texts[i:i + BUILD_CHUNK],) for i in range(0, len(texts), BUILD_CHUNK)]
+    df = sum(pool_map(document_frequencies, chunks, workers, len(texts)), np.zeros(DF_BINS, np.int64))
+    idf = inverse_document_frequencies(df, len(texts))
+
+    os.makedirs(directory, exist_ok=True)
+    vectors_path = os.path.join(directory, VECTORS)
+    matrix = np.lib.format.open_memmap(vectors_path + '.tmp', mode='w+', dtype=np.float32, shape=(len(texts), DIM))
+    start = 0
+    for block in pool_map(vectorize, [(chunk, idf) for chunk, in chunks], workers, len(texts)):
+        matrix[start:start + len(block)] = block
+        start += len(block)
+    matrix.flush()
+    del matrix
+    for name, array in ((IDS, ids), (IDF, idf)):
+        with open(os.path.join(directory, name + '.tmp'), 'wb') as f:
+            np.save(f, array)
+    # The matrix goes last: a reader that sees it new sees matching ids
+    for name in (IDS, IDF, VECTORS):
+        os.replace(os.path.join(directory, name + '.tmp'), os.path.join(directory, name))
+    return len(texts)
+
+
+def publish_index(staging, directory):
+    """Make an index built in staging the live one in directory, swapping builds with one rename"""
+    os.makedirs(directory, exist_ok=True)
+    name = f"{BUILD_PREFIX}{time.time_ns()}"
+    os.replace(staging, os.path.join(directory, name))
+    with open(os.path.join(directory, CURRENT + '.tmp'), 'w') as f:
+        f.write(name)
+    os.replace(os.path.join(directory, CURRENT + '.tmp'), os.path.join(directory, CURRENT))
+    # Apps that mapped an earlier build keep their open files until they reload
+    for entry in os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if entry.startswith(BUILD_PREFIX) and entry != name:
+            shutil.rmtree(path, ignore_errors=True)
+        elif entry in (IDS, IDF, VECTORS):
+            os.remove(path)
+
+
+def top_k(scores, k):
+    """Indexes of the k highest scores, best first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class SimilarIndex:
+    """Memory-mapped similarity index over the quotes, kept current with the quote cache
+
+    The files are reopened when setup.py publishes a new build. Quotes the cache
+    knows about beyond the last indexed id are vectorised in one batch on the
+    next lookup.
+    """
+
+    def __init__(self, directory, cache):
+        self.directory = directory
+        self.cache = cache
+        self.vectors = None
+        self.ids = None
+        self.idf = None
+        self.stamp = None
+        self.max_id = 0
+        self.extra_ids = np.empty(0, np.int64)
+        self.extra_vectors = np.empty((0, DIM), np.float32)
+        self.lock = threading.Lock()
+
+    def load(self, current):
+        """(idf, ids, vectors) of the build in current, or None if it is replaced while loading"""
+        try:
+            idf = np.load(os.path.join(current, IDF))
+            ids = np.load(os.path.join(current, IDS))
+            vectors = np.load(os.path.join(current, VECTORS), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        # An index from before CURRENT has its files replaced one at a time
+        return (idf, ids, vectors) if len(ids) == vectors.shape[0] else None
+
+    def refresh(self):
+        """Map the current index files and vectorise quotes added since they were built"""
+        current = current_dir(self.directory)
+        try:
+            stamp = (current, os.stat(os.path.join(current, VECTORS)).st_mtime_ns)
+        except FileNotFoundError:
+            stamp = self.stamp
+        if stamp != self.stamp:
+            loaded = self.load(current)
+            # Otherwise keep what is mapped and look again on the next lookup
+            if loaded is not None:
+                self.idf, self.ids, self.vectors = loaded
+                self.stamp = stamp
+                self.max_id = int(self.ids[-1]) if len(self.ids) else 0
+                self.extra_ids = np.empty(0, np.int64)
+                self.extra_vectors = np.empty((0, DIM), np.float32)
+        if self.vectors is None:
+            return False
+        ids = self.cache.sorted_ids()
+        if len(ids) and ids[-1] > self.max_id:
+            new_ids = ids[bisect.bisect_right(ids, self.max_id):]
+            self.max_id = new_ids[-1]
+            quotes = [quote for quote in self.cache.get_many(new_ids) if quote is not None]
+            self.extra_ids = np.concatenate((self.extra_ids, np.array([quote['id'] for quote in quotes], np.int64)))
+            self.extra_vectors = np.concatenate(
+                (self.extra_vectors, vectorize([quote['quote_text'] for quote in quotes], self.idf)))
+        return True
+
+    @property
+    def available(self):
+        with self.lock:
+            return self.refresh()
+
+    def vector(self, quote_id):
+        row = int(self.ids.searchsorted(quote_id))
+        if row < len(self.ids) and self.ids[row] == quote_id:
+            return np.array(self.vectors[row])
+        row = int(self.extra_ids.searchsorted(quote_id))
+        if row < len(self.extra_ids) and self.extra_ids[row] == quote_id:
+            return self.extra_vectors[row]
+        quote = self.cache.get(quote_id)
+        return vectorize([quote['quote_text']], self.idf)[0] if quote else None
+
+    def blocks(self):
+        """(ids, vectors) pieces of the index as it is now, CHUNK rows at most each"""
+        blocks = [(self.ids[start:start + CHUNK], self.vectors[start:start + CHUNK])
+                  for start in range(0, len(self.ids), CHUNK)]
+        blocks.append((self.extra_ids, self.extra_vectors))
+        return blocks
+
+    @staticmethod
+    def search(blocks, queries, k):
+        """(ids, scores) of the k best rows for each query row, in one pass over the matrix"""
+        queries = np.asarray(queries, np.float32).T
+        best_ids, best_scores = [], []
+        for ids, vectors in blocks:
+            if not len(ids):
+                continue
+            scores = vectors @ queries
+            for column in range(scores.shape[1]):
+                top = top_k(scores[:, column], k)
+                if len(best_ids) <= column:
+                    best_ids.append(ids[top])
+                    best_scores.append(scores[top, column])
+                else:
+                    merged_ids = np.concatenate((best_ids[column], ids[top]))
+                    merged_scores = np.concatenate((best_scores[column], scores[top, column]))
+                    keep = top_k(merged_scores, k)
+                    best_ids[column], best_scores[column] = merged_ids[keep], merged_scores[keep]
+        return best_ids, best_scores
+
+    def like_many(self, items, k=5):
+        """Most similar quotes for each item, an id or a quote text; [] for items it can't place
+
+        Each result is a list of (quote, score), best first, without the quote itself.
+        """
+        with self.lock:
+            if not self.refresh():
+                return [[] for _ in items]
+            queries = [self.vector(item) if isinstance(item, int) else vectorize([item], self.idf)[0]
+                       for item in items]
+            blocks = self.blocks()
+        placed = [i for i, query in enumerate(queries) if query is not None and query.any()]
+        results = [[] for _ in items]
+        if not placed:
+            return results
+        # Ask for extra rows: the quote itself, and any deleted since the build
+        ids, scores = self.search(blocks, [queries[i] for i in placed], k + 4)
+        for i, found, found_scores in zip(placed, ids, scores):
+            quotes = self.cache.get_many(found.tolist())
+            results[i] = [(quote, float(score)) for quote, score in zip(quotes, found_scores)
+                          if quote is not None and items[i] not in (quote['id'], quote['quote_text'])
+                          and score > 0][:k]
+        return results
+
+    def like(self, item, k=5):
+        return self.like_many([item], k)[0]
@@ -0,0 +1,286 @@
+"""Atomic database snapshots, and the write store that is merged into them
+
+setup.py never loads into the live database/data.db. A SnapshotBuild copies
+it to data.db.building, the load runs there, and publish() runs ANALYZE and
+VACUUM and renames the finished file into place, so readers see either the
+old snapshot or the new one and never a half-loaded database. An app serving
+read-only keeps reading the old file until it notices the new one.
+
+While serving read-only, form submissions go to the write store instead
+(database/writes.db). Each build copies the submissions waiting there into
+the new snapshot and, once it is published, deletes them from the store.
+
+An app serving read-write keeps writing to the live database during a build.
+publish() takes the lock its writers share, copies in whatever they committed
+since open(), and replaces the database before letting them go on.
+"""
+import os
+import sqlite3
+
+from daily import SCHEMA as DAILY_QUOTES_SCHEMA
+from db import WRITE_STORE_PATH, file_lock, lock_path
+from favorites import SCHEMA as FAVORITES_SCHEMA
+from near_dup import ensure_source_column
+from write_queue import STATE_SCHEMA as WRITE_QUEUE_STATE_SCHEMA
+
+# Quotes submitted to the write store get ids from here up, so they never
+# collide with snapshot ids while both are served side by side
+WRITE_ID_BASE = 1 << 40
+
+WRITE_STORE_SCHEMA = ['''
+    CREATE TABLE IF NOT EXISTS quotes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        quote_text TEXT NOT NULL,
+        author TEXT NOT NULL,
+        category TEXT NOT NULL,
+        inspiration TEXT,
+        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        content_hash TEXT UNIQUE,
+        source TEXT
+    )
+''', '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT,
+        email TEXT,
+        profession TEXT,
+        feedback TEXT,
+        help_request TEXT,
+        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+''', FAVORITES_SCHEMA]
+WRITE_STORE_TABLES = ('quotes', 'users', 'favorites')
+# Tables the app writes to in a read-write database, and the column that
+# tells rows written after a build copied the database from earlier ones
+LIVE_WRITE_MARKS = {'quotes': 'id', 'users': 'id', 'favorites': 'id', 'daily_quotes': 'day'}
+
+
+def create_write_store(conn):
+    for statement in WRITE_STORE_SCHEMA:
+        conn.execute(statement)
+    # A store created before quotes had a source
+    ensure_source_column(conn)
+    if conn.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'quotes'").fetchone() is None:
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('quotes', ?)", (WRITE_ID_BASE,))
+
+
+def merge_write_store(conn, path=WRITE_STORE_PATH):
+    """Copy the submissions waiting in the write store into the database being built
+
+    Returns (highest id merged per table, rows merged). Rows submitted after
+    this point have higher ids and wait for the next build. Favorites of
+    submitted quotes are pointed at the quote's id in the snapshot.
+    """
+    if not os.path.exists(path):
+        return {}, 0
+    conn.execute("ATTACH DATABASE ? AS store", (path,))
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM store.sqlite_master WHERE type = 'table'")}
+        merged = {table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM store.{table}").fetchone()[0]
+                  for table in WRITE_STORE_TABLES if table in tables}
+        count = 0
+        if merged.get('quotes'):
+            count += conn.execute('''
+                INSERT INTO quotes (quote_text, author, category, inspiration, created_date, content_hash, source)
+                SELECT quote_text, author, category, inspiration, created_date, content_hash, 'user'
+                FROM store.quotes WHERE id <= ? ORDER BY id
+                ON CONFLICT(content_hash) DO NOTHING
+            ''', (merged['quotes'],)).rowcount
+        if merged.get('users'):
+            count += conn.execute('''
+                INSERT INTO users (name, phone, email, profession, feedback, help_request, created_date)
+                SELECT name, phone, email, profession, feedback, help_request, created_date
+                FROM store.users WHERE id <= ? ORDER BY id
+            ''', (merged['users'],)).rowcount
+        if merged.get('favorites'):
+            count += conn.execute('''
+                INSERT INTO favorites (session_id, quote_id, created_date)
+                SELECT f.session_id, COALESCE(q.id, f.quote_id), f.created_date
+                FROM store.favorites f
+                LEFT JOIN store.quotes s ON s.id = f.quote_id
+                LEFT JOIN quotes q ON q.content_hash = s.content_hash
+                WHERE f.id <= ? ORDER BY f.id
+                ON CONFLICT(session_id, quote_id) DO NOTHING
+            ''', (merged['favorites'],)).rowcount
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE store")
+    return merged, count
+
+
+def write_marks(conn):
+    """How far each table the app writes to had got; where replay_live_writes() picks up"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {table: conn.execute(f"SELECT MAX({column}) FROM {table}").fetchone()[0] if table in tables else None
+            for table, column in LIVE_WRITE_MARKS.items()}
+
+
+def replay_live_writes(conn, path, marks):
+    """Copy what the app committed to the live database after write_marks() into the build
+
+    Run with the live database's file_lock() held exclusively, so nothing is
+    committed between this and replace_database(). Quotes are matched by
+    content hash (the build may have given their ids to other quotes), and
+    favorites and scheduled days follow them. Returns the rows copied.
+    """
+    conn.execute("ATTACH DATABASE ? AS live", (path,))
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM live.sqlite_master WHERE type = 'table'")}
+        # A table the copy didn't have yet is replayed whole
+        since = {table: marks[table] if marks[table] is not None else (0 if column == 'id' else '')
+                 for table, column in LIVE_WRITE_MARKS.items()}
+        count = 0
+        if 'quotes' in tables:
+            # The only quotes the app adds are the ones users submit
+            count += conn.execute('''
+                INSERT INTO quotes (quote_text, author, category, inspiration, created_date, content_hash, source)
+                SELECT quote_text, author, category, inspiration, created_date, content_hash, 'user'
+                FROM live.quotes WHERE id > ? ORDER BY id
+                ON CONFLICT(content_hash) DO NOTHING
+            ''', (since['quotes'],)).rowcount
+        if 'users' in tables:
+            count += conn.execute('''
+                INSERT INTO users (name, phone, email, profession, feedback, help_request, created_date)
+                SELECT name, phone, email, profession, feedback, help_request, created_date
+                FROM live.users WHERE id > ? ORDER BY id
+            ''', (since['users'],)).rowcount
+        if 'favorites' in tables:
+            conn.execute(FAVORITES_SCHEMA)
+            count += conn.execute('''
+                INSERT INTO favorites (session_id, quote_id, created_date)
+                SELECT f.session_id, COALESCE(q.id, f.quote_id), f.created_date
+                FROM live.favorites f
+                LEFT JOIN live.quotes s ON s.id = f.quote_id
+                LEFT JOIN quotes q ON q.content_hash = s.content_hash
+                WHERE f.id > ? ORDER BY f.id
+                ON CONFLICT(session_id, quote_id) DO NOTHING
+            ''', (since['favorites'],)).rowcount
+        if 'daily_quotes' in tables:
+            # Days the app scheduled may already have been shown, so they win
+            conn.execute(DAILY_QUOTES_SCHEMA)
+            count += conn.execute('''
+                INSERT INTO daily_quotes (day, quote_id, cycle)
+                SELECT d.day, COALESCE(q.id, d.quote_id), d.cycle
+                FROM live.daily_quotes d
+                LEFT JOIN live.quotes s ON s.id = d.quote_id
+                LEFT JOIN quotes q ON q.content_hash = s.content_hash
+                WHERE d.day > ? ORDER BY d.day
+                ON CONFLICT(day) DO UPDATE SET quote_id = excluded.quote_id, cycle = excluded.cycle
+            ''', (since['daily_quotes'],)).rowcount
+        if 'write_queue_state' in tables:
+            # Queued writes applied since the copy are in the rows above
+            conn.execute(WRITE_QUEUE_STATE_SCHEMA)
+            conn.execute('''
+                INSERT INTO write_queue_state (name, last_seq) SELECT name, last_seq FROM live.write_queue_state
+                WHERE true ON CONFLICT(name) DO UPDATE SET last_seq = excluded.last_seq
+            ''')
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE live")
+    return count
+
+
+def clear_write_store(merged, path=WRITE_STORE_PATH):
+    """Delete what merge_write_store() copied, once the snapshot holding it is in place"""
+    if not merged:
+        return
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            for table, max_id in merged.items():
+                conn.execute(f"DELETE FROM {table} WHERE id <= ?", (max_id,))
+    finally:
+        conn.close()
+
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replace_database(temp_path, path):
+    """Put a finished snapshot at path
+
+    A rename is atomic and leaves readers of the old file undisturbed. But
+    if the live database has a WAL (an app is serving it read-write), a new
+    file renamed under it would be paired with the old WAL, so the pages are
+    copied in through SQLite's backup API instead, which is just as atomic
+    for readers.
+    """
+    if os.path.exists(path + '-wal'):
+        source = sqlite3.connect(temp_path)
+        target = sqlite3.connect(path, timeout=30)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        os.remove(temp_path)
+        return
+    fsync_path(temp_path)
+    os.replace(temp_path, path)
+    fsync_path(os.path.dirname(os.path.abspath(path)))
+
+
+class SnapshotBuild:
+    """Builds the next snapshot of a database next to it
+
+        build = SnapshotBuild(path)
+        conn = build.open()     # a copy of the current database to load into
+        ...
+        build.publish()         # ANALYZE, VACUUM, rename into place
+    """
+
+    def __init__(self, path, write_path=WRITE_STORE_PATH):
+        self.path = path
+        self.temp_path = path + '.building'
+        self.write_path = write_path
+        self.conn = None
+        self.merged = {}
+        self.marks = None
+        self.replayed = 0
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Left over from a build that was interrupted
+        for suffix in ('', '-journal', '-wal', '-shm'):
+            if os.path.exists(self.temp_path + suffix):
+                os.remove(self.temp_path + suffix)
+        self.conn = sqlite3.connect(self.temp_path)
+        if os.path.exists(self.path):
+            live = sqlite3.connect(self.path, timeout=30)
+            try:
+                live.backup(self.conn)
+            finally:
+                live.close()
+        # Snapshots are served immutable, so they must not need a WAL to be read
+        self.conn.execute("PRAGMA journal_mode = DELETE")
+        self.marks = write_marks(self.conn)
+        return self.conn
+
+    def merge_write_store(self):
+        """Fold pending form submissions into the snapshot; returns how many rows were merged"""
+        self.merged, count = merge_write_store(self.conn, self.write_path)
+        return count
+
+    def publish(self):
+        conn = self.conn
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+        # From here until the new file is in place the app's writers wait, and
+        # what they committed while the build ran is copied into it
+        with file_lock(lock_path(self.path), exclusive=True):
+            if os.path.exists(self.path):
+                self.replayed = replay_live_writes(conn, self.path, self.marks)
+            conn.close()
+            self.conn = None
+            replace_database(self.temp_path, self.path)
+        clear_write_store(self.merged, self.write_path)
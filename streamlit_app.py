@@ -1,7 +1,18 @@
 import streamlit as st
-import sqlite3
+import os
 import random
+import uuid
 from datetime import datetime
+import metrics
+import warmup
+from data_access import (add_favorite, add_quote, add_user, get_quote, get_quote_cache,
+                         get_quote_of_the_day, get_random_quote, get_write_queue, match_mood,
+                         more_like_this, new_shuffle_bag, quote_categories, search)
+from mood_matcher import TIER_EXACT
+from page_assets import (FOOTER, MOODS, PAGES, QUOTE_CATEGORIES, SIDEBAR_TITLE, STYLE, header, quote_card,
+                         search_result)
+from shuffle_bag import QuoteHistory
+from write_queue import WriteQueueFull
 
 # Page configuration
 st.set_page_config(
@@ -11,111 +22,53 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Database connection
-def get_db_connection():
-    conn = sqlite3.connect('database/data.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+# Reads and writes go through data_access, which keeps a process-wide
+# connection pool, quote cache and mood index shared by all sessions
+
+# Load them now if `python warmup.py` hasn't already (once per process)
+warmup.start()
+
+# The metrics panel is only shown with ?admin=<QUOTES_ADMIN_TOKEN> in the URL
+ADMIN_TOKEN = os.environ.get('QUOTES_ADMIN_TOKEN')
+
+def is_admin():
+    return bool(ADMIN_TOKEN) and st.query_params.get('admin') == ADMIN_TOKEN
+
+# Count each browser session once
+if 'session_counted' not in st.session_state:
+    st.session_state.session_counted = True
+    metrics.inc('sessions_total')
 
 # Initialize session state for quote tracking
 if 'current_quote' not in st.session_state:
     st.session_state.current_quote = None
 if 'quote_history' not in st.session_state:
-    st.session_state.quote_history = []
+    st.session_state.quote_history = QuoteHistory()
+if 'quote_bag' not in st.session_state:
+    st.session_state.quote_bag = new_shuffle_bag()
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.favorites = []
 
 # Initialize session state for page navigation
 if 'current_page' not in st.session_state:
     st.session_state.current_page = "Quote of the Day"
 
-# Custom CSS for professional styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #2c3e50;
-        text-align: center;
-        margin-bottom: 1rem;
-        font-weight: 300;
-        letter-spacing: 1px;
-    }
-    .quote-container {
-        max-width: 800px;
-        margin: 2rem auto;
-        padding: 3rem;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        border-radius: 15px;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.1);
-        color: white;
-        position: relative;
-    }
-    .category-badge {
-        display: inline-block;
-        background: rgba(255,255,255,0.2);
-        padding: 0.5rem 1.5rem;
-        border-radius: 25px;
-        font-size: 0.9rem;
-        margin-bottom: 1.5rem;
-        backdrop-filter: blur(10px);
-        border: 1px solid rgba(255,255,255,0.3);
-    }
-    .quote-text {
-        font-size: 1.8rem;
-        line-height: 1.6;
-        margin: 1.5rem 0;
-        font-weight: 300;
-        font-style: italic;
-        text-align: center;
-    }
-    .author-text {
-        text-align: center;
-        font-size: 1.2rem;
-        margin-top: 2rem;
-        opacity: 0.9;
-        font-weight: 400;
-    }
-    .action-buttons {
-        display: flex;
-        justify-content: center;
-        gap: 1rem;
-        margin-top: 2rem;
-    }
-    .sidebar-title {
-        font-size: 1.5rem;
-        color: #2c3e50;
-        margin-bottom: 1rem;
-        font-weight: 400;
-    }
-    .dropdown-container {
-        margin: 1rem 0;
-    }
-    .footer {
-        text-align: center;
-        color: #7f8c8d;
-        margin-top: 3rem;
-        font-size: 0.9rem;
-    }
-</style>
-""", unsafe_allow_html=True)
+# Custom CSS for professional styling (minified once per process in page_assets)
+st.markdown(STYLE, unsafe_allow_html=True)
 
 # Sidebar
 with st.sidebar:
-    st.markdown('<div class="sidebar-title">Quotes Forever</div>', unsafe_allow_html=True)
+    st.markdown(SIDEBAR_TITLE, unsafe_allow_html=True)
     st.markdown("---")
     
     # Dropdown navigation
     st.markdown('<div class="dropdown-container">', unsafe_allow_html=True)
     
-    page_options = {
-        "Quote of the Day": "quote_of_day",
-        "Add Quote": "add_quote", 
-        "Personal Details": "personal_details",
-        "Mood Wise Quotes": "mood_quotes"
-    }
-    
     selected_page = st.selectbox(
         "Navigate to:",
-        list(page_options.keys()),
-        index=list(page_options.keys()).index(st.session_state.current_page) if st.session_state.current_page in page_options else 0,
+        PAGES,
+        index=PAGES.index(st.session_state.current_page) if st.session_state.current_page in PAGES else 0,
         key="page_navigation"
     )
     
@@ -124,63 +77,113 @@ with st.sidebar:
     # Update current page in session state
     st.session_state.current_page = selected_page
 
-# Main content based on selected page
-if selected_page == "Quote of the Day":
-    st.markdown('<div class="main-header">Quote of the Day</div>', unsafe_allow_html=True)
+def show_next_quote():
+    """Generate New Quote: next quote from this session's shuffle bag, no database round trip"""
+    metrics.inc('quote_generations_total')
+    new_quote = st.session_state.quote_bag.next()
+    st.session_state.no_quotes_in_filter = new_quote is None
+    if new_quote:
+        st.session_state.quote_history.push(new_quote['id'])
+        st.session_state.current_quote = new_quote
+
+def show_similar(item):
+    """More like this: a quote id, or the text of a mood quote (those aren't in the quotes index)"""
+    st.session_state.similar_to = item
+
+def similar_quotes(item):
+    # Neighbours come from the memory-mapped index; cleared as soon as another quote is shown
+    if st.session_state.get('similar_to') != item:
+        return
+    similar = more_like_this(item)
+    if similar:
+        st.markdown("**More like this**")
+        for similar_quote, score in similar:
+            st.write(f"\"{similar_quote['quote_text']}\" - {similar_quote['author']}")
+    else:
+        st.info("No similar quotes found yet. Run `python setup.py` to build the similarity index.")
+
+def change_categories():
+    """New category filter: start a bag over just those categories and show one of them"""
+    st.session_state.quote_bag = new_shuffle_bag(st.session_state.quote_filter)
+    show_next_quote()
+
+def show_history_quote(move):
+    quote = get_quote(move())
+    if quote:
+        st.session_state.current_quote = quote
+
+BUSY_MESSAGE = "We're saving a lot of submissions right now. Please try again in a moment."
+
+# Each page body is a fragment: pressing one of its buttons or submitting its
+# form reruns only that function, not the CSS, sidebar and the rest of the script
+
+@st.fragment
+def quote_of_the_day_card():
+    started = metrics.start()
+    history = st.session_state.quote_history
+    quote = st.session_state.current_quote
     
-    def get_random_quote():
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM quotes ORDER BY RANDOM() LIMIT 1")
-        quote = cursor.fetchone()
-        conn.close()
-        return quote
+    # Imported collections can bring categories beyond the built-in ones
+    categories = QUOTE_CATEGORIES + [name for name in quote_categories() if name not in QUOTE_CATEGORIES]
+    st.multiselect("Only show categories", categories, key="quote_filter", on_change=change_categories,
+                   placeholder="All categories")
+    if st.session_state.get('no_quotes_in_filter') and st.session_state.quote_filter:
+        st.info("There are no quotes in these categories yet.")
     
-    # Display current quote in the professional template
-    if st.session_state.current_quote is None:
-        st.session_state.current_quote = get_random_quote()
+    # Main quote display template
+    st.markdown(quote_card(quote['quote_text'], quote['author'], quote['category']), unsafe_allow_html=True)
     
-    if st.session_state.current_quote:
-        quote = st.session_state.current_quote
-        
-        # Main quote display template
-        st.markdown(f"""
-        <div class="quote-container">
-            <div class="category-badge">{quote['category']}</div>
-            <div class="quote-text">"{quote['quote_text']}"</div>
-            <div class="author-text">- {quote['author']}</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # Action buttons
-        col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
-        
-        with col2:
-            if st.button("Generate New Quote", use_container_width=True, type="primary"):
-                st.session_state.current_quote = get_random_quote()
-                st.rerun()
-        
-        with col3:
-            if st.button("Add to Favorites", use_container_width=True):
+    # Action buttons; the callbacks run before the rerun, so a click needs no st.rerun()
+    col1, col2, col3, col4, col5, col6, col7 = st.columns([0.5, 1, 1.3, 1, 1.3, 1.3, 0.5])
+    
+    with col2:
+        st.button("◀ Back", use_container_width=True, disabled=not history.can_go_back,
+                  on_click=show_history_quote, args=(history.back,))
+    
+    with col3:
+        st.button("Generate New Quote", use_container_width=True, type="primary", on_click=show_next_quote)
+    
+    with col4:
+        st.button("Forward ▶", use_container_width=True, disabled=not history.can_go_forward,
+                  on_click=show_history_quote, args=(history.forward,))
+    
+    with col5:
+        if st.button("Add to Favorites", use_container_width=True):
+            try:
+                add_favorite(st.session_state.session_id, quote['id'])
+                if quote['id'] not in st.session_state.favorites:
+                    st.session_state.favorites.append(quote['id'])
                 st.success("Quote added to favorites!")
-        
-        # Additional information in an expander
-        with st.expander("Quote Details"):
-            st.write(f"**Category:** {quote['category']}")
-            st.write(f"**Inspiration:** {quote['inspiration']}")
-            if 'created_date' in quote:
-                st.write(f"**Added on:** {quote['created_date']}")
-
-elif selected_page == "Add Quote":
-    st.markdown('<div class="main-header">Add New Quote</div>', unsafe_allow_html=True)
+            except WriteQueueFull:
+                st.warning(BUSY_MESSAGE)
+    
+    with col6:
+        st.button("More like this", use_container_width=True, on_click=show_similar, args=(quote['id'],))
     
+    similar_quotes(quote['id'])
+    
+    # Additional information in an expander
+    with st.expander("Quote Details"):
+        st.write(f"**Category:** {quote['category']}")
+        st.write(f"**Inspiration:** {quote['inspiration']}")
+        if 'created_date' in quote:
+            st.write(f"**Added on:** {quote['created_date']}")
+    
+    if st.session_state.favorites:
+        with st.expander(f"Your Favorites ({len(st.session_state.favorites)})"):
+            for favorite_id in reversed(st.session_state.favorites):
+                favorite = get_quote(favorite_id)
+                if favorite:
+                    st.write(f"\"{favorite['quote_text']}\" - {favorite['author']}")
+    metrics.stop(started, 'fragment_render_seconds', fragment='quote_of_the_day')
+
+@st.fragment
+def add_quote_form():
     with st.form("add_quote_form"):
         quote_text = st.text_area("Quote Text*", placeholder="Enter the inspirational quote here...", height=120)
         author_name = st.text_input("Author Name*", placeholder="Who said this?")
         
-        categories = ["Motivation", "Life", "Love", "Success", "Career", "Dreams", "Perseverance", 
-                     "Courage", "Opportunity", "Happiness", "Wisdom", "Innovation", "Inspiration"]
-        category = st.selectbox("Category*", categories)
+        category = st.selectbox("Category*", QUOTE_CATEGORIES)
         
         inspiration = st.text_area("Inspiration/Context", placeholder="What makes this quote special? When should someone read this?")
         
@@ -188,21 +191,19 @@ elif selected_page == "Add Quote":
         
         if submitted:
             if quote_text and author_name and category:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO quotes (quote_text, author, category, inspiration)
-                    VALUES (?, ?, ?, ?)
-                ''', (quote_text, author_name, category, inspiration))
-                conn.commit()
-                conn.close()
-                st.success("Quote added successfully to the database!")
+                try:
+                    new_quote = add_quote(quote_text, author_name, category, inspiration)
+                    if new_quote is None:
+                        st.info("This quote is already in the collection.")
+                    else:
+                        st.success("Quote added successfully to the database!")
+                except WriteQueueFull:
+                    st.warning(BUSY_MESSAGE)
             else:
                 st.error("Please fill in all required fields (Quote Text, Author Name, Category)")
 
-elif selected_page == "Personal Details":
-    st.markdown('<div class="main-header">Your Personal Details</div>', unsafe_allow_html=True)
-    
+@st.fragment
+def personal_details_form():
     with st.form("personal_details_form"):
         col1, col2 = st.columns(2)
         
@@ -221,21 +222,16 @@ elif selected_page == "Personal Details":
         
         if submitted:
             if name and email:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO users (name, phone, email, profession, feedback, help_request)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (name, phone, email, profession, feedback, help_request))
-                conn.commit()
-                conn.close()
-                st.success("Your details have been saved successfully! Thank you for sharing.")
+                try:
+                    add_user(name, phone, email, profession, feedback, help_request)
+                    st.success("Your details have been saved successfully! Thank you for sharing.")
+                except WriteQueueFull:
+                    st.warning(BUSY_MESSAGE)
             else:
                 st.error("Please fill at least Name and Email fields")
 
-elif selected_page == "Mood Wise Quotes":
-    st.markdown('<div class="main-header">Get Quotes Based on Your Mood</div>', unsafe_allow_html=True)
-    
+@st.fragment
+def mood_form():
     with st.form("mood_form"):
         st.subheader("Tell us about your current state:")
         
@@ -249,62 +245,128 @@ elif selected_page == "Mood Wise Quotes":
             social_life = st.radio("How's your social life going?", ["Good", "Not Good", "Balanced"])
             professional_life = st.radio("How's your professional life?", ["Good", "Struggling", "Balanced"])
         
-        current_mood = st.selectbox("How are you feeling right now?", 
-                                   ["Happy", "Sad", "Motivated", "Stressed", "Love", "Career-focused"])
+        current_mood = st.selectbox("How are you feeling right now?", MOODS)
         
         submitted = st.form_submit_button("Get Personalized Quote", use_container_width=True)
+    
+    if submitted:
+        mood_result(current_mood, gender, age, social_life, professional_life)
+    elif st.session_state.get('mood_result'):
+        # A click on the result's buttons reruns the fragment: show the same quote again
+        show_mood_result(*st.session_state.mood_result)
+
+def mood_result(current_mood, gender, age, social_life, professional_life):
+    started = metrics.start()
+    # Convert mood to lowercase for database matching
+    mood_lower = current_mood.lower()
+    gender_lower = gender.lower() if gender != "Prefer not to say" else "both"
+    
+    # Match quotes based on user's profile
+    quote, tier = match_mood(mood_lower, gender_lower, age, social_life, professional_life)
+    metrics.inc('mood_submits_total', tier=tier or 'fallback')
+    # Fallback to general quote
+    fallback_quote = None if quote else get_random_quote()
+    st.session_state.mood_result = (current_mood, age, social_life, professional_life, quote, tier, fallback_quote)
+    show_mood_result(*st.session_state.mood_result)
+    metrics.stop(started, 'fragment_render_seconds', fragment='mood_result')
+
+def show_mood_result(current_mood, age, social_life, professional_life, quote, tier, fallback_quote):
+    if quote:
+        st.markdown(quote_card(quote['quote_text'], quote['author'], f"{current_mood} Mood"), unsafe_allow_html=True)
         
-        if submitted:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Convert mood to lowercase for database matching
-            mood_lower = current_mood.lower()
-            gender_lower = gender.lower() if gender != "Prefer not to say" else "both"
-            
-            # Query for matching quotes based on user's profile
-            cursor.execute('''
-                SELECT * FROM mood_quotes 
-                WHERE mood_category = ? 
-                AND (gender_preference = ? OR gender_preference = 'both')
-                AND min_age <= ? AND max_age >= ?
-                AND (social_life = ? OR social_life = 'balanced')
-                AND (professional_life = ? OR professional_life = 'balanced')
-                ORDER BY RANDOM() LIMIT 1
-            ''', (mood_lower, gender_lower, age, age, social_life.lower(), professional_life.lower()))
-            
-            quote = cursor.fetchone()
-            conn.close()
-            
-            if quote:
-                st.markdown(f"""
-                <div class="quote-container">
-                    <div class="category-badge">{current_mood} Mood</div>
-                    <div class="quote-text">"{quote['quote_text']}"</div>
-                    <div class="author-text">- {quote['author']}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Show matching criteria
-                st.info(f"Selected for your profile: {current_mood} mood | Age: {age} | Social Life: {social_life} | Professional: {professional_life}")
-            else:
-                st.warning("No perfect match found. Here's a general inspirational quote:")
-                # Fallback to general quote
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM quotes ORDER BY RANDOM() LIMIT 1")
-                fallback_quote = cursor.fetchone()
-                conn.close()
-                
-                if fallback_quote:
-                    st.markdown(f"""
-                    <div class="quote-container">
-                        <div class="category-badge">{fallback_quote['category']}</div>
-                        <div class="quote-text">"{fallback_quote['quote_text']}"</div>
-                        <div class="author-text">- {fallback_quote['author']}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
+        # Show matching criteria
+        if tier == TIER_EXACT:
+            st.info(f"Selected for your profile: {current_mood} mood | Age: {age} | Social Life: {social_life} | Professional: {professional_life}")
+        else:
+            st.info(f"Closest match for your {current_mood} mood (no quote matched your full profile)")
+        # Mood quotes live in their own table, so look their neighbours up by text
+        st.button("More like this", key="mood_similar", on_click=show_similar, args=(quote['quote_text'],))
+        similar_quotes(quote['quote_text'])
+    else:
+        st.warning("No perfect match found. Here's a general inspirational quote:")
+        
+        if fallback_quote:
+            st.markdown(quote_card(fallback_quote['quote_text'], fallback_quote['author'], fallback_quote['category']),
+                        unsafe_allow_html=True)
+            st.button("More like this", key="mood_similar", on_click=show_similar, args=(fallback_quote['id'],))
+            similar_quotes(fallback_quote['id'])
+
+@st.fragment
+def search_page():
+    # Only runs when the user presses Enter, and goes through the FTS index rather than LIKE
+    search_text = st.text_input("Search quotes and authors", placeholder="e.g. courage, dreams, Einstein...")
+    
+    # Keyset pagination: remember the cursor of every page we've been to
+    if st.session_state.get('search_text') != search_text:
+        st.session_state.search_text = search_text
+        st.session_state.search_cursors = [None]
+    
+    if len(search_text.strip()) >= 2:
+        results, next_cursor = search(search_text, limit=10, after=st.session_state.search_cursors[-1])
+        
+        if not results:
+            st.info("No quotes found. Try a different word.")
+        for result in results:
+            st.markdown(search_result(result), unsafe_allow_html=True)
+        
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
+        with col2:
+            if len(st.session_state.search_cursors) > 1:
+                if st.button("Previous", use_container_width=True):
+                    st.session_state.search_cursors.pop()
+                    st.rerun(scope="fragment")
+        with col3:
+            if next_cursor is not None:
+                if st.button("Next", use_container_width=True):
+                    st.session_state.search_cursors.append(next_cursor)
+                    st.rerun(scope="fragment")
+
+# Main content based on selected page
+render_started = metrics.start()
+if selected_page == "Quote of the Day":
+    st.markdown(header("Quote of the Day"), unsafe_allow_html=True)
+    
+    # Everyone starts on today's quote; "Generate New Quote" switches to random ones
+    if st.session_state.current_quote is None:
+        st.session_state.current_quote = get_quote_of_the_day()
+        if st.session_state.current_quote:
+            st.session_state.quote_history.push(st.session_state.current_quote['id'])
+    
+    if st.session_state.current_quote:
+        quote_of_the_day_card()
+
+elif selected_page == "Add Quote":
+    st.markdown(header("Add New Quote"), unsafe_allow_html=True)
+    add_quote_form()
+
+elif selected_page == "Personal Details":
+    st.markdown(header("Your Personal Details"), unsafe_allow_html=True)
+    personal_details_form()
+
+elif selected_page == "Mood Wise Quotes":
+    st.markdown(header("Get Quotes Based on Your Mood"), unsafe_allow_html=True)
+    mood_form()
+
+elif selected_page == "Search":
+    st.markdown(header("Search Quotes"), unsafe_allow_html=True)
+    search_page()
+
+metrics.stop(render_started, 'page_render_seconds', page=selected_page)
+metrics.export()
+
+# Admin-only metrics panel
+if metrics.ENABLED and is_admin():
+    with st.sidebar:
+        with st.expander("📈 Metrics"):
+            st.caption("Latency over the most recent samples (ms)")
+            st.dataframe(metrics.registry.summary(), use_container_width=True, hide_index=True)
+            st.caption("Counters")
+            st.dataframe(metrics.registry.counter_rows(), use_container_width=True, hide_index=True)
+            st.caption("Quote cache")
+            st.json(get_quote_cache().stats())
+            st.caption("Write queue")
+            st.json(get_write_queue().stats())
 
 # Footer
 st.markdown("---")
-st.markdown('<div class="footer">Made by crashlar | Quotes Forever </div>', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown(FOOTER, unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+from datetime import date
+
+from bundle import export_bundle
+from setup import create_tables
+
+TODAY = date(2026, 1, 1)
+
+
+def shard_stamps(directory):
+    quotes = os.path.join(directory, 'quotes')
+    return {name: os.stat(os.path.join(quotes, name)).st_mtime_ns for name in sorted(os.listdir(quotes))}
+
+
+def test_reexport_only_rewrites_changed_shards(tmp_path):
+    conn = sqlite3.connect(':memory:')
+    create_tables(conn.cursor())
+    conn.executemany("INSERT INTO quotes (id, quote_text, author, category) VALUES (?, ?, 'Someone', 'Life')",
+                     [(1, 'First shard'), (1500, 'Second shard'), (2500, 'Third shard')])
+    directory = str(tmp_path / 'site')
+
+    stats = export_bundle(conn, directory, TODAY)
+    assert (stats['shards'], stats['written'], stats['unchanged']) == (3, 3, 0)
+    stamps = shard_stamps(directory)
+    assert list(stamps) == ['00000.json.gz', '00001.json.gz', '00002.json.gz']
+
+    stats = export_bundle(conn, directory, TODAY)
+    assert (stats['written'], stats['unchanged'], stats['removed']) == (0, 3, 0)
+    assert shard_stamps(directory) == stamps
+
+    conn.execute("UPDATE quotes SET author = 'Someone else' WHERE id = 1500")
+    conn.execute("DELETE FROM quotes WHERE id = 2500")
+    os.remove(os.path.join(directory, 'quotes', '00000.json.gz'))
+    stats = export_bundle(conn, directory, TODAY)
+    # The edited shard and the missing file are written again; the emptied shard goes
+    assert (stats['written'], stats['unchanged'], stats['removed']) == (2, 0, 1)
+    assert list(shard_stamps(directory)) == ['00000.json.gz', '00001.json.gz']
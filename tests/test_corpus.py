@@ -0,0 +1,19 @@
+from itertools import chain
+
+from corpus import Validator, read_chunks, read_header, resolve_columns
+
+
+def test_jsonl_lines_that_are_not_objects_are_rejected(tmp_path):
+    path = tmp_path / 'quotes.jsonl'
+    path.write_text('[1, 2]\n'
+                    '{"text": "First", "author": "Ada"}\n'
+                    '"just a string"\n'
+                    '3\n'
+                    '{not json\n'
+                    '{"text": "Second"}\n')
+    sources = resolve_columns('quotes', read_header(str(path), 'jsonl'))
+    validator = Validator('quotes')
+    rows = list(chain.from_iterable(validator.chunks(read_chunks(str(path), 'jsonl', sources, chunk_rows=2))))
+    assert [(row[0], row[1]) for row in rows] == [('First', 'Ada'), ('Second', 'Unknown')]
+    assert validator.rejected == 4
+    assert validator.examples[0] == 'record 1: not a JSON object'
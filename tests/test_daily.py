@@ -0,0 +1,65 @@
+import sqlite3
+from datetime import date, timedelta
+
+import data_access
+from daily import extend_schedule, scheduled_id
+from db import DB_PATH, ConnectionPool
+from setup import create_tables
+
+START = date(2026, 1, 1)
+
+
+def schedule(conn):
+    return conn.execute("SELECT day, quote_id, cycle FROM daily_quotes ORDER BY day").fetchall()
+
+
+def test_no_quote_repeats_until_every_quote_has_been_shown():
+    conn = sqlite3.connect(':memory:')
+    ids = list(range(1, 8))
+    # Extended in pieces, the way the app tops it up
+    assert extend_schedule(conn, ids, START, days=3) == 3
+    assert extend_schedule(conn, ids, START, days=17) == 14
+    rows = schedule(conn)
+    assert [row[0] for row in rows] == [(START + timedelta(days=i)).isoformat() for i in range(17)]
+    for cycle in range(3):
+        picks = [quote_id for _, quote_id, row_cycle in rows if row_cycle == cycle]
+        assert picks == [quote_id for _, quote_id, _ in rows[cycle * 7:cycle * 7 + 7]]
+        assert len(set(picks)) == len(picks)
+    assert sorted(row[1] for row in rows[:7]) == ids
+    assert sorted(row[1] for row in rows[7:14]) == ids
+
+    # Quotes added later join the open cycle without moving any scheduled day
+    assert extend_schedule(conn, ids + [8, 9], START, days=30) == 13
+    extended = schedule(conn)
+    assert extended[:17] == rows
+    third = [quote_id for _, quote_id, cycle in extended if cycle == 2]
+    assert sorted(third) == ids + [8, 9]
+
+
+def test_quote_of_the_day_is_the_scheduled_one(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'database').mkdir()
+    conn = sqlite3.connect(DB_PATH)
+    create_tables(conn.cursor())
+    conn.executemany("INSERT INTO quotes (quote_text, author, category) VALUES (?, 'Someone', 'Life')",
+                     [(f"Quote {i}",) for i in range(5)])
+    conn.commit()
+    conn.close()
+    pool = ConnectionPool(DB_PATH, size=1)
+    monkeypatch.setattr(data_access, 'get_pool', lambda path=DB_PATH: pool)
+    monkeypatch.setattr(data_access, '_cache', None)
+    monkeypatch.setattr(data_access, '_daily', {})
+
+    today = date.today()
+    week = [data_access.get_quote_of_the_day(today + timedelta(days=i)) for i in range(5)]
+    assert len({quote['id'] for quote in week}) == 5
+    assert data_access.get_quote_of_the_day(today) is week[0]
+    with pool.connection() as conn:
+        assert [scheduled_id(conn, today + timedelta(days=i)) for i in range(5)] == [quote['id'] for quote in week]
+    # Past the schedule every process still agrees on the day's quote
+    far = today + timedelta(days=3650)
+    data_access._daily.clear()
+    first = data_access.get_quote_of_the_day(far)
+    data_access._daily.clear()
+    assert data_access.get_quote_of_the_day(far) == first
+    pool.close()
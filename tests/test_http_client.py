@@ -0,0 +1,123 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import HttpClient, OfflineCacheMiss, ResponseCache
+from setup import QuoteFetcher
+
+FAST = {'concurrency': 4, 'rate': 1000.0, 'burst': 100}
+
+
+class Stub(BaseHTTPRequestHandler):
+    """Answers from server.routes: path -> function(server) returning (status, headers, body)"""
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.lock:
+            server.hits[path] = server.hits.get(path, 0) + 1
+            server.in_flight += 1
+            server.most_in_flight = max(server.most_in_flight, server.in_flight)
+        try:
+            status, headers, body = server.routes[path](server)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Stub)
+    server.daemon_threads = True
+    server.routes = {}
+    server.hits = {}
+    server.in_flight = server.most_in_flight = 0
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_wait_as_long_as_retry_after_says(server):
+    def flaky(server):
+        if server.hits['/flaky'] == 1:
+            return 503, {'Retry-After': '1'}, {}
+        return 200, {}, {'ok': True}
+
+    server.routes = {'/flaky': flaky, '/down': lambda server: (429, {'Retry-After': '0'}, {})}
+    client = HttpClient(retries=2, backoff=0, limits={'stub': FAST})
+    started = time.monotonic()
+    assert client.get_json(server.url + '/flaky', 'stub') == {'ok': True}
+    assert time.monotonic() - started >= 1
+    assert server.hits['/flaky'] == 2
+    # Out of retries: the last answer is returned, not raised
+    assert client.get(server.url + '/down', 'stub').status_code == 429
+    assert server.hits['/down'] == 3
+    client.close()
+
+
+def test_requests_to_a_source_stay_within_its_concurrency(server):
+    def slow(server):
+        time.sleep(0.05)
+        return 200, {}, {}
+
+    server.routes = {'/slow': slow}
+    client = HttpClient(limits={'stub': dict(FAST, concurrency=2)})
+    threads = [threading.Thread(target=client.get, args=(server.url + '/slow', 'stub')) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.hits['/slow'] == 8
+    assert server.most_in_flight == 2
+    client.close()
+
+
+def test_offline_rebuild_replays_the_same_quotes(server, tmp_path):
+    def forismatic(server):
+        number = server.hits['/forismatic']
+        return 200, {}, {'quoteText': f"Quote number {number} ", 'quoteAuthor': '' if number % 3 else 'Ada'}
+
+    server.routes = {
+        '/zen': lambda server: (200, {}, [{'q': 'Zen quote', 'a': 'Basho'}]),
+        '/forismatic': forismatic,
+        '/typefit': lambda server: (503, {'Retry-After': '0'}, {}),
+    }
+    urls = {'zenquotes': server.url + '/zen', 'forismatic': server.url + '/forismatic',
+            'typefit': server.url + '/typefit'}
+    limits = {source: FAST for source in urls}
+    cache = ResponseCache(str(tmp_path / 'http_cache'))
+
+    online = HttpClient(retries=1, limits=limits, cache=cache)
+    fetched = list(QuoteFetcher(online, urls).stream_quotes())
+    online.close()
+    hits = dict(server.hits)
+
+    replays = []
+    for _ in range(2):
+        offline = HttpClient(limits=limits, cache=cache, offline=True)
+        replays.append(list(QuoteFetcher(offline, urls).stream_quotes()))
+    assert replays[0] == replays[1]
+    assert sorted(replays[0], key=repr) == sorted(fetched, key=repr)
+    assert len(replays[0]) == 51
+    # Nothing went over the network, and the failed source had nothing to replay
+    assert server.hits == hits
+    with pytest.raises(OfflineCacheMiss):
+        offline.get(urls['typefit'], 'typefit')
@@ -0,0 +1,26 @@
+import sqlite3
+
+from dedup import content_hash
+from loader import BulkLoader, QUOTE_COLUMNS, QUOTE_UPSERT
+from setup import create_search_index, create_tables, ensure_content_hashes
+
+
+def quote(text, author='Unknown'):
+    return (text, author, 'Life', None, content_hash(text), 'test.csv')
+
+
+def test_counts_ignore_fts_trigger_writes(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'data.db')
+    create_tables(conn.cursor())
+    create_search_index(conn.cursor())
+    ensure_content_hashes(conn)
+    with BulkLoader(conn) as loader:
+        first = loader.load('quotes', QUOTE_COLUMNS, [quote('one'), quote('two'), quote('three')], QUOTE_UPSERT)
+        # one new quote, one Unknown author replaced, two repeats
+        second = loader.load('quotes', QUOTE_COLUMNS,
+                             [quote('four'), quote('one', 'Someone'), quote('two'), quote('three')], QUOTE_UPSERT)
+    assert first == {'rows': 3, 'inserted': 3, 'updated': 0, 'skipped': 0}
+    assert second == {'rows': 4, 'inserted': 1, 'updated': 1, 'skipped': 2}
+    assert loader.counts['quotes'] == {'rows': 7, 'inserted': 4, 'updated': 1, 'skipped': 2}
+    # The index kept up with every change
+    assert conn.execute("SELECT rowid FROM quotes_fts WHERE quotes_fts MATCH 'someone'").fetchall() == [(1,)]
@@ -0,0 +1,62 @@
+import random
+import sqlite3
+from collections import Counter
+
+from mood_matcher import FIELDS, TIER_EXACT, TIER_MOOD, MoodMatcher, MoodTable
+from setup import create_tables
+
+# id, quote_text, author, mood_category, gender_preference, min_age, max_age, social_life, professional_life
+ROWS = [
+    (1, 'For everyone', 'A', 'happy', 'both', None, None, 'balanced', 'balanced'),
+    (2, 'For her, socially well', 'B', 'happy', 'girl', None, None, 'good', 'balanced'),
+    (3, 'For teenagers', 'C', 'happy', 'both', 13, 19, 'balanced', 'balanced'),
+    (4, 'For boys', 'D', 'happy', 'boy', None, None, 'balanced', 'balanced'),
+    (5, 'Keep going', 'E', 'career', 'both', 30, None, 'balanced', 'struggling'),
+]
+
+
+def weights(tier, start, cumulative, table):
+    """{quote id: weight} of a candidates() result"""
+    steps = [int(cumulative[0])] + [int(b - a) for a, b in zip(cumulative, cumulative[1:])]
+    return {int(table.ids[start + i]): weight for i, weight in enumerate(steps) if weight}
+
+
+def test_targeted_quotes_weigh_more_and_ages_filter():
+    table = MoodTable(ROWS)
+    candidates = table.candidates('happy', 'girl', 35, 'good', 'good')
+    # The girl/good quote matches two columns with the user's own value: weight 2 * 2
+    assert candidates[0] == TIER_EXACT
+    assert weights(*candidates, table) == {1: 1, 2: 4}
+    candidates = table.candidates('happy', 'boy', 16, 'good', 'good')
+    assert weights(*candidates, table) == {1: 1, 3: 1, 4: 2}
+
+
+def test_fallback_tiers():
+    table = MoodTable(ROWS)
+    # Nothing fits a 20 year old for career, so every career quote is fair game
+    tier, start, cumulative = table.candidates('career', 'both', 20, 'balanced', 'struggling')
+    assert tier == TIER_MOOD
+    assert weights(tier, start, cumulative, table) == {5: 1}
+    assert table.candidates('career', 'both', 40, 'balanced', 'struggling')[0] == TIER_EXACT
+    assert table.candidates('bored', 'both', 40, 'good', 'good') == (None, None, None)
+
+
+def test_match_draws_in_proportion_to_the_weights(tmp_path):
+    path = str(tmp_path / 'data.db')
+    conn = sqlite3.connect(path)
+    create_tables(conn.cursor())
+    conn.executemany(f"INSERT INTO mood_quotes ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})", ROWS)
+    conn.commit()
+    conn.close()
+    matcher = MoodMatcher(path)
+    random.seed(5)
+    draws = Counter()
+    for _ in range(5000):
+        quote, tier = matcher.match('happy', 'girl', 35, 'good', 'good')
+        assert tier == TIER_EXACT
+        draws[quote['id']] += 1
+    assert set(draws) == {1, 2}
+    assert 3 < draws[2] / draws[1] < 5
+    quote, tier = matcher.match('career-focused', 'girl', 35, 'good', 'struggling')
+    assert (quote['id'], tier) == (5, TIER_EXACT)
+    assert matcher.match('bored', 'girl', 35, 'good', 'good') == (None, None)
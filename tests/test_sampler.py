@@ -0,0 +1,30 @@
+import random
+import threading
+
+from sampler import CategorySampler
+
+
+class ResettingRandom(random.Random):
+    """Starts a reset from another thread the first time a draw asks for a number"""
+
+    def __init__(self, sampler):
+        super().__init__(1)
+        self.sampler = sampler
+        self.thread = None
+
+    def random(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.sampler.reset, args=([(2, 'Courage')],))
+            self.thread.start()
+            # Give the reset the chance to land before the draw goes on
+            self.thread.join(0.2)
+        return super().random()
+
+
+def test_reset_during_a_draw_does_not_lose_the_category():
+    sampler = CategorySampler()
+    sampler.reset([(1, 'Life')])
+    rng = ResettingRandom(sampler)
+    assert sampler.random_id(rng=rng) == 1
+    rng.thread.join()
+    assert sampler.random_id() == 2
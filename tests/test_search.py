@@ -0,0 +1,24 @@
+import sqlite3
+
+from dedup import content_hash
+from search import search_quotes
+from setup import create_search_index, create_tables
+
+
+def test_cursor_with_text_without_words_finds_nothing(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'data.db')
+    conn.row_factory = sqlite3.Row
+    create_tables(conn.cursor())
+    create_search_index(conn.cursor())
+    for i in range(3):
+        text = f"courage number {i}"
+        conn.execute("INSERT INTO quotes (quote_text, author, category, content_hash) VALUES (?, 'A', 'Life', ?)",
+                     (text, content_hash(text)))
+    conn.commit()
+
+    first, cursor = search_quotes(conn, 'courage', limit=2)
+    assert len(first) == 2 and cursor is not None
+    rest, _ = search_quotes(conn, 'courage', limit=2, after=cursor)
+    assert [quote['id'] for quote in rest] == [3]
+    # A cursor from another search with punctuation only: no FTS syntax error
+    assert search_quotes(conn, '!!', limit=2, after=cursor) == ([], None)
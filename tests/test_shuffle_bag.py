@@ -0,0 +1,51 @@
+from sampler import CategorySampler
+from shuffle_bag import Permutation, ShuffleBag
+
+
+class Cache:
+    """The parts of QuoteCache a bag reads"""
+
+    def __init__(self, categories):
+        self.rows = {quote_id: {'id': quote_id, 'category': category}
+                     for quote_id, category in enumerate(categories, 1)}
+        self.sampler = CategorySampler()
+        self.sampler.reset((quote_id, row['category']) for quote_id, row in self.rows.items())
+
+    def sorted_ids(self):
+        return sorted(self.rows)
+
+    def get_many(self, quote_ids):
+        return [self.rows.get(quote_id) for quote_id in quote_ids]
+
+    def category_sampler(self):
+        return self.sampler
+
+
+def test_permutation_is_a_bijection():
+    for n in (1, 2, 3, 7, 64, 100, 1000, 4097):
+        for key in ('a', 'b|1'):
+            assert sorted(Permutation(n, key)[i] for i in range(n)) == list(range(n))
+
+
+def test_bag_shows_every_quote_once_per_cycle():
+    cache = Cache(['Life'] * 50)
+    bag = ShuffleBag(cache, batch_size=7, seed=1)
+    first, second = [[bag.next()['id'] for _ in range(50)] for _ in range(2)]
+    assert sorted(first) == sorted(second) == list(range(1, 51))
+    assert first != second
+
+
+def test_each_category_is_walked_without_repeats():
+    categories = ['Life'] * 40 + ['Love'] * 13 + ['Wisdom'] * 5
+    cache = Cache(categories)
+    bag = ShuffleBag(cache, batch_size=5, seed=2, categories=['Love', 'Wisdom'])
+    seen = {'Love': [], 'Wisdom': []}
+    for _ in range(200):
+        quote = bag.next()
+        seen[quote['category']].append(quote['id'])
+    for category, ids in seen.items():
+        size = categories.count(category)
+        assert len(ids) >= 2 * size
+        # Every full pass over a category is a permutation of its quotes
+        for start in range(0, len(ids) - size + 1, size):
+            assert sorted(ids[start:start + size]) == sorted(cache.sampler.ids[category])
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+
+import numpy as np
+
+from setup import create_tables
+from similar import CURRENT, IDS, SimilarIndex, build_index, current_dir, publish_index
+
+
+class Cache:
+    """The parts of QuoteCache the index reads"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def sorted_ids(self):
+        return [row[0] for row in self.conn.execute("SELECT id FROM quotes ORDER BY id")]
+
+    def get_many(self, quote_ids):
+        return [self.get(quote_id) for quote_id in quote_ids]
+
+    def get(self, quote_id):
+        row = self.conn.execute("SELECT id, quote_text FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        return {'id': row[0], 'quote_text': row[1]} if row else None
+
+
+def add_quotes(conn, texts):
+    conn.executemany("INSERT INTO quotes (quote_text, author, category) VALUES (?, 'Someone', 'Life')",
+                     [(text,) for text in texts])
+
+
+def publish(conn, directory):
+    staging = str(directory) + '.building'
+    build_index(conn, staging)
+    publish_index(staging, str(directory))
+
+
+def test_index_swaps_whole_builds(tmp_path):
+    conn = sqlite3.connect(':memory:')
+    create_tables(conn.cursor())
+    add_quotes(conn, ['courage is grace under pressure', 'courage is fear that said its prayers'])
+    directory = tmp_path / 'similar'
+    publish(conn, directory)
+    index = SimilarIndex(str(directory), Cache(conn))
+    assert index.available
+    assert [quote['id'] for quote, _ in index.like(1)] == [2]
+
+    add_quotes(conn, ['courage under pressure is grace'])
+    publish(conn, directory)
+    assert sorted(os.listdir(directory)) == sorted([CURRENT, os.path.basename(current_dir(str(directory)))])
+    assert index.available
+    assert index.ids.tolist() == [1, 2, 3] and index.vectors.shape[0] == 3
+    assert index.extra_ids.dtype == np.int64 and not len(index.extra_ids)
+
+    # A build whose files don't match leaves the mapped one in use
+    broken = directory / 'build-broken'
+    broken.mkdir()
+    for name in os.listdir(current_dir(str(directory))):
+        os.link(os.path.join(current_dir(str(directory)), name), broken / name)
+    np.save(broken / IDS, np.array([1, 2], np.int64))
+    (directory / CURRENT).write_text('build-broken')
+    assert index.available
+    assert index.ids.tolist() == [1, 2, 3]
+    assert index.like(3)[0][0]['id'] == 1
@@ -0,0 +1,89 @@
+import sqlite3
+
+import data_access
+from db import DB_PATH, WRITE_STORE_PATH, ConnectionPool
+from dedup import content_hash
+from favorites import add_favorite
+from near_dup import ensure_source_column
+from setup import create_tables, ensure_content_hashes
+from snapshot import SnapshotBuild
+from write_queue import STATE_SCHEMA
+
+
+def add_quote(conn, text, source):
+    return conn.execute('''
+        INSERT INTO quotes (quote_text, author, category, content_hash, source) VALUES (?, 'Someone', 'Life', ?, ?)
+    ''', (text, content_hash(text), source)).lastrowid
+
+
+def test_publish_keeps_writes_committed_during_the_build(tmp_path):
+    path = str(tmp_path / 'data.db')
+    conn = sqlite3.connect(path)
+    create_tables(conn.cursor())
+    ensure_content_hashes(conn)
+    ensure_source_column(conn)
+    add_quote(conn, 'already there', 'seed.csv')
+    conn.execute(STATE_SCHEMA)
+    conn.commit()
+    conn.close()
+
+    # The app keeps serving the database read-write while setup builds the next snapshot
+    pool = ConnectionPool(path, size=1)
+    build = SnapshotBuild(path, write_path=str(tmp_path / 'writes.db'))
+    building = build.open()
+    built_id = add_quote(building, 'loaded by setup', 'import.csv')
+    with pool.writer() as app:
+        app.execute("INSERT INTO users (name, email) VALUES ('Ada', 'ada@example.com')")
+        submitted_id = add_quote(app, 'submitted in the app', 'user')
+        add_favorite(app, 'session', submitted_id)
+        app.execute("INSERT INTO write_queue_state (name, last_seq) VALUES ('write_queue.log', 7)")
+    assert submitted_id == built_id
+    build.publish()
+    pool.close()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT name FROM users").fetchall() == [('Ada',)]
+    quotes = dict(conn.execute("SELECT quote_text, id FROM quotes"))
+    assert set(quotes) == {'already there', 'loaded by setup', 'submitted in the app'}
+    assert conn.execute("SELECT quote_id FROM favorites").fetchall() == [(quotes['submitted in the app'],)]
+    assert conn.execute("SELECT last_seq FROM write_queue_state").fetchall() == [(7,)]
+    assert build.replayed == 3
+    conn.close()
+
+
+def test_read_only_submission_reaches_the_next_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'database').mkdir()
+    conn = sqlite3.connect(DB_PATH)
+    create_tables(conn.cursor())
+    ensure_content_hashes(conn)
+    ensure_source_column(conn)
+    conn.close()
+    # A write store from before quotes had a source
+    store = sqlite3.connect(WRITE_STORE_PATH)
+    store.execute('''
+        CREATE TABLE quotes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, quote_text TEXT NOT NULL, author TEXT NOT NULL,
+            category TEXT NOT NULL, inspiration TEXT, created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            content_hash TEXT UNIQUE
+        )
+    ''')
+    store.close()
+
+    pool = ConnectionPool(DB_PATH, size=1, read_only=True, write_path=WRITE_STORE_PATH)
+    monkeypatch.setattr(data_access, 'get_pool', lambda path=DB_PATH: pool)
+    monkeypatch.setattr(data_access, '_writes', None)
+    monkeypatch.setattr(data_access, '_cache', None)
+    future = data_access.add_quote('Written while serving read-only', 'Someone', 'Life', 'a note')
+    assert future.result(timeout=5)['source'] == 'user'
+    data_access.get_write_queue().close()
+    pool.close()
+
+    build = SnapshotBuild(DB_PATH, write_path=WRITE_STORE_PATH)
+    build.open()
+    assert build.merge_write_store() == 1
+    build.publish()
+    conn = sqlite3.connect(DB_PATH)
+    assert conn.execute("SELECT quote_text, source FROM quotes").fetchall() == [
+        ('Written while serving read-only', 'user')]
+    conn.close()
@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from db import ConnectionPool
+from write_queue import WriteQueue
+
+
+def add_note(conn, text):
+    return conn.execute("INSERT INTO notes (text) VALUES (?)", (text,)).lastrowid
+
+
+def add_missing(conn, text):
+    conn.execute("INSERT INTO no_such_table (text) VALUES (?)", (text,))
+
+
+HANDLERS = {'add_note': add_note, 'add_missing': add_missing}
+
+
+def test_unrecoverable_error_fails_entry_without_stalling(tmp_path):
+    path = str(tmp_path / 'data.db')
+    journal = str(tmp_path / 'write_queue.log')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, text TEXT)")
+    pool = ConnectionPool(path, size=1)
+    writes = WriteQueue(pool, HANDLERS, journal=journal, fsync=False).start()
+    try:
+        missing = writes.enqueue('add_missing', text='lost')
+        with pytest.raises(sqlite3.OperationalError, match='no such table'):
+            missing.result(timeout=5)
+        assert writes.enqueue('add_note', text='kept').result(timeout=5) == 1
+        assert writes.stats()['failed'] == 1
+    finally:
+        writes.close()
+
+    # The failure is journalled, so a restart doesn't apply it again
+    with open(journal, 'a') as f:
+        f.write('{"seq": 3, "op": "add_note", "args": {"text": "replayed"}}\n')
+        f.write('{"seq": 3, "op": "add_note", "failed": "no such table"}\n')
+    writes = WriteQueue(pool, HANDLERS, journal=journal, fsync=False).start()
+    writes.close()
+    assert writes.stats()['replayed'] == 0
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT text FROM notes").fetchall() == [('kept',)]
+    pool.close()
@@ -0,0 +1,168 @@
+"""Warm-up at process start, and the readiness flag that flips when it is done
+
+A fresh process would otherwise make its first users wait while it opens
+the database, reads a cold file from disk and builds the quote cache, the
+category tables and the mood index. warm_up() does all of that up front:
+
+    - reads the database file (and the "More like this" vectors) once, so
+      their pages are in the OS page cache that the connections' mmap reads
+    - opens every pooled connection and runs the search query on each, so
+      the statements are compiled and the FTS index pages are loaded
+    - loads the quote cache and the mood index, draws a random quote and a
+      shuffle bag, and looks up today's Quote of the Day
+    - starts the write queue
+
+Streamlit only runs the app script when the first visitor arrives, so start
+the app through this module to warm up as the process starts:
+
+    python warmup.py [streamlit options, e.g. --server.port 8501]
+
+which starts warm-up and then runs `streamlit run streamlit_app.py` in the
+same process, sharing the caches it loads. A plain `streamlit run` warms up
+on the first visit instead.
+
+When warm-up is done it writes QUOTES_READY_FILE (database/ready by default) with the warm-up
+time, for a readiness probe such as `test -f database/ready`; the file is
+removed when warm-up starts and when the process exits, so it only exists
+while a warm process is serving. api_server.py also answers /readyz.
+Give each process its own file when several share a directory.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import data_access
+import metrics
+from db import DB_PATH, get_pool
+from search import search_quotes
+from similar import VECTORS, current_dir, index_dir
+
+READY_FILE = os.environ.get('QUOTES_READY_FILE', 'database/ready')
+# Most of the database file worth reading into the page cache ahead of time
+WARMUP_READ_BYTES = int(os.environ.get('QUOTES_WARMUP_READ_BYTES', 512 << 20))
+READ_CHUNK = 1 << 20
+
+ready = threading.Event()
+# Seconds per warm-up step, then the total, once warm-up has run
+timings = {}
+_started = False
+_lock = threading.Lock()
+
+
+def touch_file(path, limit=WARMUP_READ_BYTES):
+    """Read up to limit bytes of a file so its pages are cached; returns the bytes read"""
+    total = 0
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while total < limit:
+                chunk = f.read(min(READ_CHUNK, limit - total))
+                if not chunk:
+                    break
+                total += len(chunk)
+    except FileNotFoundError:
+        pass
+    return total
+
+
+def prime_connections():
+    """Open every pooled read connection and run the hot statements on each"""
+    pool = get_pool()
+    connections = [pool.acquire() for _ in range(pool.size)]
+    try:
+        for conn in connections:
+            search_quotes(conn, 'love')
+    finally:
+        for conn in connections:
+            pool.release(conn)
+    return len(connections)
+
+
+def load_caches():
+    data_access.get_quote_cache().ensure_fresh()
+    data_access.get_random_quote()
+    data_access.new_shuffle_bag().next()
+    data_access.get_quote_of_the_day()
+    data_access.get_mood_matcher().ensure_fresh()
+    data_access.get_similar_index().available
+
+
+STEPS = (
+    ('page cache', lambda: (touch_file(DB_PATH), touch_file(os.path.join(current_dir(index_dir(DB_PATH)), VECTORS)))),
+    ('connections', prime_connections),
+    ('caches', load_caches),
+    ('write queue', data_access.get_write_queue),
+)
+
+
+def write_ready_file(seconds):
+    directory = os.path.dirname(READY_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{READY_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({'pid': os.getpid(), 'warmup_seconds': round(seconds, 3), 'ready_at': time.time()}, f)
+    os.replace(temp_path, READY_FILE)
+
+
+def remove_ready_file():
+    try:
+        os.remove(READY_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def warm_up():
+    """Run every warm-up step, then mark the process ready; returns the seconds it took
+
+    A step that fails (e.g. no database yet) is reported and skipped: the
+    process is as ready as it will get, and requests report the real error.
+    """
+    started = time.perf_counter()
+    for name, step in STEPS:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"⚠️ Warm-up: {name} failed: {e}", flush=True)
+        timings[name] = time.perf_counter() - step_started
+    timings['total'] = seconds = time.perf_counter() - started
+    metrics.set_gauge('warmup_seconds', seconds)
+    steps = ', '.join(f"{name} {timings[name]:.2f}s" for name, _ in STEPS)
+    print(f"🔥 Warmed up in {seconds:.2f}s ({steps})", flush=True)
+    try:
+        write_ready_file(seconds)
+    except OSError as e:
+        print(f"⚠️ Couldn't write {READY_FILE}: {e}", flush=True)
+    ready.set()
+    return seconds
+
+
+def start():
+    """Warm up on a background thread, once per process; returns the ready event"""
+    global _started
+    with _lock:
+        if not _started:
+            _started = True
+            remove_ready_file()
+            atexit.register(remove_ready_file)
+            threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+    return ready
+
+
+def main():
+    # Run as a script this module is __main__; make the app's `import warmup`
+    # find it instead of loading a second copy with its own ready flag
+    sys.modules['warmup'] = sys.modules['__main__']
+    start()
+    from streamlit.web import cli
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py')
+    sys.argv = ['streamlit', 'run', app] + sys.argv[1:]
+    sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+JOURNAL_PATH = 'database/write_queue.log'
+
+STATE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS write_queue_state (
+        name TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL
+    )
+'''
+
+STOP = object()
+
+
+def busy(error):
+    """True for SQLITE_BUSY and SQLITE_LOCKED: another connection holds the database, try again later"""
+    code = getattr(error, 'sqlite_errorcode', None)
+    return code is not None and (code & 0xff) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+class WriteQueueFull(Exception):
+    """Raised when the queue stays full for longer than the enqueue timeout"""
+
+
+class WriteQueueClosed(Exception):
+    pass
+
+
+class Entry:
+    __slots__ = ('seq', 'op', 'args', 'enqueued', 'future')
+
+    def __init__(self, seq, op, args):
+        self.seq = seq
+        self.op = op
+        self.args = args
+        self.enqueued = time.monotonic()
+        self.future = Future()
+
+
+class WriteQueue:
+    """Durable write-behind queue with a single group-committing writer thread
+
+    enqueue() appends the write to a journal file and returns once it is on
+    disk, so the UI never waits for SQLite's write lock. The writer thread
+    applies everything that has piled up in one transaction, each entry in its
+    own savepoint so a bad entry doesn't sink the batch, and records the last
+    applied sequence number in write_queue_state in the same transaction.
+    Only a busy or locked database is retried; any other error fails the
+    entry (or the whole batch, if the transaction itself can't be written)
+    and is recorded in the journal so it isn't replayed. Entries still in the
+    journal at startup (after a crash) are replayed exactly once; close()
+    drains the queue before returning.
+    """
+
+    def __init__(self, pool, handlers, journal=JOURNAL_PATH, max_pending=1000, batch_size=256,
+                 linger=0.005, enqueue_timeout=2.0, fsync=True):
+        self.pool = pool
+        self.handlers = handlers
+        self.journal_path = journal
+        self.name = os.path.basename(journal)
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.linger = linger
+        self.enqueue_timeout = enqueue_timeout
+        self.fsync = fsync
+        self.pending = queue.Queue()
+        self.space = threading.Condition()
+        self.depth = 0
+        self.seq = 0
+        self.committed_seq = 0
+        self.journal = None
+        self.thread = None
+        self.closed = False
+        self.counts = {'enqueued': 0, 'committed': 0, 'failed': 0, 'rejected': 0, 'batches': 0,
+                       'replayed': 0, 'max_depth': 0}
+
+    def start(self):
+        """Open the journal, replay anything not yet applied and start the writer thread"""
+        with self.pool.writer() as conn:
+            conn.execute(STATE_SCHEMA)
+            row = conn.execute("SELECT last_seq FROM write_queue_state WHERE name = ?", (self.name,)).fetchone()
+        self.committed_seq = self.seq = row[0] if row else 0
+        directory = os.path.dirname(self.journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.replay()
+        self.journal = open(self.journal_path, 'a', encoding='utf-8')
+        if not self.depth:
+            self.journal.truncate(0)
+        elif self.journal.tell() and not self.journal_ends_with_newline():
+            # Don't let the next entry run into a line cut short by a crash
+            self.journal.write('\n')
+        self.thread = threading.Thread(target=self.run, name='write-queue', daemon=True)
+        self.thread.start()
+        return self
+
+    def replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        records = {}
+        with open(self.journal_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash was never acknowledged
+                    continue
+                self.seq = max(self.seq, record['seq'])
+                if 'failed' in record:
+                    # Already reported to the caller as failed
+                    records.pop(record['seq'], None)
+                elif record['seq'] > self.committed_seq:
+                    records[record['seq']] = record
+        for record in records.values():
+            self.pending.put(Entry(record['seq'], record['op'], record['args']))
+            self.depth += 1
+            self.counts['replayed'] += 1
+        if self.counts['replayed']:
+            print(f"↩️  Replaying {self.counts['replayed']} queued writes from {self.journal_path}")
+
+    def journal_ends_with_newline(self):
+        with open(self.journal_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def enqueue(self, op, **args):
+        """Durably queue a write; returns a Future resolved with the handler's result after commit"""
+        if op not in self.handlers:
+            raise ValueError(f"unknown write: {op}")
+        waited = time.monotonic()
+        with self.space:
+            if self.closed:
+                raise WriteQueueClosed("write queue is closed")
+            if not self.space.wait_for(lambda: self.depth < self.max_pending, self.enqueue_timeout):
+                self.counts['rejected'] += 1
+                metrics.inc('write_queue_rejected_total', op=op)
+                raise WriteQueueFull(f"{self.depth} writes already pending")
+            metrics.observe('write_queue_enqueue_wait_seconds', time.monotonic() - waited)
+            self.seq += 1
+            entry = Entry(self.seq, op, args)
+            self.write_record({'seq': entry.seq, 'op': op, 'args': args})
+            self.depth += 1
+            self.counts['enqueued'] += 1
+            self.counts['max_depth'] = max(self.counts['max_depth'], self.depth)
+            self.pending.put(entry)
+        metrics.inc('write_queue_enqueued_total', op=op)
+        metrics.set_gauge('write_queue_depth', self.depth)
+        return entry.future
+
+    def write_record(self, record):
+        """Append a line to the journal and make it durable; call with self.space held"""
+        self.journal.write(json.dumps(record) + '\n')
+        self.journal.flush()
+        if self.fsync:
+            os.fsync(self.journal.fileno())
+
+    def next_batch(self):
+        """Block for one entry, then gather whatever else arrives within the linger window"""
+        entry = self.pending.get()
+        if entry is STOP:
+            return [], True
+        batch = [entry]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                entry = self.pending.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if entry is STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self.next_batch()
+            if batch:
+                self.commit(batch)
+
+    def commit(self, batch):
+        delay = 0.05
+        while True:
+            started = metrics.start()
+            results = []
+            try:
+                with self.pool.writer() as conn:
+                    if not conn.in_transaction:
+                        conn.execute("BEGIN IMMEDIATE")
+                    for entry in batch:
+                        conn.execute("SAVEPOINT entry")
+                        try:
+                            results.append((entry, self.handlers[entry.op](conn, **entry.args), None))
+                        except Exception as e:
+                            if busy(e):
+                                raise
+                            # e.g. a missing table or column: this entry can never apply
+                            conn.execute("ROLLBACK TO entry")
+                            results.append((entry, None, e))
+                        conn.execute("RELEASE entry")
+                    conn.execute('''
+                        INSERT INTO write_queue_state (name, last_seq) VALUES (?, ?)
+                        ON CONFLICT(name) DO UPDATE SET last_seq = excluded.last_seq
+                    ''', (self.name, batch[-1].seq))
+                break
+            except Exception as e:
+                if not busy(e):
+                    # The transaction itself can't be written (read-only or
+                    # full database): retrying won't help, so fail the batch
+                    results = [(entry, None, e) for entry in batch]
+                    break
+                # Another connection holds the database; the entries are safe
+                # in the journal, so keep retrying
+                metrics.inc('write_queue_retries_total')
+                print(f"⚠️  Write queue commit failed, retrying: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 2.0)
+        metrics.stop(started, 'write_queue_commit_seconds')
+        metrics.observe('write_queue_batch_size', len(batch))
+
+        now = time.monotonic()
+        with self.space:
+            if self.journal is not None:
+                for entry, result, error in results:
+                    if error is not None:
+                        self.write_record({'seq': entry.seq, 'op': entry.op, 'failed': str(error)})
+            self.committed_seq = batch[-1].seq
+            self.depth -= len(batch)
+            self.counts['batches'] += 1
+            if self.committed_seq == self.seq and self.journal is not None:
+                # Everything acknowledged is in the database; start the journal afresh
+                self.journal.truncate(0)
+                self.journal.seek(0)
+            self.space.notify_all()
+        metrics.set_gauge('write_queue_depth', self.depth)
+        for entry, result, error in results:
+            metrics.observe('write_queue_latency_seconds', now - entry.enqueued, op=entry.op)
+            if error is None:
+                self.counts['committed'] += 1
+                entry.future.set_result(result)
+            else:
+                self.counts['failed'] += 1
+                metrics.inc('write_queue_failed_total', op=entry.op)
+                print(f"❌ Dropped queued {entry.op} (seq {entry.seq}): {error}")
+                entry.future.set_exception(error)
+
+    def close(self, timeout=30.0):
+        """Stop accepting writes and wait until everything queued is committed"""
+        with self.space:
+            if self.closed:
+                return
+            self.closed = True
+            self.pending.put(STOP)
+        if self.thread is not None:
+            self.thread.join(timeout)
+        with self.space:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+
+    def stats(self):
+        return dict(self.counts, depth=self.depth, last_seq=self.seq, committed_seq=self.committed_seq)